@@ -1,11 +1,15 @@
 import streamlit as st
 import base64
 import os
-from backend.utils import read_pdf, read_docx, read_txt
-from backend.plagiarism_detection import AI_detector
-from backend.plagiarism_detection import intrinsic_detector
-from backend.summarizer import summarize
-from backend.paraphraser import paraphrase_text
+import time
+import uuid
+from backend.document import spool_document
+from backend.jobs import get_job_queue
+
+# Inference runs on background workers; pages submit jobs and poll for the result
+job_queue = get_job_queue()
+POLL_INTERVAL = 0.5  # seconds between status checks while a job runs
+STREAM_POLL_INTERVAL = 0.15  # shorter while text is streaming in
 
 # Convert image to base64 string
 def image_to_base64(image_path):
@@ -65,9 +69,58 @@ def set_background(image_path):
     else:
         st.write(f"Image not found at {image_path}. Please check the path.")
 
+# Show progress for the job stored under key and return it once finished
+def poll_job(key):
+    """Render progress of a running job and rerun until it is done; returns the finished job."""
+    job_id = st.session_state.get(key)
+    job = job_queue.status(job_id) if job_id else None
+    if job is None:
+        return None
+
+    if job["status"] in ("queued", "running"):
+        label = job["message"] or ("Waiting in queue..." if job["status"] == "queued" else "Working...")
+        st.progress(job["progress"], text=label)
+        for partial in job["partial"]:
+            st.info(partial)
+        if job["streamed"]:
+            st.markdown(f"{job['streamed']}▌")
+        if st.button("Cancel", key=f"{key}_cancel"):
+            job_queue.cancel(job_id)
+            del st.session_state[key]
+            st.rerun()
+        time.sleep(STREAM_POLL_INTERVAL if job["streamed"] else POLL_INTERVAL)
+        st.rerun()
+
+    if job["status"] == "failed":
+        st.error(f"An error occurred: {job['error']}")
+        return None
+    if job["status"] == "cancelled":
+        return None
+    if st.session_state.get("show_timings") and job["timings"]:
+        with st.expander("⏱️ Timing breakdown"):
+            st.table({"stage": list(job["timings"]), "seconds": list(job["timings"].values())})
+    return job
+
+# Extract an upload once and keep its text spilled to disk across reruns
+def spooled_upload(uploaded_file, key):
+    """Return the SpooledDocument of an uploaded file, extracting it only when a new file arrives."""
+    file_key = getattr(uploaded_file, "file_id", None) or (uploaded_file.name, uploaded_file.size)
+    cached = st.session_state.get(key)
+    if cached and cached[0] == file_key:
+        document = cached[1]
+    else:
+        if cached:
+            job_queue.release(cached[1])  # closed now, or when the last job reading it finishes
+        document = spool_document(uploaded_file, uploaded_file.name)
+        st.session_state[key] = (file_key, document)
+    if document.warnings:
+        st.warning(f"{len(document.warnings)} page(s) were left empty: {document.warnings[0]}")
+    return document
+
 # Sidebar Navigation
 st.sidebar.title("Navigation")
 page = st.sidebar.radio("Go to", ["Home", "Paraphrasing", "Text Summarization", "Plagiarism Detection", "About"])
+st.sidebar.checkbox("Show timing breakdown", key="show_timings")
 
 # Routing Pages
 if page == "Home":
@@ -90,28 +143,40 @@ elif page == "Paraphrasing":
     if option == "Active/Passive Voice Change":
         voice_type = st.radio("Choose voice conversion:", ("Passive", "Active"))
 
+    profile = st.selectbox("Generation speed:", ["fast", "balanced", "quality"], index=2,
+                           help="fast uses greedy decoding, quality the full beam search")
+    time_budget = st.number_input("Time limit in seconds (0 = none):", min_value=0, max_value=600, value=0)
+    stream = st.checkbox("Show text as it is generated", value=False,
+                         help="words appear right away; uses greedy decoding instead of beam search")
+
     if st.button("Paraphrase"):
         if text:
-            with st.spinner("Paraphrasing..."):
-                # Map UI option to function option values
-                option_map = {
-                    "Normal": "normal",
-                    "Academic Filter": "academic_filter",
-                    "First Person Removal": "first_person_removal",
-                    "Active/Passive Voice Change": "active_passive"
-                }
-                selected_option = option_map[option]
-                result = paraphrase_text(text, option=selected_option, voice_type=voice_type)
-            st.success("Paraphrased Text:")
-            st.write(result)
+            # Map UI option to function option values
+            option_map = {
+                "Normal": "normal",
+                "Academic Filter": "academic_filter",
+                "First Person Removal": "first_person_removal",
+                "Active/Passive Voice Change": "active_passive"
+            }
+            selected_option = option_map[option]
+            st.session_state["paraphrase_job"] = job_queue.submit(
+                "paraphrase", text, option=selected_option, voice_type=voice_type.lower(),
+                profile=profile, time_budget=time_budget or None, stream=stream)
         else:
             st.warning("Please enter some text.")
 
+    job = poll_job("paraphrase_job")
+    if job:
+        st.success("Paraphrased Text:")
+        st.write(job["result"])
+
 elif page == "Text Summarization":
     set_background("assets/summarization.png")
     st.header("Text Summarization Tool 📚")
     
     input_text = st.text_area("Enter text to summarize:", height=300)
+    summary_file = st.file_uploader("Or upload a document (PDF, DOCX, or TXT)", type=["pdf", "docx", "txt"],
+                                    key="summary_file")
 
     # Filter options
     st.subheader("📊 Summarization Settings")
@@ -124,43 +189,47 @@ elif page == "Text Summarization":
         custom_min = st.number_input("Enter custom min length:", min_value=10, max_value=1000, value=50)
         custom_max = st.number_input("Enter custom max length:", min_value=10, max_value=2000, value=150)
 
+    profile, time_budget, stream = "quality", 0, False
+    if summary_type == "abstractive":
+        profile = st.selectbox("Generation speed:", ["fast", "balanced", "quality"], index=2,
+                               help="fast uses greedy decoding, quality the full beam search")
+        time_budget = st.number_input("Time limit in seconds (0 = none):", min_value=0, max_value=600, value=0)
+        stream = st.checkbox("Show text as it is generated", value=False,
+                             help="words appear right away; uses greedy decoding instead of beam search")
+
     if st.button("Summarize"):
-        if input_text.strip() != "":
-            with st.spinner("Summarizing..."):
-                try:
-                    if summary_type == "extractive":
-                        summary = summarize(input_text)
-                    else:
-                        if length_option == "custom":
-                            summary = summarize(
-                                input_text,
-                                summary_type=summary_type,
-                                tone=tone,
-                                length=length_option,
-                                custom_length_range=(custom_min, custom_max)
-                            )
-                        else:
-                            summary = summarize(
-                                input_text,
-                                summary_type=summary_type,
-                                tone=tone,
-                                length=length_option
-                            )
-                    st.subheader("🔹 Summary:")
-                    st.success("Summary generated successfully! ✅")
-                    st.markdown(
-                        f"""
-                        <div style="background-color: #ffd700; padding: 15px; border-radius: 10px; color: black; font-weight: bold;">
-                            🔹 Summary:<br><br>{summary}
-                        </div>
-                        """,
-                        unsafe_allow_html=True
-                    )
-                except Exception as e:
-                    st.error(f"An error occurred: {e}")
+        # Uploads are read piece by piece from disk instead of as one string
+        source = spooled_upload(summary_file, "summary_upload") if summary_file is not None else input_text
+        if summary_file is not None or input_text.strip() != "":
+            st.session_state["summarize_job"] = job_queue.submit(
+                "summarize",
+                source,
+                summary_type=summary_type,
+                tone=tone,
+                length=length_option,
+                custom_length_range=(custom_min, custom_max) if length_option == "custom" else None,
+                profile=profile,
+                time_budget=time_budget or None,
+                stream=stream
+            )
         else:
             st.warning("Please enter some text!")
 
+    # Long documents are summarized chunk by chunk; poll_job shows each partial as it finishes
+    job = poll_job("summarize_job")
+    if job:
+        summary = job["result"]
+        st.subheader("🔹 Summary:")
+        st.success("Summary generated successfully! ✅")
+        st.markdown(
+            f"""
+            <div style="background-color: #ffd700; padding: 15px; border-radius: 10px; color: black; font-weight: bold;">
+                🔹 Summary:<br><br>{summary}
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+
 elif page == "Plagiarism Detection":
     set_background("assets/plagiarism.png")
     st.header("Plagiarism Detection Tool 🔍")
@@ -237,53 +306,111 @@ elif page == "Plagiarism Detection":
             unsafe_allow_html=True
         )
 
-        if uploaded_file.name.endswith(".pdf"):
-            final_text = read_pdf(uploaded_file)
-        elif uploaded_file.name.endswith(".docx"):
-            final_text = read_docx(uploaded_file)
-        elif uploaded_file.name.endswith(".txt"):
-            final_text = read_txt(uploaded_file)
-        else:
+        try:
+            final_text = spooled_upload(uploaded_file, "integrity_upload")
+        except ValueError:
             st.warning("Unsupported file type!")
     elif input_text.strip() != "":
         final_text = input_text
 
+    similarity_mode = st.radio("Similarity Check", ["lexical", "semantic"], horizontal=True,
+                               format_func=lambda mode: {"lexical": "Word overlap",
+                                                         "semantic": "Meaning (catches paraphrasing)"}[mode])
+
     if st.button("Check for Integrity") and final_text:
-        with st.spinner("Analyzing..."):
-            # 1️⃣ AI Detection
-            ai_result = AI_detector(final_text)
-            # 2️⃣ Intrinsic Plagiarism Check
-            intrinsic_result = intrinsic_detector(final_text)
-
-            # AI Authorship Results
-            st.subheader("AI Authorship Detection 🤖🧑‍💻")
-            st.write(f"**Human Probability:** {ai_result['Human Probability']}%")
-            st.write(f"**AI Probability:** {ai_result['AI Probability']}%")
-
-            # Intrinsic Similarity Results
-            st.subheader("Intrinsic Similarity Detection 🔄")
-            st.write(f"**Average Similarity Score:** {intrinsic_result['similarity_score']}%")
-
-            if intrinsic_result['similar_pairs']:
-                st.write("### Highly Similar Sentence Pairs:")
-                for pair in intrinsic_result['similar_pairs']:
+        # Re-checks of an edited draft in this session only re-analyze what changed
+        document_id = st.session_state.setdefault("document_id", uuid.uuid4().hex)
+        st.session_state["integrity_job"] = job_queue.submit("integrity", final_text, document_id=document_id,
+                                                             similarity_mode=similarity_mode)
+
+    job = poll_job("integrity_job")
+    if job:
+        # 1️⃣ AI Detection
+        ai_result = job["result"]["ai"]
+        # 2️⃣ Intrinsic Plagiarism Check
+        intrinsic_result = job["result"]["intrinsic"]
+
+        # AI Authorship Results
+        st.subheader("AI Authorship Detection 🤖🧑‍💻")
+        st.write(f"**Human Probability:** {ai_result['Human Probability']}%")
+        st.write(f"**AI Probability:** {ai_result['AI Probability']}%")
+
+        # Intrinsic Similarity Results
+        st.subheader("Intrinsic Similarity Detection 🔄")
+        st.write(f"**Average Similarity Score:** {intrinsic_result['similarity_score']}%")
+
+        if intrinsic_result['similar_pairs']:
+            st.write("### Highly Similar Sentence Pairs:")
+            for pair in intrinsic_result['similar_pairs']:
+                st.markdown(
+                    f"""
+                     <div style="background-color:#fff3cd; color:black; padding:15px; border-radius:10px; border:1px solid #ffeeba;">
+                        <strong>1️⃣ {pair['sentence_1']}</strong><br><br>
+                        <strong>2️⃣ {pair['sentence_2']}</strong><br><br>
+                        <em>Similarity: {pair['similarity']}</em>
+                    </div>
+                    """,
+                    unsafe_allow_html=True
+                )
+        else:
+            st.success("No significant self-plagiarism detected!")
+
+        # Semantic mode also matches sentences against previously indexed documents
+        if intrinsic_result.get('index_matches'):
+            st.write("### Sentences Close to Indexed Documents:")
+            for match in intrinsic_result['index_matches']:
+                st.markdown(
+                    f"""
+                    <div style="background-color:#fff3cd; color:black; padding:15px; border-radius:10px; border:1px solid #ffeeba;">
+                        <strong>Submission:</strong> {match['sentence']}<br><br>
+                        <strong>{match['document']}:</strong> {match['match']}<br><br>
+                        <em>Similarity: {match['similarity']}</em>
+                    </div>
+                    """,
+                    unsafe_allow_html=True
+                )
+
+        # 3️⃣ Cross-document check against the local corpus index (if one has been built)
+        corpus_matches = job["result"]["corpus"]
+        if corpus_matches:
+            st.subheader("Cross-Document Matches 📂")
+            for match in corpus_matches:
+                st.write(f"**{match['document']}** — {match['similarity']}% of this text found in the source")
+                for passage in match['passages']:
                     st.markdown(
                         f"""
-                         <div style="background-color:#fff3cd; color:black; padding:15px; border-radius:10px; border:1px solid #ffeeba;">
-                            <strong>1️⃣ {pair['sentence_1']}</strong><br><br>
-                            <strong>2️⃣ {pair['sentence_2']}</strong><br><br>
-                            <em>Similarity: {pair['similarity']}</em>
+                        <div style="background-color:#fff3cd; color:black; padding:15px; border-radius:10px; border:1px solid #ffeeba;">
+                            <strong>Submission:</strong> {passage['submission']}<br><br>
+                            <strong>Source:</strong> {passage['source']}
                         </div>
                         """,
                         unsafe_allow_html=True
                     )
-            else:
-                st.success("No significant self-plagiarism detected!")
+
+        # 4️⃣ Per-sentence view of all three checks
+        with st.expander("Sentence-by-sentence breakdown"):
+            for sentence in job["result"]["sentences"]:
+                ai_probability = sentence['ai_probability'] or 0
+                flagged = ai_probability >= 50 or sentence['line_similarity'] or sentence['sources']
+                notes = [f"AI {ai_probability}%"]
+                if sentence['line_similarity']:
+                    notes.append(f"repeats another line ({sentence['line_similarity']})")
+                if sentence['sources']:
+                    notes.append("found in " + ", ".join(sentence['sources']))
+                st.markdown(
+                    f"""
+                    <div style="background-color:{'#fff3cd' if flagged else '#f8f9fa'}; color:black; padding:8px; border-radius:6px; margin-bottom:4px;">
+                        {sentence['text']}<br><em>{' · '.join(notes)}</em>
+                    </div>
+                    """,
+                    unsafe_allow_html=True
+                )
 
     # Legend (Optional)
     st.markdown("""  
     - 🤖 **AI Authorship Detection**: Detects if the text is likely AI-generated.  
     - 🔄 **Intrinsic Similarity Detection**: Checks for repeated patterns within your document.
+    - 📂 **Cross-Document Matches**: Compares your document with previously indexed submissions.
     """)
 
 elif page == "About":
@@ -1,19 +1,192 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
+import hashlib
+import os
+import threading
+from array import array
+from collections import OrderedDict
 
-model_name = "Hello-SimpleAI/chatgpt-detector-roberta"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForSequenceClassification.from_pretrained(model_name)
+from backend.models import get_model, get_tokenizer
+from backend.cache import cached
+from backend.inference_server import run_batched
+from backend.model_host import hosted
+from backend.telemetry import count, span
 
-def detect_ai_text(text):
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
-    with torch.no_grad():
-        outputs = model(**inputs)
-    logits = outputs.logits
-    probs = torch.softmax(logits, dim=1).numpy()
-    human_prob = probs[0][0]
-    ai_prob = probs[0][1]
+MAX_TOKENS = 512  # RoBERTa position limit, including <s> and </s>
+WINDOW_STRIDE = 256  # tokens between the starts of overlapping windows
+WINDOW_CACHE_ENTRIES = int(os.environ.get("TEXTINOVA_WINDOW_CACHE_ENTRIES", "4096"))
+BOUNDARY_EVERY = 4  # content-defined window boundaries fall after ~1 in 4 paragraphs
+
+_window_scores = OrderedDict()  # hash of window token ids -> [human, ai], LRU order
+_window_lock = threading.Lock()
+
+
+def _probabilities(human_prob, ai_prob):
     return {
-        "Human Probability": round(human_prob * 100, 2),
-        "AI Probability": round(ai_prob * 100, 2)
-    }
\ No newline at end of file
+        "Human Probability": round(float(human_prob) * 100, 2),
+        "AI Probability": round(float(ai_prob) * 100, 2)
+    }
+
+
+def make_windows(ids, stride=WINDOW_STRIDE, sliding_window=True):
+    """
+    Tiles token ids into overlapping windows that fit the model.
+    :return: list of (start, end) token offsets covering the whole text
+    """
+    size = MAX_TOKENS - 2
+    if not sliding_window or len(ids) <= size:
+        return [(0, min(len(ids), size))]
+    starts = list(range(0, len(ids) - size + 1, stride))
+    if starts[-1] + size < len(ids):
+        starts.append(len(ids) - size)  # make sure the tail is scored too
+    return [(start, start + size) for start in starts]
+
+
+def score_windows(windows, batch_size=16):
+    """
+    Runs token-id windows through the detector in padded, length-sorted batches,
+    sharing them with concurrent callers when micro-batching is enabled.
+    :param windows: list of token id lists without special tokens
+    :return: list of [human, ai] probabilities in input order
+    """
+    return run_batched("ai_detector", _score_windows, windows, batch_size=batch_size)
+
+
+@hosted("ai_detector.score", model="ai_detector")
+def _score_windows(windows, batch_size=16):
+    import torch
+
+    tokenizer, model = get_model("ai_detector")
+    order = sorted(range(len(windows)), key=lambda i: len(windows[i]))
+    scores = [None] * len(windows)
+
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        features = [{"input_ids": [tokenizer.cls_token_id] + windows[i] + [tokenizer.sep_token_id]} for i in batch]
+        inputs = tokenizer.pad(features, return_tensors="pt").to(model.device)
+        with span("detect_ai.infer"), torch.no_grad():
+            logits = model(**inputs).logits
+        probs = torch.softmax(logits, dim=1).cpu().numpy()
+        for i, p in zip(batch, probs):
+            scores[i] = p
+    return scores
+
+
+def detect_ai_text_batch(texts, batch_size=16, sliding_window=True, stride=WINDOW_STRIDE):
+    """
+    Scores many texts at once. With sliding_window, each text is tiled into
+    overlapping 512-token windows and the aggregate is the length-weighted mean
+    of its window probabilities; otherwise only the opening window is scored.
+    Windows from all texts share the same batches.
+    """
+    tokenizer = get_tokenizer("ai_detector")
+    with span("detect_ai.tokenize"):
+        token_ids = tokenizer(list(texts), add_special_tokens=False, verbose=False)["input_ids"]
+
+    spans = [make_windows(ids, stride, sliding_window) for ids in token_ids]
+    windows = [ids[a:b] for ids, doc_spans in zip(token_ids, spans) for a, b in doc_spans]
+    scores = iter(score_windows(windows, batch_size))
+
+    return [aggregate_windows(doc_spans, [next(scores) for _ in doc_spans]) for doc_spans in spans]
+
+
+def aggregate_windows(spans, scores):
+    """
+    Combines window scores into the detector result: the length-weighted mean
+    probabilities plus a "windows" list with each window's offsets and scores.
+    """
+    window_results, total, weighted = [], 0, [0.0, 0.0]
+    for (a, b), (human_prob, ai_prob) in zip(spans, scores):
+        weight = max(b - a, 1)
+        weighted[0] += human_prob * weight
+        weighted[1] += ai_prob * weight
+        total += weight
+        window_results.append({"start": a, "end": b, **_probabilities(human_prob, ai_prob)})
+    result = _probabilities(weighted[0] / total, weighted[1] / total)
+    result["windows"] = window_results
+    return result
+
+
+@cached("detect_ai_text", model="ai_detector")
+def detect_ai_text(text):
+    return detect_ai_text_batch([text])[0]
+
+
+# ------------------------
+# Incremental re-analysis of edited documents
+# ------------------------
+def _token_hash(ids):
+    return hashlib.blake2b(array("i", ids).tobytes(), digest_size=16).digest()
+
+
+def score_windows_cached(windows, batch_size=16):
+    """
+    score_windows with an LRU cache keyed on the window's token ids, so windows
+    that survive an edit unchanged are not run through the model again.
+    """
+    keys = [_token_hash(window) for window in windows]
+    with _window_lock:
+        scores = [_window_scores.get(key) for key in keys]
+    missing = {}
+    for i, (key, score) in enumerate(zip(keys, scores)):
+        if score is None:
+            missing.setdefault(key, i)
+    count("detect_ai.window_cache_hits", len(keys) - len(missing))
+    count("detect_ai.window_cache_misses", len(missing))
+    if missing:
+        computed = score_windows([windows[i] for i in missing.values()], batch_size)
+        with _window_lock:
+            for key, score in zip(missing, computed):
+                _window_scores[key] = score
+                _window_scores.move_to_end(key)
+            while len(_window_scores) > WINDOW_CACHE_ENTRIES:
+                _window_scores.popitem(last=False)
+        fresh = dict(zip(missing, computed))
+        scores = [score if score is not None else fresh[key] for key, score in zip(keys, scores)]
+    return scores
+
+
+def paragraph_windows(paragraph_ids, stride=WINDOW_STRIDE):
+    """
+    Groups consecutive paragraphs into windows whose boundaries depend only on
+    paragraph content (a paragraph ends a group when its hash says so, or when the
+    next one would not fit). An edit therefore changes only the windows around the
+    edited paragraph, and the windows before and after it stay identical.
+    :param paragraph_ids: token ids of each paragraph, without special tokens
+    :return: list of (start, end) offsets into the concatenated paragraph tokens
+    """
+    size = MAX_TOKENS - 2
+    spans, group_start, offset = [], 0, 0
+    for ids in paragraph_ids:
+        if len(ids) > size:
+            if offset > group_start:
+                spans.append((group_start, offset))
+            spans.extend((offset + a, offset + b) for a, b in make_windows(ids, stride))
+            offset += len(ids)
+            group_start = offset
+            continue
+        if offset + len(ids) - group_start > size:
+            spans.append((group_start, offset))
+            group_start = offset
+        offset += len(ids)
+        if _token_hash(ids)[0] % BOUNDARY_EVERY == 0:
+            spans.append((group_start, offset))
+            group_start = offset
+    if offset > group_start:
+        spans.append((group_start, offset))
+    return spans or [(0, 0)]
+
+
+def detect_ai_text_incremental(text, batch_size=16, stride=WINDOW_STRIDE):
+    """
+    detect_ai_text for documents that are re-checked after edits: windows follow
+    paragraph boundaries and their scores are cached by content, so only windows
+    touching edited paragraphs are scored again. Scores can differ slightly from
+    detect_ai_text because the windows are cut differently.
+    """
+    tokenizer = get_tokenizer("ai_detector")
+    paragraphs = [p for p in text.split("\n") if p.strip()]
+    with span("detect_ai.tokenize"):
+        paragraph_ids = tokenizer(paragraphs, add_special_tokens=False, verbose=False)["input_ids"] if paragraphs else []
+    ids = [token for p in paragraph_ids for token in p]
+
+    spans = paragraph_windows(paragraph_ids, stride)
+    return aggregate_windows(spans, score_windows_cached([ids[a:b] for a, b in spans], batch_size))
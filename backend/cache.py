@@ -0,0 +1,211 @@
+# backend/cache.py
+"""
+Content-addressed cache for expensive backend results.
+
+Results are keyed on a hash of (normalized text, function, parameters, model
+revision) and kept in an in-memory LRU tier, plus an optional SQLite tier on disk
+with size-based eviction. Streamlit re-runs app.py on every widget change, so an
+identical request is answered from here instead of re-running inference.
+"""
+import contextvars
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from backend.models import model_backend, model_id, model_revision
+from backend.telemetry import count
+
+CACHE_VERSION = 2  # bump when a cached function's output format or algorithm changes
+MEMORY_ENTRIES = int(os.environ.get("TEXTINOVA_CACHE_ENTRIES", "256"))
+DISK_PATH = os.environ.get("TEXTINOVA_CACHE_PATH")  # set to enable the on-disk tier
+DISK_MAX_BYTES = int(os.environ.get("TEXTINOVA_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+
+def normalize_text(text):
+    """
+    Normalizes unicode, line endings and trailing whitespace so trivially different
+    copies of the same document share a cache entry.
+    """
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in text.split("\n")).strip()
+
+
+def make_key(function, text, params, model=None):
+    revision = f"{model_id(model)}@{model_revision(model)}/{model_backend(model)}" if model else None
+    payload = json.dumps([CACHE_VERSION, function, normalize_text(text), params, revision],
+                         sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _encode(value):
+    return json.dumps(value, default=float)  # numpy scalars become floats
+
+
+class ResultCache:
+    """
+    Two-tier cache of JSON-serializable results: an LRU dict in memory and,
+    when disk_path is given, a SQLite table evicted by least recent access.
+    """
+
+    def __init__(self, memory_entries=MEMORY_ENTRIES, disk_path=None, disk_max_bytes=DISK_MAX_BYTES):
+        self.memory_entries = memory_entries
+        self.disk_max_bytes = disk_max_bytes
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0,
+                      "memory_evictions": 0, "disk_evictions": 0}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed REAL NOT NULL
+                )""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self.stats["memory_evictions"] += 1
+
+    def get(self, key):
+        """
+        :return: (hit, value)
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return True, json.loads(self._memory[key])
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row:
+                    with self._db:
+                        self._db.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+                    self._remember(key, row[0])
+                    self.stats["disk_hits"] += 1
+                    return True, json.loads(row[0])
+            self.stats["misses"] += 1
+            return False, None
+
+    def put(self, key, value):
+        """
+        :return: value as get() will return it (decoded from what was stored: tuples become lists, ...)
+        """
+        encoded = _encode(value)
+        with self._lock:
+            self._remember(key, encoded)
+            if self._db is None:
+                return json.loads(encoded)
+            size = len(encoded)
+            with self._db:
+                old = self._db.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+                self._db.execute("INSERT OR REPLACE INTO results (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                                 (key, encoded, size, time.time()))
+                self._disk_bytes += size - (old[0] if old else 0)
+                while self._disk_bytes > self.disk_max_bytes:
+                    oldest = self._db.execute(
+                        "SELECT key, size FROM results ORDER BY accessed LIMIT 1").fetchone()
+                    if oldest is None:
+                        break
+                    self._db.execute("DELETE FROM results WHERE key = ?", (oldest[0],))
+                    self._disk_bytes -= oldest[1]
+                    self.stats["disk_evictions"] += 1
+        return json.loads(encoded)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM results")
+                self._disk_bytes = 0
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            hits = lookups - self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes if self._db is not None else 0,
+            }
+
+
+_cache = ResultCache(disk_path=DISK_PATH)
+_skipped = contextvars.ContextVar("textinova_cache_skipped", default=None)
+
+
+def configure_cache(memory_entries=MEMORY_ENTRIES, disk_path=None, disk_max_bytes=DISK_MAX_BYTES):
+    """
+    Replaces the process-wide cache, e.g. to enable the disk tier at runtime.
+    """
+    global _cache
+    _cache = ResultCache(memory_entries, disk_path, disk_max_bytes)
+    return _cache
+
+
+def get_cache():
+    return _cache
+
+
+def skip_cache():
+    """
+    Called from inside a cached function whose result should not be stored, e.g. one
+    degraded by a time budget: it depends on load, not only on the inputs.
+    """
+    skipped = _skipped.get()
+    if skipped is not None:
+        skipped.append(True)
+
+
+def cached(name, model=None):
+    """
+    Caches a function whose first argument is the input text. Keyword and positional
+    parameters become part of the key; callables (progress callbacks) are ignored.
+    Results of calls that ran skip_cache() are returned but not stored. A miss returns
+    the result in the form a hit would (JSON round-tripped), so callers see one type.
+    The undecorated function stays available as .uncached.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(text, *args, **kwargs):
+            bound = signature.bind(text, *args, **kwargs)
+            bound.apply_defaults()
+            params = {k: v for k, v in list(bound.arguments.items())[1:] if not callable(v)}
+            key = make_key(name, text, params, model)
+
+            hit, value = _cache.get(key)
+            count(f"cache.{name}.{'hits' if hit else 'misses'}")
+            if hit:
+                return value
+            token = _skipped.set([])
+            try:
+                value = func(text, *args, **kwargs)
+                skipped = bool(_skipped.get())
+            finally:
+                _skipped.reset(token)
+            if skipped:
+                count(f"cache.{name}.skipped")
+                return json.loads(_encode(value))
+            return _cache.put(key, value)
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
@@ -0,0 +1,269 @@
+# backend/cli.py
+"""
+Headless batch processing of whole directories of submissions.
+
+    python -m backend.cli integrity  <dir> [-o results.jsonl] [--index corpus_index.sqlite] [--similarity semantic]
+    python -m backend.cli summarize  <dir> [-o summaries.csv] [--length medium] [--tone neutral]
+    python -m backend.cli paraphrase <dir> [-o paraphrased.jsonl] [--option normal]
+    python -m backend.cli index      <dir> [--index corpus_index.sqlite] [--semantic-index semantic_index]
+
+Text is extracted across a process pool while the previous batch of documents
+runs through the models. Finished files are appended to a checkpoint next to
+the output, so an interrupted run picks up where it stopped.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.corpus_index import DEFAULT_INDEX_PATH
+from backend.generation import DEFAULT_PROFILE, PROFILES
+from backend.ingestion import MAX_WORKERS, read_document
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt")
+COLUMNS = {
+    "integrity": ["file", "error", "human_probability", "ai_probability", "similarity_score",
+                  "similar_pairs", "index_matches", "corpus_matches"],
+    "summarize": ["file", "error", "summary"],
+    "paraphrase": ["file", "error", "paraphrase"],
+}
+
+
+def find_documents(directory):
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def _read(path):
+    # Each pool worker extracts its file in-process; the pool already provides the parallelism
+    try:
+        return path, read_document(path, workers=1), None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def iter_document_batches(paths, batch_size, workers):
+    """
+    Yields lists of (path, text, error) while keeping at most two batches of
+    extraction in flight, so memory stays bounded on large directories.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending, batch = deque(), []
+        paths = iter(paths)
+        for path in paths:
+            pending.append(pool.submit(_read, path))
+            if len(pending) >= 2 * batch_size:
+                break
+        while pending:
+            batch.append(pending.popleft().result())
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append(pool.submit(_read, next_path))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+# ------------------------
+# Per-command batch handlers
+# ------------------------
+def run_integrity(texts, args):
+    from backend.integrity import analyze_integrity_batch
+
+    reports = analyze_integrity_batch(texts, index_path=args.index, batch_size=args.model_batch_size,
+                                      similarity_mode=args.similarity, semantic_index=args.semantic_index)
+    results = []
+    for report in reports:
+        ai, intrinsic = report["ai"], report["intrinsic"]
+        results.append({
+            "human_probability": ai["Human Probability"],
+            "ai_probability": ai["AI Probability"],
+            "similarity_score": intrinsic["similarity_score"],
+            "similar_pairs": intrinsic["similar_pairs"],
+            "index_matches": intrinsic.get("index_matches", []),
+            "corpus_matches": report["corpus"],
+        })
+    return results
+
+
+def run_summarize(texts, args):
+    from backend.summarizer import summarize_batch
+
+    summaries = summarize_batch(texts, summary_type=args.type, tone=args.tone, length=args.length,
+                                batch_size=args.model_batch_size, profile=args.profile)
+    return [{"summary": summary} for summary in summaries]
+
+
+def run_paraphrase(texts, args):
+    from backend.paraphraser import paraphrase_texts
+
+    paraphrases = paraphrase_texts(texts, option=args.option, voice_type=args.voice,
+                                   batch_size=args.model_batch_size, profile=args.profile)
+    return [{"paraphrase": paraphrase} for paraphrase in paraphrases]
+
+
+def run_index(texts, args, paths):
+    from backend.corpus_index import CorpusIndex
+
+    with CorpusIndex(args.index) as index:
+        index.add_documents(zip(paths, texts))
+    if args.semantic_index:
+        from backend.intrinsic_detector import split_lines
+        from backend.semantic_index import SemanticIndex
+
+        with SemanticIndex(args.semantic_index) as index:
+            for path, text in zip(paths, texts):
+                index.add_document(path, split_lines(text))
+    return [{"indexed": True} for _ in texts]
+
+
+HANDLERS = {
+    "integrity": run_integrity,
+    "summarize": run_summarize,
+    "paraphrase": run_paraphrase,
+}
+
+
+# ------------------------
+# Output, checkpointing and the main loop
+# ------------------------
+class ResultWriter:
+    """
+    Appends results as JSONL, or as CSV (nested values JSON-encoded) when the path ends in .csv.
+    """
+
+    def __init__(self, path, columns):
+        self.csv = path.lower().endswith(".csv")
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", newline="", encoding="utf-8")
+        if self.csv:
+            self._writer = csv.DictWriter(self._file, fieldnames=columns, extrasaction="ignore")
+            if new_file:
+                self._writer.writeheader()
+
+    def write(self, record):
+        if not self.csv:
+            self._file.write(json.dumps(record, default=float) + "\n")
+            return
+        row = {k: v if isinstance(v, (str, int, float)) or v is None else json.dumps(v, default=float)
+               for k, v in record.items()}
+        self._writer.writerow(row)
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def process_directory(args):
+    paths = find_documents(args.directory)
+    checkpoint_path = (args.output or args.index) + ".checkpoint"
+    done = load_checkpoint(checkpoint_path)
+    todo = [p for p in paths if p not in done]
+    print(f"{len(paths)} documents found, {len(paths) - len(todo)} already done, {len(todo)} to process",
+          file=sys.stderr)
+
+    writer = ResultWriter(args.output, COLUMNS[args.command]) if args.command != "index" else None
+    started, processed, characters = time.perf_counter(), 0, 0
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        for batch in iter_document_batches(todo, args.batch_size, args.workers):
+            ok = [(path, text) for path, text, error in batch if error is None]
+            records = {path: {"file": path, "error": error} for path, _, error in batch if error}
+            for path in records:
+                print(f"{path}: {records[path]['error']}", file=sys.stderr)
+            if ok:
+                texts = [text for _, text in ok]
+                if args.command == "index":
+                    results = run_index(texts, args, [path for path, _ in ok])
+                else:
+                    results = HANDLERS[args.command](texts, args)
+                for (path, text), result in zip(ok, results):
+                    records[path] = {"file": path, **result}
+                    characters += len(text)
+
+            # Results are durable before the checkpoint marks them done
+            if writer:
+                for path, _, _ in batch:
+                    writer.write(records[path])
+                writer.flush()
+            checkpoint.write("".join(path + "\n" for path, _, _ in batch))
+            checkpoint.flush()
+
+            processed += len(batch)
+            elapsed = time.perf_counter() - started
+            print(f"[{processed}/{len(todo)}] {processed / elapsed:.2f} docs/s, "
+                  f"{characters / elapsed / 1000:.1f}k chars/s", file=sys.stderr)
+
+    if writer:
+        writer.close()
+    elapsed = time.perf_counter() - started
+    print(f"Processed {processed} documents in {elapsed:.1f}s "
+          f"({processed / elapsed if elapsed else 0:.2f} docs/s)", file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m backend.cli",
+                                     description="Batch-process a directory of PDF/DOCX/TXT submissions.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(sub, default_output):
+        sub.add_argument("directory", help="directory searched recursively for .pdf, .docx and .txt files")
+        sub.add_argument("-o", "--output", default=default_output, help="results file (.jsonl or .csv)")
+        sub.add_argument("--workers", type=int, default=MAX_WORKERS, help="text extraction processes")
+        sub.add_argument("--batch-size", type=int, default=16, help="documents per inference batch")
+        sub.add_argument("--model-batch-size", type=int, default=8, help="sequences per model forward pass")
+
+    integrity = subparsers.add_parser("integrity", help="AI-authorship and self-similarity checks")
+    add_common(integrity, "integrity.jsonl")
+    integrity.add_argument("--index", help="corpus index to check each submission against")
+    integrity.add_argument("--similarity", choices=["lexical", "semantic"], default="lexical",
+                           help="self-similarity by word overlap or by sentence embeddings")
+    integrity.add_argument("--semantic-index", help="semantic index to match sentences against (semantic mode)")
+
+    summarize = subparsers.add_parser("summarize", help="summarize every document")
+    add_common(summarize, "summaries.jsonl")
+    summarize.add_argument("--type", choices=["abstractive", "extractive"], default="abstractive")
+    summarize.add_argument("--tone", choices=["neutral", "formal", "informal"], default="neutral")
+    summarize.add_argument("--length", choices=["short", "medium", "long"], default="medium")
+    summarize.add_argument("--profile", choices=list(PROFILES), default=DEFAULT_PROFILE, help="generation profile")
+
+    paraphrase = subparsers.add_parser("paraphrase", help="paraphrase every document")
+    add_common(paraphrase, "paraphrased.jsonl")
+    paraphrase.add_argument("--option", default="normal",
+                            choices=["normal", "academic_filter", "first_person_removal", "active_passive"])
+    paraphrase.add_argument("--voice", choices=["passive", "active"], default="passive")
+    paraphrase.add_argument("--profile", choices=list(PROFILES), default=DEFAULT_PROFILE, help="generation profile")
+
+    index = subparsers.add_parser("index", help="add documents to the local corpus index")
+    add_common(index, None)
+    index.add_argument("--index", default=DEFAULT_INDEX_PATH, help="corpus index file")
+    index.add_argument("--semantic-index", help="also add each document's sentences to this semantic index")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    process_directory(args)
+
+
+if __name__ == "__main__":
+    main()
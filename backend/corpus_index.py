@@ -0,0 +1,225 @@
+# backend/corpus_index.py
+"""
+Local cross-document plagiarism index.
+
+Documents are reduced to word shingles, summarised by MinHash signatures and
+bucketed by LSH banding in an on-disk SQLite file. A new submission is compared
+only against the documents sharing at least one band bucket with it, so lookups
+stay sub-linear in corpus size and never touch the network.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import zlib
+
+import numpy as np
+
+SHINGLE_SIZE = 5  # words per shingle
+NUM_PERM = 128  # MinHash permutations
+BANDS = 64  # LSH bands of NUM_PERM // BANDS rows; catches Jaccard similarity down to ~0.12
+MIN_PASSAGE_WORDS = 8  # shortest aligned passage worth reporting
+DEFAULT_INDEX_PATH = os.environ.get("TEXTINOVA_CORPUS_INDEX", "corpus_index.sqlite")
+
+_PRIME = (1 << 61) - 1
+_rng = np.random.RandomState(1)
+# Fixed permutations so signatures stay comparable across runs; a, b < 2^32 keep a*x+b within uint64
+_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+
+def _hash32(value):
+    return zlib.crc32(value.encode("utf-8"))
+
+
+def tokenize(text):
+    """
+    Returns [(word, start, end)] with lowercased words and their character spans.
+    """
+    return [(m.group().lower(), m.start(), m.end()) for m in re.finditer(r"\w+", text)]
+
+
+def shingle_hashes(words, size=SHINGLE_SIZE):
+    """
+    Hashes every run of `size` consecutive words; a short text becomes one shingle.
+    """
+    if len(words) < size:
+        return [_hash32(" ".join(words))] if words else []
+    return [_hash32(" ".join(words[i:i + size])) for i in range(len(words) - size + 1)]
+
+
+def minhash(hashes, chunk_size=4096):
+    signature = np.full(NUM_PERM, _PRIME, dtype=np.uint64)
+    values = np.unique(np.asarray(hashes, dtype=np.uint64))
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start:start + chunk_size]
+        permuted = (_A[:, None] * chunk[None, :] + _B[:, None]) % _PRIME
+        signature = np.minimum(signature, permuted.min(axis=1))
+    return signature
+
+
+def _band_keys(signature):
+    rows = NUM_PERM // BANDS
+    return [int.from_bytes(hashlib.blake2b(signature[b * rows:(b + 1) * rows].tobytes(),
+                                           digest_size=8).digest(), "little", signed=True)
+            for b in range(BANDS)]
+
+
+def align_passages(query_words, source_words, min_words=MIN_PASSAGE_WORDS):
+    """
+    Finds maximal runs of shingles shared, in the same order, by both texts.
+    :return: list of ((query_start, query_end), (source_start, source_end)) word ranges
+    """
+    query_hashes = shingle_hashes(query_words)
+    source_hashes = shingle_hashes(source_words)
+    source_positions = {}
+    for j, h in enumerate(source_hashes):
+        source_positions.setdefault(h, j)
+
+    aligned, i = [], 0
+    while i < len(query_hashes):
+        j = source_positions.get(query_hashes[i])
+        if j is None:
+            i += 1
+            continue
+        length = 1
+        while (i + length < len(query_hashes) and j + length < len(source_hashes)
+               and query_hashes[i + length] == source_hashes[j + length]):
+            length += 1
+        words = length + SHINGLE_SIZE - 1
+        if words >= min_words:
+            aligned.append(((i, min(i + words, len(query_words))),
+                            (j, min(j + words, len(source_words)))))
+        i += length
+    return aligned
+
+
+class CorpusIndex:
+    """
+    Persistent MinHash/LSH index of past submissions stored in a SQLite file.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                name TEXT UNIQUE NOT NULL,
+                text TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                shingles INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL,
+                key INTEGER NOT NULL,
+                doc_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (band, key);
+            CREATE INDEX IF NOT EXISTS buckets_doc ON buckets (doc_id);
+        """)
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def add_documents(self, documents):
+        """
+        Indexes (name, text) pairs in one transaction; a name already present is replaced.
+        """
+        with self._lock, self._db:
+            for name, text in documents:
+                hashes = shingle_hashes([w for w, _, _ in tokenize(text)])
+                signature = minhash(hashes)
+                old = self._db.execute("SELECT id FROM documents WHERE name = ?", (name,)).fetchone()
+                if old:
+                    self._db.execute("DELETE FROM buckets WHERE doc_id = ?", old)
+                    self._db.execute("DELETE FROM documents WHERE id = ?", old)
+                doc_id = self._db.execute(
+                    "INSERT INTO documents (name, text, signature, shingles) VALUES (?, ?, ?, ?)",
+                    (name, text, signature.tobytes(), len(set(hashes)))).lastrowid
+                self._db.executemany(
+                    "INSERT INTO buckets (band, key, doc_id) VALUES (?, ?, ?)",
+                    [(band, key, doc_id) for band, key in enumerate(_band_keys(signature))])
+
+    def add_document(self, name, text):
+        self.add_documents([(name, text)])
+
+    def candidates(self, signature):
+        """
+        Returns the ids of documents sharing at least one LSH bucket with the signature.
+        """
+        ids = set()
+        with self._lock:
+            for band, key in enumerate(_band_keys(signature)):
+                ids.update(row[0] for row in self._db.execute(
+                    "SELECT doc_id FROM buckets WHERE band = ? AND key = ?", (band, key)))
+        return ids
+
+    def query(self, text, threshold=0.1, top_k=10, exclude=None):
+        """
+        Finds indexed documents that the text copies from.
+        :param threshold: minimum estimated share of the submission's shingles found in a source
+        :param exclude: name of a document to ignore (e.g. the submission itself)
+        :return: list of matches with aligned passages, most similar first
+        """
+        tokens = tokenize(text)
+        words = [w for w, _, _ in tokens]
+        hashes = shingle_hashes(words)
+        if not hashes:
+            return []
+        signature = minhash(hashes)
+        size = len(set(hashes))
+
+        scored = []
+        for doc_id in self.candidates(signature):
+            with self._lock:
+                name, source, blob, source_size = self._db.execute(
+                    "SELECT name, text, signature, shingles FROM documents WHERE id = ?", (doc_id,)).fetchone()
+            if name == exclude:
+                continue
+            # Jaccard from the signatures, turned into containment of the submission in the source
+            jaccard = float(np.mean(np.frombuffer(blob, dtype=np.uint64) == signature))
+            containment = min(1.0, jaccard * (size + source_size) / (1 + jaccard) / size)
+            if containment >= threshold:
+                scored.append((containment, name, source))
+        scored.sort(key=lambda item: item[0], reverse=True)
+
+        matches = []
+        for similarity, name, source in scored[:top_k]:
+            source_tokens = tokenize(source)
+            passages = []
+            for (q0, q1), (s0, s1) in align_passages(words, [w for w, _, _ in source_tokens]):
+                passages.append({
+                    "submission": text[tokens[q0][1]:tokens[q1 - 1][2]],
+                    "source": source[source_tokens[s0][1]:source_tokens[s1 - 1][2]],
+                    "submission_span": (tokens[q0][1], tokens[q1 - 1][2]),
+                    "source_span": (source_tokens[s0][1], source_tokens[s1 - 1][2]),
+                })
+            matches.append({
+                "document": name,
+                "similarity": round(similarity * 100, 2),
+                "passages": passages
+            })
+        return matches
+
+
+def check_corpus_plagiarism(text, index_path=DEFAULT_INDEX_PATH, threshold=0.1):
+    """
+    Checks text against the local corpus index.
+    :return: list of matching source documents with aligned passages (empty if no index exists)
+    """
+    if not os.path.exists(index_path):
+        return []
+    with CorpusIndex(index_path) as index:
+        return index.query(text, threshold=threshold)
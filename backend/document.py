@@ -0,0 +1,192 @@
+# backend/document.py
+"""
+Spill-to-disk storage for the text of large uploads.
+
+A SpooledDocument keeps extracted text as UTF-8 in memory until it grows past
+SPILL_MB, then moves it to an anonymous temporary file and serves reads from a
+read-only mmap, so a 500-page PDF costs page cache rather than Python heap. The
+start of every segment (PDF page, DOCX paragraph, TXT chunk) is recorded in
+bytes and characters, so analyzers can read segments, lines or bounded chunks
+lazily and map character offsets back to pages.
+
+Materializing the whole text is limited to MEMORY_CEILING_MB per request; past it
+text() raises DocumentTooLarge and callers must read the document in pieces.
+"""
+import bisect
+import mmap
+import os
+import tempfile
+from array import array
+
+from backend.ingestion import MAX_WORKERS, iter_document
+
+SPILL_MB = float(os.environ.get("TEXTINOVA_DOCUMENT_SPILL_MB", "4"))  # text kept in memory before spilling
+MEMORY_CEILING_MB = float(os.environ.get("TEXTINOVA_REQUEST_MEMORY_MB", "256"))  # largest text() per request
+SPOOL_DIR = os.environ.get("TEXTINOVA_SPOOL_DIR")  # defaults to the system temp directory
+
+
+class DocumentTooLarge(MemoryError):
+    pass
+
+
+class SpooledDocument:
+    """
+    Append-only text store: segments joined by separator, in memory or spilled to a mmap'ed file.
+    """
+
+    def __init__(self, separator="\n", spill_mb=SPILL_MB, memory_ceiling_mb=MEMORY_CEILING_MB):
+        self.separator = separator
+        self.spill_bytes = int(spill_mb * 1024 * 1024)
+        self.memory_ceiling = int(memory_ceiling_mb * 1024 * 1024)
+        self.starts = array("q")  # byte offset of each segment
+        self.ends = array("q")
+        self.char_starts = array("q")  # character offset of each segment in the text
+        self.size = 0  # UTF-8 bytes of text
+        self.chars = 0
+        self.warnings = []  # e.g. pages whose OCR failed during extraction
+        self._buffer = bytearray()
+        self._file = None
+        self._map = None
+
+    # ------------------------
+    # Writing
+    # ------------------------
+    def _write(self, data):
+        if self._file is None and len(self._buffer) + len(data) > self.spill_bytes:
+            self._file = tempfile.TemporaryFile(prefix="textinova-", dir=SPOOL_DIR)
+            self._file.write(self._buffer)
+            self._buffer = bytearray()
+        if self._file is not None:
+            self._file.write(data)
+            self._map = None  # remapped on the next read
+        else:
+            self._buffer += data
+        self.size += len(data)
+
+    def append(self, segment):
+        if self.starts and self.separator:
+            self._write(self.separator.encode("utf-8"))
+            self.chars += len(self.separator)
+        self.starts.append(self.size)
+        self.char_starts.append(self.chars)
+        self._write(segment.encode("utf-8"))
+        self.chars += len(segment)
+        self.ends.append(self.size)
+
+    def close(self):
+        self._map = None
+        if self._file is not None:
+            self._file.close()  # the temporary file is deleted on close
+            self._file = None
+        self._buffer = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------
+    # Reading
+    # ------------------------
+    @property
+    def spilled(self):
+        return self._file is not None
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _view(self):
+        if self._file is None:
+            return self._buffer
+        if self._map is None:
+            self._file.flush()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        return self._map
+
+    def segment(self, index):
+        return bytes(self._view()[self.starts[index]:self.ends[index]]).decode("utf-8")
+
+    def iter_segments(self):
+        for index in range(len(self)):
+            yield self.segment(index)
+
+    def iter_lines(self):
+        """
+        Yields the lines of the text (as text.split("\\n") would) without materializing it.
+        """
+        carry = ""
+        for index, segment in enumerate(self.iter_segments()):
+            if index and self.separator:
+                segment = self.separator + segment
+            lines = (carry + segment).split("\n")
+            carry = lines.pop()
+            yield from lines
+        yield carry
+
+    def iter_chunks(self, max_chars):
+        """
+        Yields consecutive pieces of the text of at most about max_chars, cut at line breaks
+        where possible; joining them with "\\n" gives the text back unless a line had to be cut.
+        """
+        chunk, length = [], 0
+        for line in self.iter_lines():
+            if chunk and length + len(line) > max_chars:
+                yield "\n".join(chunk)
+                chunk, length = [], 0
+            while len(line) > max_chars:  # a single overlong line is cut
+                yield line[:max_chars]
+                line = line[max_chars:]
+            chunk.append(line)
+            length += len(line) + 1
+        if chunk:
+            yield "\n".join(chunk)
+
+    def iter_blocks(self, max_chars):
+        """
+        Yields (char_offset, line_index, block): runs of whole lines of about max_chars (a longer
+        line is a block of its own) with the position of their first line in the text.
+        Joining the blocks with "\\n" gives the text back.
+        """
+        block, length, offset, first = [], 0, 0, 0
+        for index, line in enumerate(self.iter_lines()):
+            if block and length + len(line) > max_chars:
+                yield offset, first, "\n".join(block)
+                offset += length
+                block, length, first = [], 0, index
+            block.append(line)
+            length += len(line) + 1
+        if block:
+            yield offset, first, "\n".join(block)
+
+    def segment_at(self, char_offset):
+        """
+        Index of the segment (for PDFs, the page) containing a character offset of the text.
+        """
+        return max(0, bisect.bisect_right(self.char_starts, char_offset) - 1)
+
+    def text(self):
+        """
+        The whole text as one string; raises DocumentTooLarge above the per-request memory ceiling.
+        """
+        if self.size > self.memory_ceiling:
+            raise DocumentTooLarge(
+                f"Document text is {self.size / 1048576:.1f} MB, above the {self.memory_ceiling / 1048576:.1f} MB "
+                f"per-request limit (TEXTINOVA_REQUEST_MEMORY_MB)")
+        return bytes(self._view()[:self.size]).decode("utf-8")
+
+
+def spool_document(file, name=None, workers=MAX_WORKERS, **kwargs):
+    """
+    Extracts a PDF, DOCX or TXT file into a SpooledDocument, one segment per page,
+    paragraph or chunk, without holding the whole text in memory.
+    """
+    name = name or getattr(file, "name", None) or os.fspath(file)
+    document = SpooledDocument(separator="" if name.lower().endswith(".txt") else "\n", **kwargs)
+    try:
+        for segment in iter_document(file, name, workers, ocr_errors=document.warnings):
+            document.append(segment)
+    except BaseException:
+        document.close()
+        raise
+    return document
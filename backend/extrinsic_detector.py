@@ -1,6 +1,4 @@
 # backend/extrinsic_detector.py
-import requests
-from bs4 import BeautifulSoup
 
 def check_extrinsic_plagiarism(text):
     """
@@ -8,6 +6,9 @@ def check_extrinsic_plagiarism(text):
     :param text: The text to check for plagiarism
     :return: Boolean indicating if plagiarism is detected
     """
+    import requests
+    from bs4 import BeautifulSoup
+
     # URL encode the text for search
     search_query = '+'.join(text.split())
     url = f"https://www.google.com/search?q={search_query}"
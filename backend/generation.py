@@ -0,0 +1,197 @@
+# backend/generation.py
+"""
+Generation profiles and per-request budgets for the seq2seq models.
+
+A profile trades output quality for latency:
+  fast     - greedy decoding, tighter max_length, stop at the first sentence end past min_length
+  balanced - small beam, stop at the first sentence end past min_length
+  quality  - the full beam search the app has always used
+
+A GenerationBudget caps one request's wall-clock time and/or generated tokens.
+Generation that runs out of budget stops early and returns what it has; callers
+fall back to a cheap result for the work they could not start.
+
+stream_generate runs one generate call on a background thread and yields the
+decoded text as tokens arrive. Streaming decodes greedily whatever the profile
+(beam search only knows its best sequence at the end) and stops within one token
+once the caller's cancelled() returns True or the consumer stops iterating.
+"""
+import contextvars
+import os
+import threading
+import time
+
+# profile -> model -> generate settings; length_scale shrinks the max_length target
+PROFILES = {
+    "fast": {
+        "summarizer": {"num_beams": 1, "length_scale": 0.75, "stop_at_sentence_end": True},
+        "paraphraser": {"num_beams": 1, "length_scale": 1.0, "stop_at_sentence_end": True},
+    },
+    "balanced": {
+        "summarizer": {"num_beams": 4, "length_scale": 1.0, "stop_at_sentence_end": True},
+        "paraphraser": {"num_beams": 3, "length_scale": 1.0, "stop_at_sentence_end": True},
+    },
+    "quality": {
+        "summarizer": {"num_beams": 10, "length_scale": 1.0, "stop_at_sentence_end": False},
+        "paraphraser": {"num_beams": 5, "length_scale": 1.0, "stop_at_sentence_end": False},
+    },
+}
+DEFAULT_PROFILE = os.environ.get("TEXTINOVA_GENERATION_PROFILE", "quality")
+
+_SENTENCE_ENDS = (".", "!", "?")
+_sentence_end_ids = {}  # model name -> token ids that end a sentence
+
+
+def profile_settings(profile, model):
+    """
+    Returns the generate settings of a profile for "summarizer" or "paraphraser".
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown generation profile: {profile}")
+    return PROFILES[profile][model]
+
+
+class GenerationBudget:
+    """
+    Wall-clock (seconds) and output-token allowance shared by every generate call of one request.
+    """
+
+    def __init__(self, seconds=None, tokens=None):
+        self.deadline = time.monotonic() + seconds if seconds else None
+        self.tokens_left = tokens
+
+    @property
+    def exhausted(self):
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return True
+        return self.tokens_left is not None and self.tokens_left <= 0
+
+    def limit_length(self, max_length, batch_size):
+        """
+        Caps a per-sequence max_length so the batch cannot spend more than the tokens left.
+        """
+        if self.tokens_left is None:
+            return max_length
+        # At least the decoder start token plus one generated token, which generate requires
+        return max(2, min(max_length, self.tokens_left // max(1, batch_size)))
+
+    def remaining_time(self):
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def charge(self, tokens):
+        if self.tokens_left is not None:
+            self.tokens_left -= tokens
+
+
+def make_budget(time_budget=None, token_budget=None):
+    return GenerationBudget(time_budget, token_budget) if time_budget or token_budget else None
+
+
+class SentenceEndCriteria:
+    """
+    Stopping criterion that finishes each sequence at the first sentence-ending token
+    once it is at least min_length tokens long (the length target is met).
+    """
+
+    def __init__(self, stop_ids, min_length):
+        self.stop_ids = stop_ids
+        self.min_length = min_length
+        self._stop_tensor = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self._stop_tensor is None:
+            self._stop_tensor = input_ids.new_tensor(self.stop_ids)
+        at_sentence_end = (input_ids[:, -1:] == self._stop_tensor).any(dim=1)
+        return at_sentence_end & (input_ids.shape[1] >= self.min_length)
+
+
+def sentence_end_ids(name, tokenizer):
+    if name not in _sentence_end_ids:
+        _sentence_end_ids[name] = [i for token, i in tokenizer.get_vocab().items()
+                                   if token.rstrip().endswith(_SENTENCE_ENDS)]
+    return _sentence_end_ids[name]
+
+
+class CancelCriteria:
+    """
+    Stopping criterion that ends every sequence once cancelled() returns True.
+    """
+
+    def __init__(self, cancelled):
+        self.cancelled = cancelled
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return input_ids.new_full((input_ids.shape[0],), bool(self.cancelled())).bool()
+
+
+def generate_kwargs(name, tokenizer, profile, min_length, max_length, batch_size=1, budget=None, streaming=False,
+                    num_beams=None):
+    """
+    Builds model.generate keyword arguments for a profile, length window and optional budget.
+    num_beams overrides the profile's beam width. With streaming, decoding is greedy whatever the beam width.
+    """
+    from transformers import StoppingCriteriaList
+
+    settings = profile_settings(profile, name)
+    num_beams = 1 if streaming else num_beams or settings["num_beams"]
+    max_length = max(min_length + 1, round(max_length * settings["length_scale"]))
+    kwargs = {"min_length": min_length, "num_beams": num_beams, "early_stopping": num_beams > 1, "use_cache": True}
+    criteria = StoppingCriteriaList()
+    if settings["stop_at_sentence_end"]:
+        criteria.append(SentenceEndCriteria(sentence_end_ids(name, tokenizer), min_length))
+    if budget is not None:
+        max_length = budget.limit_length(max_length, batch_size)
+        kwargs["min_length"] = min(min_length, max_length)
+        if budget.deadline is not None:
+            kwargs["max_time"] = budget.remaining_time()
+    kwargs["max_length"] = max_length
+    if criteria:
+        kwargs["stopping_criteria"] = criteria
+    return kwargs
+
+
+def stream_generate(stage, tokenizer, model, inputs, kwargs, cancelled=None):
+    """
+    Runs model.generate(**inputs, **kwargs) for a single sequence on a background
+    thread and yields decoded text deltas as tokens are produced. The time to the
+    first delta is recorded as "<stage>.first_token".
+    :param kwargs: generate_kwargs(..., streaming=True)
+    :param cancelled: optional callable; generation stops once it returns True
+    """
+    from transformers import StoppingCriteriaList, TextIteratorStreamer
+
+    from backend.telemetry import observe, span
+
+    stopped = threading.Event()
+    streamer = TextIteratorStreamer(tokenizer, skip_special_tokens=True)
+    criteria = StoppingCriteriaList(kwargs.get("stopping_criteria", []))
+    criteria.append(CancelCriteria(lambda: stopped.is_set() or bool(cancelled and cancelled())))
+    errors = []
+
+    def run():
+        try:
+            with span(f"{stage}.infer"):
+                model.generate(**inputs, **{**kwargs, "stopping_criteria": criteria}, streamer=streamer)
+        except Exception as e:
+            errors.append(e)
+            streamer.end()  # unblocks the consumer
+
+    start = time.perf_counter()
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(run,), name=f"{stage}-stream",
+                              daemon=True)
+    thread.start()
+    first = True
+    try:
+        for delta in streamer:
+            if not delta:
+                continue
+            if first:
+                observe(f"{stage}.first_token", time.perf_counter() - start)
+                first = False
+            yield delta
+    finally:
+        # Also reached when the consumer abandons the generator: stop generating
+        stopped.set()
+        thread.join()
+    if errors:
+        raise errors[0]
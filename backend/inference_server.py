@@ -0,0 +1,152 @@
+# backend/inference_server.py
+"""
+Dynamic micro-batching for model forward passes.
+
+Concurrent callers of the same model (and the same generation settings) are
+collected for up to max_wait seconds or max_batch_size items, run as one padded
+batch, and each caller gets back exactly its own outputs. Enable it with
+TEXTINOVA_MICRO_BATCHING=1 or enable_micro_batching(); when it is off, callers
+run their batch directly as before.
+"""
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+MAX_BATCH_SIZE = int(os.environ.get("TEXTINOVA_MICRO_BATCH_SIZE", "32"))  # items per forward batch
+# Per-model caps, overridable with TEXTINOVA_MICRO_BATCH_SIZE_<NAME>. The summarizer runs one BART-large
+# generate over up to 1024-token inputs (times the beam width) per batch, so it keeps its own batch_size of 4;
+# the paraphraser and detector split pooled items by their batch_size parameter themselves.
+MODEL_BATCH_SIZES = {"summarizer": 4}
+MAX_WAIT = float(os.environ.get("TEXTINOVA_MICRO_BATCH_WAIT_MS", "10")) / 1000
+
+_enabled = os.environ.get("TEXTINOVA_MICRO_BATCHING", "0") == "1"
+_batchers = {}
+_lock = threading.Lock()
+
+
+class MicroBatcher:
+    """
+    Collects item lists from many callers and runs them through run_batch together.
+    run_batch(items) must return one output per item, in order.
+    """
+
+    def __init__(self, name, run_batch, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._requests = deque()  # (items, future, enqueued at)
+        self._queued_items = 0
+        self._condition = threading.Condition()
+        self.stats = {"requests": 0, "batches": 0, "items": 0, "max_queue_depth": 0, "wait_s": 0.0}
+        self.batch_sizes = Counter()
+        threading.Thread(target=self._loop, name=f"batcher-{name}", daemon=True).start()
+
+    def submit(self, items):
+        """
+        :return: Future resolving to the outputs for items
+        """
+        future = Future()
+        if not items:
+            future.set_result([])
+            return future
+        with self._condition:
+            self._requests.append((list(items), future, time.monotonic()))
+            self._queued_items += len(items)
+            self.stats["requests"] += 1
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self._queued_items)
+            self._condition.notify()
+        return future
+
+    def __call__(self, items):
+        return self.submit(items).result()
+
+    def _take_batch(self):
+        with self._condition:
+            while not self._requests:
+                self._condition.wait()
+            deadline = self._requests[0][2] + self.max_wait
+            while self._queued_items < self.max_batch_size and time.monotonic() < deadline:
+                self._condition.wait(max(0.0, deadline - time.monotonic()))
+
+            # A request is never split, so one large request may exceed max_batch_size on its own
+            batch, size = [], 0
+            while self._requests and (not batch or size + len(self._requests[0][0]) <= self.max_batch_size):
+                request = self._requests.popleft()
+                batch.append(request)
+                size += len(request[0])
+            self._queued_items -= size
+            return batch, size
+
+    def _loop(self):
+        while True:
+            batch, size = self._take_batch()
+            now = time.monotonic()
+            items = [item for request_items, _, _ in batch for item in request_items]
+            try:
+                outputs = self.run_batch(items)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            self.stats["batches"] += 1
+            self.stats["items"] += size
+            self.stats["wait_s"] += sum(now - enqueued for _, _, enqueued in batch)
+            self.batch_sizes[size] += 1
+
+            offset = 0
+            for request_items, future, _ in batch:
+                future.set_result(outputs[offset:offset + len(request_items)])
+                offset += len(request_items)
+
+    def metrics(self):
+        with self._condition:
+            batches = self.stats["batches"]
+            return {
+                **self.stats,
+                "queue_depth": self._queued_items,
+                "mean_batch_size": round(self.stats["items"] / batches, 2) if batches else 0.0,
+                "mean_wait_s": round(self.stats["wait_s"] / self.stats["requests"], 4) if self.stats["requests"] else 0.0,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            }
+
+
+def max_batch_size(name):
+    return int(os.environ.get(f"TEXTINOVA_MICRO_BATCH_SIZE_{name.upper()}",
+                              MODEL_BATCH_SIZES.get(name, MAX_BATCH_SIZE)))
+
+
+def enable_micro_batching(enabled=True):
+    global _enabled
+    _enabled = enabled
+
+
+def micro_batching_enabled():
+    return _enabled
+
+
+def run_batched(name, run_batch, items, **params):
+    """
+    Runs run_batch(items, **params), coalescing with concurrent calls that share
+    name and params when micro-batching is enabled.
+    """
+    if not _enabled:
+        return run_batch(items, **params)
+    key = (name, tuple(sorted(params.items())))
+    with _lock:
+        batcher = _batchers.get(key)
+        if batcher is None:
+            batcher = _batchers[key] = MicroBatcher(name, lambda batch: run_batch(batch, **params),
+                                                    max_batch_size=max_batch_size(name))
+    return batcher(items)
+
+
+def batching_metrics():
+    """
+    Returns {"model params": metrics} for every active batcher.
+    """
+    with _lock:
+        batchers = dict(_batchers)
+    return {f"{name} {dict(params)}": batcher.metrics() for (name, params), batcher in batchers.items()}
@@ -0,0 +1,198 @@
+# backend/ingestion.py
+"""
+Streaming document ingestion for PDF, DOCX and TXT uploads.
+
+Text is yielded page by page (or paragraph by paragraph) instead of being
+accumulated into one string. PDF pages are extracted across a process pool,
+rasterized one at a time, and OCR'd only when a page has no text layer.
+
+The pool is shared by all calls and started with "spawn": the app process runs
+threads and holds loaded models, and forking such a process can deadlock.
+"""
+import codecs
+import itertools
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from backend.telemetry import timed
+
+OCR_DPI = 300
+PAGES_PER_TASK = 8  # pages handed to a worker at once
+MAX_WORKERS = int(os.environ.get("TEXTINOVA_INGEST_WORKERS", os.cpu_count() or 1))
+TXT_CHUNK_SIZE = 1 << 16  # bytes decoded per step when streaming text files
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+@contextmanager
+def _as_path(file, suffix):
+    """
+    Yields a filesystem path for file. Uploaded file objects are spooled to a
+    temporary file so pool workers can open the document themselves.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        yield os.fspath(file)
+        return
+    if hasattr(file, "seek"):
+        file.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        shutil.copyfileobj(file, tmp)
+    try:
+        yield tmp.name
+    finally:
+        os.remove(tmp.name)
+
+
+def _ocr_page(page):
+    import pytesseract
+    from PIL import Image
+    import fitz
+
+    # Only this page is rendered, so memory stays at one bitmap per worker
+    pixmap = page.get_pixmap(dpi=OCR_DPI, colorspace=fitz.csGRAY, alpha=False)
+    image = Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+    return pytesseract.image_to_string(image)
+
+
+def _extract_pages(path, start, stop, ocr_fallback=True, force_ocr=False):
+    """
+    :return: [(text, error)] per page, where error describes a failed fallback OCR (else None)
+    """
+    import fitz
+
+    pages = []
+    with fitz.open(path) as doc:
+        for number in range(start, stop):
+            page = doc[number]
+            text, error = "" if force_ocr else page.get_text("text"), None
+            if force_ocr:
+                text = _ocr_page(page)
+            elif ocr_fallback and not text.strip():
+                # Blank separators and image-only covers are common; without a working
+                # tesseract they stay empty rather than failing the whole document
+                try:
+                    text = _ocr_page(page)
+                except Exception as e:
+                    error = f"OCR of page {number + 1} failed: {type(e).__name__}: {e}"
+            pages.append((text, error))
+    return pages
+
+
+def iter_pdf_pages(file, ocr_fallback=True, force_ocr=False, workers=MAX_WORKERS, ocr_errors=None):
+    """
+    Yields the text of each PDF page in order.
+    :param file: path or binary file object
+    :param ocr_fallback: OCR pages that have no text layer (pages whose OCR fails stay empty)
+    :param force_ocr: OCR every page, ignoring the text layer
+    :param workers: extraction tasks run at once in the shared process pool (1 = in-process)
+    :param ocr_errors: list that receives a message per page whose fallback OCR failed;
+        without it the messages go to stderr
+    """
+    import fitz
+
+    def pages(results):
+        for text, error in results:
+            if error is not None:
+                if ocr_errors is None:
+                    print(f"ingestion: {error}", file=sys.stderr)
+                else:
+                    ocr_errors.append(error)
+            yield text
+
+    with _as_path(file, ".pdf") as path:
+        with fitz.open(path) as doc:
+            page_count = doc.page_count
+        ranges = [(start, min(start + PAGES_PER_TASK, page_count))
+                  for start in range(0, page_count, PAGES_PER_TASK)]
+
+        if workers <= 1 or len(ranges) <= 1:
+            for start, stop in ranges:
+                yield from pages(_extract_pages(path, start, stop, ocr_fallback, force_ocr))
+            return
+
+        # At most `workers` tasks in flight, so an abandoned generator leaves little queued work
+        pool, futures, ranges = _get_pool(), [], iter(ranges)
+        try:
+            for start, stop in itertools.islice(ranges, workers):
+                futures.append(pool.submit(_extract_pages, path, start, stop, ocr_fallback, force_ocr))
+            while futures:
+                results = futures.pop(0).result()
+                for start, stop in itertools.islice(ranges, 1):
+                    futures.append(pool.submit(_extract_pages, path, start, stop, ocr_fallback, force_ocr))
+                yield from pages(results)
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def iter_docx_paragraphs(file):
+    """
+    Yields the text of each DOCX paragraph in order.
+    """
+    from docx import Document
+
+    for para in Document(file).paragraphs:
+        yield para.text
+
+
+def iter_txt_chunks(file, encoding="utf-8", chunk_size=TXT_CHUNK_SIZE):
+    """
+    Yields decoded text from a binary file object chunk by chunk.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    while True:
+        data = file.read(chunk_size)
+        if not data:
+            break
+        yield decoder.decode(data)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_document(file, name=None, workers=MAX_WORKERS, ocr_errors=None):
+    """
+    Yields text segments (PDF pages, DOCX paragraphs or TXT chunks) based on the file extension.
+    :param ocr_errors: see iter_pdf_pages
+    """
+    name = name or getattr(file, "name", None) or os.fspath(file)
+    file_type = name.rsplit('.', 1)[-1].lower()
+
+    if file_type == 'pdf':
+        yield from iter_pdf_pages(file, workers=workers, ocr_errors=ocr_errors)
+    elif file_type == 'docx':
+        yield from iter_docx_paragraphs(file)
+    elif file_type == 'txt':
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, "rb") as f:
+                yield from iter_txt_chunks(f)
+        else:
+            yield from iter_txt_chunks(file)
+    else:
+        raise ValueError("Unsupported file type")
+
+
+@timed("ingest.read_document")
+def read_document(file, name=None, workers=MAX_WORKERS, ocr_errors=None):
+    """
+    Extracts the full text of a PDF, DOCX or TXT file.
+    :param ocr_errors: see iter_pdf_pages
+    """
+    file_type = (name or getattr(file, "name", None) or os.fspath(file)).rsplit('.', 1)[-1].lower()
+    separator = "" if file_type == 'txt' else "\n"
+    return separator.join(iter_document(file, name, workers, ocr_errors))
@@ -0,0 +1,325 @@
+# backend/integrity.py
+"""
+Fused integrity check.
+
+analyze_integrity segments the document once (backend.segmentation), feeds the
+same paragraphs, sentences and token ids to the AI-authorship detector, the
+intrinsic similarity check and the corpus index, runs those stages concurrently
+so TF-IDF work overlaps with model inference, and returns one report with
+per-sentence annotations. analyze_integrity_batch does so for many documents
+at once, with the detector windows of all of them sharing batches.
+
+analyze_document does the same for a document.SpooledDocument without reading
+the whole text: the detector and the corpus index see it in blocks of whole
+lines, and only the lines long enough for the self-similarity check are kept.
+"""
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.AI_detector import (aggregate_windows, make_windows, paragraph_windows, score_windows,
+                                 score_windows_cached)
+from backend.cache import get_cache, make_key
+from backend.corpus_index import DEFAULT_INDEX_PATH, check_corpus_plagiarism
+from backend.corpus_index import tokenize as corpus_words
+from backend.intrinsic_detector import intrinsic_similarity, intrinsic_similarity_incremental
+from backend.models import get_tokenizer
+from backend.segmentation import Document
+from backend.telemetry import count, span
+
+PIECE_CHARS = int(os.environ.get("TEXTINOVA_INTEGRITY_PIECE_CHARS", "200000"))  # text analyzed at a time
+
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("TEXTINOVA_INTEGRITY_THREADS", "3")),
+                               thread_name_prefix="integrity")
+
+
+def _cached(name, text, compute, model=None):
+    cache = get_cache()
+    key = make_key(name, text, {}, model)
+    hit, value = cache.get(key)
+    count(f"cache.{name}.{'hits' if hit else 'misses'}")
+    if not hit:
+        value = cache.put(key, compute())
+    return value
+
+
+def _cached_batch(name, texts, compute, model=None):
+    """
+    _cached for several texts: compute(indices) returns the values of the texts that missed.
+    """
+    cache = get_cache()
+    keys = [make_key(name, text, {}, model) for text in texts]
+    values, missing = [], []
+    for i, key in enumerate(keys):
+        hit, value = cache.get(key)
+        count(f"cache.{name}.{'hits' if hit else 'misses'}")
+        values.append(value)
+        if not hit:
+            missing.append(i)
+    if missing:
+        for i, value in zip(missing, compute(missing)):
+            values[i] = cache.put(keys[i], value)
+    return values
+
+
+def _detect_ai(document, incremental, batch_size):
+    tokenizer = get_tokenizer("ai_detector")
+    with span("integrity.tokenize"):
+        ids = document.tokenize(tokenizer)
+    if incremental:
+        # Paragraph-aligned windows, scored only when their tokens are new
+        spans = paragraph_windows(document.paragraph_token_ids())
+        return aggregate_windows(spans, score_windows_cached([ids[a:b] for a, b in spans], batch_size))
+    spans = make_windows(ids)
+    return aggregate_windows(spans, score_windows([ids[a:b] for a, b in spans], batch_size))
+
+
+def _detect_ai_batch(documents, batch_size):
+    tokenizer = get_tokenizer("ai_detector")
+    with span("integrity.tokenize"):
+        token_ids = [document.tokenize(tokenizer) for document in documents]
+    spans = [make_windows(ids) for ids in token_ids]
+    scores = iter(score_windows([ids[a:b] for ids, doc_spans in zip(token_ids, spans) for a, b in doc_spans],
+                                batch_size))
+    return [aggregate_windows(doc_spans, [next(scores) for _ in doc_spans]) for doc_spans in spans]
+
+
+def _long_lines(lines):
+    return [line for line in lines if len(line.strip()) > 20]  # filter short lines
+
+
+def _intrinsic(document, document_id, similarity_mode="lexical", semantic_index=None):
+    return _intrinsic_lines(_long_lines(document.paragraph_text(i) for i in range(len(document.paragraphs))),
+                            document_id, similarity_mode, semantic_index)
+
+
+def _intrinsic_lines(lines, document_id, similarity_mode="lexical", semantic_index=None):
+    with span("integrity.intrinsic"):
+        if similarity_mode == "semantic":
+            from backend.semantic_index import DEFAULT_SEMANTIC_INDEX, semantic_similarity
+            return semantic_similarity(lines, semantic_index or DEFAULT_SEMANTIC_INDEX)
+        if document_id:
+            return intrinsic_similarity_incremental(lines, document_id)
+        return intrinsic_similarity(lines)
+
+
+def _corpus(document, index_path):
+    if not index_path:
+        return []
+    with span("integrity.corpus"):
+        return check_corpus_plagiarism(document.text, index_path)
+
+
+def annotate_sentences(document, ai_result, intrinsic_result, corpus_matches):
+    """
+    Per-sentence view of the three checks: the AI probability of the windows
+    covering the sentence (weighted by overlap), the highest similarity of its
+    line to another line, and the corpus documents it was found in.
+    """
+    line_similarity = {}
+    for pair in intrinsic_result["similar_pairs"]:
+        for line in (pair["sentence_1"], pair["sentence_2"]):
+            line_similarity[line] = max(line_similarity.get(line, 0), pair["similarity"])
+
+    sources = [[] for _ in document.sentences]
+    for match in corpus_matches:
+        for passage in match["passages"]:
+            start, end = passage["submission_span"]
+            for sentence in document.sentences:
+                if sentence.start < end and start < sentence.end and match["document"] not in sources[sentence.index]:
+                    sources[sentence.index].append(match["document"])
+
+    windows = ai_result["windows"]
+    annotations = []
+    for sentence in document.sentences:
+        weighted = total = 0
+        for window in windows:
+            overlap = min(window["end"], sentence.token_end) - max(window["start"], sentence.token_start)
+            if overlap > 0:
+                weighted += window["AI Probability"] * overlap
+                total += overlap
+        annotations.append({
+            "text": document.sentence_text(sentence),
+            "start": sentence.start,
+            "end": sentence.end,
+            "paragraph": sentence.paragraph,
+            "ai_probability": round(weighted / total, 2) if total else None,
+            "line_similarity": line_similarity.get(document.paragraph_text(sentence.paragraph)),
+            "sources": sources[sentence.index],
+        })
+    return annotations
+
+
+def analyze_integrity(document, document_id=None, index_path=DEFAULT_INDEX_PATH, batch_size=16, on_progress=None,
+                      similarity_mode="lexical", semantic_index=None):
+    """
+    Runs every integrity check on one document.
+    :param document: text or a segmentation.Document
+    :param document_id: id of a draft being edited; enables incremental re-analysis across its versions
+    :param index_path: corpus index file; None skips the corpus check
+    :param on_progress: optional callback(fraction, message) called as stages finish
+    :param similarity_mode: "lexical" or "semantic", see intrinsic_plagiarism_score
+    :param semantic_index: semantic index directory matched against in semantic mode
+    :return: {"ai": ..., "intrinsic": ..., "corpus": ..., "sentences": [...]}, where the first
+        three have the formats of detect_ai_text, intrinsic_plagiarism_score and check_corpus_plagiarism
+    """
+    if isinstance(document, str):
+        with span("integrity.segment"):
+            document = Document(document)
+    text = document.text
+
+    # Stage functions run in pool threads but report their spans to this request's trace
+    def submit(func, *args):
+        return _executor.submit(contextvars.copy_context().run, func, *args)
+
+    if document_id:
+        ai_future = submit(_detect_ai, document, True, batch_size)
+    else:
+        ai_future = submit(_cached, "integrity.ai", text, lambda: _detect_ai(document, False, batch_size),
+                           "ai_detector")
+    if document_id or similarity_mode == "semantic":  # semantic results change as the index grows
+        intrinsic_future = submit(_intrinsic, document, document_id, similarity_mode, semantic_index)
+    else:
+        intrinsic_future = submit(_cached, "integrity.intrinsic", text, lambda: _intrinsic(document, None))
+    corpus_future = submit(_corpus, document, index_path)
+
+    stages = [("ai", ai_future, "AI authorship scored"), ("intrinsic", intrinsic_future, "Self-similarity checked"),
+              ("corpus", corpus_future, "Corpus index searched")]
+    report = {}
+    for done, (name, future, message) in enumerate(stages, 1):
+        report[name] = future.result()
+        if on_progress:
+            on_progress(done / (len(stages) + 1), message)
+
+    return _annotated(document, report)
+
+
+def analyze_integrity_batch(documents, index_path=DEFAULT_INDEX_PATH, batch_size=16, similarity_mode="lexical",
+                            semantic_index=None):
+    """
+    analyze_integrity for several documents. The detector windows of all documents share
+    batches, so many short submissions still fill them; the other checks run per document.
+    :param documents: texts or segmentation.Documents
+    :return: one analyze_integrity report per document
+    """
+    with span("integrity.segment"):
+        documents = [Document(document) if isinstance(document, str) else document for document in documents]
+
+    def submit(func, *args):
+        return _executor.submit(contextvars.copy_context().run, func, *args)
+
+    ai_future = submit(_cached_batch, "integrity.ai", [document.text for document in documents],
+                       lambda missing: _detect_ai_batch([documents[i] for i in missing], batch_size), "ai_detector")
+    if similarity_mode == "semantic":
+        intrinsic_futures = [submit(_intrinsic, document, None, similarity_mode, semantic_index)
+                             for document in documents]
+    else:
+        intrinsic_futures = [submit(_cached, "integrity.intrinsic", document.text,
+                                    functools.partial(_intrinsic, document, None)) for document in documents]
+    corpus_futures = [submit(_corpus, document, index_path) for document in documents]
+
+    return [_annotated(document, {"ai": ai, "intrinsic": intrinsic.result(), "corpus": corpus.result()})
+            for document, ai, intrinsic, corpus in zip(documents, ai_future.result(), intrinsic_futures,
+                                                       corpus_futures)]
+
+
+def _annotated(document, report):
+    if document.token_ids is None:  # AI result came from the cache
+        document.tokenize(get_tokenizer("ai_detector"))
+    report["sentences"] = annotate_sentences(document, report["ai"], report["intrinsic"], report["corpus"])
+    return report
+
+
+# ------------------------
+# Spooled documents
+# ------------------------
+def _merge_ai(parts):
+    """
+    Combines the detector results of consecutive blocks, shifting window offsets into the whole document.
+    :param parts: [(token offset of the block, detector result)]
+    """
+    windows, weighted, total = [], [0.0, 0.0], 0
+    for token_offset, result in parts:
+        weight = sum(max(w["end"] - w["start"], 1) for w in result["windows"])
+        weighted[0] += result["Human Probability"] * weight
+        weighted[1] += result["AI Probability"] * weight
+        total += weight
+        windows += [{**w, "start": w["start"] + token_offset, "end": w["end"] + token_offset}
+                     for w in result["windows"]]
+    if not total:
+        return parts[0][1]
+    return {"Human Probability": round(weighted[0] / total, 2), "AI Probability": round(weighted[1] / total, 2),
+            "windows": windows}
+
+
+def _merge_corpus(parts, total_words):
+    """
+    Combines the corpus matches of consecutive blocks: a source's similarity becomes the
+    word-weighted share of the document found in it, and passage spans are shifted.
+    :param parts: [(character offset of the block, words in the block, matches)]
+    """
+    merged = {}
+    for offset, words, matches in parts:
+        for match in matches:
+            entry = merged.setdefault(match["document"], {"document": match["document"], "similarity": 0.0,
+                                                          "passages": []})
+            entry["similarity"] += match["similarity"] * words / max(total_words, 1)
+            entry["passages"] += [{**passage, "submission_span": (passage["submission_span"][0] + offset,
+                                                                  passage["submission_span"][1] + offset)}
+                                  for passage in match["passages"]]
+    for entry in merged.values():
+        entry["similarity"] = round(entry["similarity"], 2)
+    return sorted(merged.values(), key=lambda entry: entry["similarity"], reverse=True)
+
+
+def analyze_document(document, document_id=None, index_path=DEFAULT_INDEX_PATH, batch_size=16, on_progress=None,
+                     similarity_mode="lexical", semantic_index=None, piece_chars=PIECE_CHARS):
+    """
+    analyze_integrity for a document.SpooledDocument, read piece_chars of whole lines at a time.
+    Each block is segmented, scored and looked up in the corpus index on its own and then
+    dropped, so token ids and sentences never exist for the whole text at once; detector
+    windows and corpus passages do not span blocks. Annotation offsets are into the whole
+    text, and each annotation also gives the segment (PDF page) its sentence starts on.
+    """
+    def submit(func, *args):
+        return _executor.submit(contextvars.copy_context().run, func, *args)
+
+    # Self-similarity compares every line with every other, so its lines are collected first
+    with span("integrity.segment"):
+        lines = _long_lines(document.iter_lines())
+    intrinsic_future = submit(_intrinsic_lines, lines, document_id, similarity_mode, semantic_index)
+    tokenizer = get_tokenizer("ai_detector")
+
+    ai_parts, corpus_parts, sentences = [], [], []
+    token_offset = total_words = 0
+    for offset, first_line, block in document.iter_blocks(piece_chars):
+        with span("integrity.segment"):
+            piece = Document(block)
+        if document_id:
+            ai_future = submit(_detect_ai, piece, True, batch_size)
+        else:
+            ai_future = submit(_cached, "integrity.ai", block, lambda: _detect_ai(piece, False, batch_size),
+                               "ai_detector")
+        corpus_future = submit(_corpus, piece, index_path)
+        ai, matches = ai_future.result(), corpus_future.result()
+        if piece.token_ids is None:  # AI result came from the cache
+            piece.tokenize(tokenizer)
+
+        for annotation in annotate_sentences(piece, ai, intrinsic_future.result(), matches):
+            annotation["start"] += offset
+            annotation["end"] += offset
+            annotation["paragraph"] += first_line
+            annotation["segment"] = document.segment_at(annotation["start"])
+            sentences.append(annotation)
+        words = len(corpus_words(block))
+        ai_parts.append((token_offset, ai))
+        corpus_parts.append((offset, words, matches))
+        token_offset += len(piece.token_ids)
+        total_words += words
+        if on_progress:
+            done = min(offset + len(block), document.chars) / max(document.chars, 1)
+            on_progress(done * 0.9, f"Checked {done:.0%} of the document")
+
+    return {"ai": _merge_ai(ai_parts), "intrinsic": intrinsic_future.result(),
+            "corpus": _merge_corpus(corpus_parts, total_words), "sentences": sentences}
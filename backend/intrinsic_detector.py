@@ -1,37 +1,290 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import threading
+from collections import Counter, OrderedDict
 
-def intrinsic_plagiarism_score(text):
-    sentences = [s for s in text.split('\n') if len(s.strip()) > 20]  # filter short lines
+import numpy as np
+from backend.cache import cached
+from backend.telemetry import span
+
+SIMILARITY_THRESHOLD = 0.7  # tweak threshold if needed
+MAX_BLOCK_ENTRIES = 4_000_000  # caps the similarity block held in memory (~50 MB)
+
+
+def mean_pairwise_similarity(matrix):
+    """
+    Mean cosine similarity over all pairs i < j, without building the n x n matrix.
+    TF-IDF rows are L2-normalised, so sum_{i<j} x_i.x_j = (|sum_i x_i|^2 - sum_i |x_i|^2) / 2.
+    """
+    n = matrix.shape[0]
+    column_sum = np.asarray(matrix.sum(axis=0)).ravel()
+    self_similarity = matrix.multiply(matrix).sum()
+    pair_sum = (column_sum @ column_sum - self_similarity) / 2
+    return pair_sum / (n * (n - 1) / 2)
+
+
+def iter_similar_pairs(matrix, threshold=SIMILARITY_THRESHOLD, max_block_entries=MAX_BLOCK_ENTRIES):
+    """
+    Yields (i, j, similarity) for i < j with similarity above threshold, using blockwise
+    sparse products of a row block against the rows after it. The block height is chosen
+    so that at most max_block_entries similarities are materialised at once.
+    """
+    matrix = matrix.tocsr()
+    transposed = matrix.T.tocsc()
+    n = matrix.shape[0]
+    block_size = max(1, max_block_entries // max(n, 1))
+
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        block = (matrix[start:stop] @ transposed[:, start:]).tocoo()
+        rows = block.row + start
+        cols = block.col + start
+        keep = (cols > rows) & (block.data > threshold)
+        rows, cols, sims = rows[keep], cols[keep], block.data[keep]
+        for k in np.lexsort((cols, rows)):
+            yield int(rows[k]), int(cols[k]), float(sims[k])
+
+
+def iter_row_blocks(matrix, rows, max_block_entries=MAX_BLOCK_ENTRIES):
+    """
+    Yields (rows, columns, similarities) arrays of the given rows against every row, one
+    block of rows at a time, sized like iter_similar_pairs's so that at most
+    max_block_entries similarities are materialised at once.
+    """
+    matrix = matrix.tocsr()
+    transposed = matrix.T.tocsc()
+    rows = np.asarray(rows)
+    block_size = max(1, max_block_entries // max(matrix.shape[0], 1))
+
+    for start in range(0, len(rows), block_size):
+        block_rows = rows[start:start + block_size]
+        block = (matrix[block_rows] @ transposed).tocoo()
+        yield block_rows[block.row], block.col, block.data
+
+
+def split_lines(text):
+    return [s for s in text.split('\n') if len(s.strip()) > 20]  # filter short lines
+
+
+def intrinsic_plagiarism_score(text, mode="lexical", index_path=None):
+    """
+    Self-similarity of the lines of a text.
+    :param mode: "lexical" (TF-IDF overlap) or "semantic" (sentence embeddings, which also
+        catch paraphrased repetition and report "index_matches" against the semantic index)
+    :param index_path: semantic index directory (semantic mode only)
+    """
+    if mode == "semantic":
+        from backend.semantic_index import DEFAULT_SEMANTIC_INDEX, semantic_similarity
+        return semantic_similarity(split_lines(text), index_path or DEFAULT_SEMANTIC_INDEX)
+    if mode != "lexical":
+        raise ValueError(f"Unknown similarity mode: {mode}")
+    return lexical_plagiarism_score(text)
+
+
+@cached("intrinsic_plagiarism_score")
+def lexical_plagiarism_score(text):
+    return intrinsic_similarity(split_lines(text))
+
+
+def intrinsic_similarity(sentences):
+    """
+    intrinsic_plagiarism_score over lines that were already split out of the text.
+    """
     if len(sentences) < 2:
         return {
             "similarity_score": 0,
             "similar_pairs": []
         }
-    
-    vectorizer = TfidfVectorizer().fit_transform(sentences)
-    similarity_matrix = cosine_similarity(vectorizer)
-
-    similar_pairs = []
-    n = len(sentences)
-    total_similarity = 0
-    count = 0
-
-    for i in range(n):
-        for j in range(i + 1, n):
-            sim = similarity_matrix[i, j]
-            if sim > 0.7:  # tweak threshold if needed
-                similar_pairs.append({
-                    "sentence_1": sentences[i],
-                    "sentence_2": sentences[j],
-                    "similarity": round(sim, 2)
-                })
-            total_similarity += sim
-            count += 1
-
-    avg_similarity = (total_similarity / count) * 100 if count > 0 else 0
+
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    with span("intrinsic.tfidf"):
+        matrix = TfidfVectorizer().fit_transform(sentences)
+
+    with span("intrinsic.pairs"):
+        similar_pairs = [{
+            "sentence_1": sentences[i],
+            "sentence_2": sentences[j],
+            "similarity": round(sim, 2)
+        } for i, j, sim in iter_similar_pairs(matrix)]
+
+    avg_similarity = mean_pairwise_similarity(matrix) * 100
 
     return {
-        "similarity_score": round(avg_similarity, 2),
+        "similarity_score": round(float(avg_similarity), 2),
         "similar_pairs": similar_pairs
-    }
\ No newline at end of file
+    }
+
+
+# ------------------------
+# Incremental re-analysis of edited documents
+# ------------------------
+CANDIDATE_MARGIN = 0.1  # near-threshold pairs kept so later idf drift cannot hide a new match
+# Terms whose weight moved by more than this are "drifted"; the bound keeps the growth of any
+# cosine built from the other terms within 1 / (1 - CANDIDATE_MARGIN)
+DRIFT_TOLERANCE = CANDIDATE_MARGIN / (2 - CANDIDATE_MARGIN)
+FULL_RECOMPUTE_FRACTION = 0.3  # above this share of changed lines, rescoring everything is cheaper
+MAX_TRACKED_DOCUMENTS = 32
+
+_analyzer = None  # TfidfVectorizer's tokenizer, built on first use
+_documents = OrderedDict()  # document id -> IncrementalIntrinsic, LRU order
+_documents_lock = threading.Lock()
+
+
+def _analyze(line):
+    global _analyzer
+    if _analyzer is None:
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        _analyzer = TfidfVectorizer().build_analyzer()
+    return _analyzer(line)
+
+
+class IncrementalIntrinsic:
+    """
+    Self-similarity state of one document across edits.
+
+    Term counts are kept per line, so a new version only tokenizes the lines that
+    changed and rebuilds the exact TF-IDF matrix (smooth idf, l2 norm, as
+    TfidfVectorizer does) from the cached counts.
+
+    A full pass records every pair above threshold * (1 - CANDIDATE_MARGIN). Later
+    versions rescore exactly: (a) lines added since that pass, and lines using a
+    term whose weight drifted by more than DRIFT_TOLERANCE, against every line;
+    (b) the recorded candidate pairs among the remaining lines. A pair in (b)
+    can only have grown by the margin since the full pass, so no match is missed.
+    Once too many lines count as changed, another full pass resets the baseline.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.lower = threshold * (1 - CANDIDATE_MARGIN)
+        self.vocabulary = {}
+        self.df = np.zeros(0)
+        self.rows = {}  # line id -> (term columns, counts, line)
+        self.line_ids = []
+        self._next_id = 0
+        # baseline of the last full pass
+        self.base_weights = None
+        self.base_ids = set()
+        self.candidates = set()  # (line id, line id) pairs, smaller id first
+        self.lock = threading.Lock()
+
+    def _tokenize(self, line):
+        counts = Counter(_analyze(line))
+        columns = np.array([self.vocabulary.setdefault(term, len(self.vocabulary)) for term in counts], dtype=np.int64)
+        return columns, np.array(list(counts.values()), dtype=np.float64)
+
+    def _update_lines(self, lines):
+        previous = {}
+        for line_id in self.line_ids:
+            previous.setdefault(self.rows[line_id][2], []).append(line_id)
+
+        line_ids, added = [], []
+        for line in lines:
+            reusable = previous.get(line)
+            if reusable:
+                line_ids.append(reusable.pop(0))
+                continue
+            line_id, self._next_id = self._next_id, self._next_id + 1
+            columns, counts = self._tokenize(line)
+            self.rows[line_id] = (columns, counts, line)
+            line_ids.append(line_id)
+            added.append(line_id)
+
+        if len(self.vocabulary) > len(self.df):
+            self.df = np.concatenate([self.df, np.zeros(len(self.vocabulary) - len(self.df))])
+        for line_id in [line_id for ids in previous.values() for line_id in ids]:
+            self.df[self.rows.pop(line_id)[0]] -= 1
+        for line_id in added:
+            self.df[self.rows[line_id][0]] += 1
+        self.line_ids = line_ids
+
+    def _matrix(self, weights):
+        import scipy.sparse as sp
+        from sklearn.preprocessing import normalize
+
+        idf = np.sqrt(weights)
+        indptr, indices, data = [0], [], []
+        for line_id in self.line_ids:
+            columns, counts, _ = self.rows[line_id]
+            indices.append(columns)
+            data.append(counts * idf[columns])
+            indptr.append(indptr[-1] + len(columns))
+        matrix = sp.csr_matrix((np.concatenate(data), np.concatenate(indices), indptr),
+                               shape=(len(self.line_ids), len(self.vocabulary)))
+        return normalize(matrix)
+
+    def _changed_rows(self, matrix, weights):
+        drifted = np.ones(len(weights))
+        ratio = weights[:len(self.base_weights)] / self.base_weights
+        drifted[:len(self.base_weights)] = np.abs(ratio - 1) > DRIFT_TOLERANCE
+        uses_drifted = (matrix @ drifted) > 0
+        return [i for i, line_id in enumerate(self.line_ids) if uses_drifted[i] or line_id not in self.base_ids]
+
+    def update(self, lines):
+        self._update_lines(lines)
+        n = len(self.line_ids)
+        if n < 2:
+            self.base_weights, self.base_ids, self.candidates = None, set(), set()
+            return None, []
+
+        weights = (np.log((1 + n) / (1 + self.df)) + 1) ** 2
+        matrix = self._matrix(weights)
+        changed = self._changed_rows(matrix, weights) if self.base_weights is not None else None
+
+        if changed is None or len(changed) > FULL_RECOMPUTE_FRACTION * n:
+            similar = [(i, j, sim) for i, j, sim in iter_similar_pairs(matrix, self.lower)]
+            self.base_weights, self.base_ids = weights, set(self.line_ids)
+            self.candidates = {(self.line_ids[i], self.line_ids[j]) for i, j, _ in similar}
+        else:
+            position = {line_id: i for i, line_id in enumerate(self.line_ids)}
+            changed_set = set(changed)
+            kept = [(position[a], position[b]) for a, b in self.candidates if a in position and b in position]
+            kept = [(i, j) for i, j in kept if i not in changed_set and j not in changed_set]
+            similar = []
+            if kept:
+                rows_a, rows_b = zip(*kept)
+                sims = np.asarray(matrix[list(rows_a)].multiply(matrix[list(rows_b)]).sum(axis=1)).ravel()
+                similar.extend((min(i, j), max(i, j), float(sim)) for (i, j), sim in zip(kept, sims))
+            if changed:
+                changed = np.array(changed)
+                is_changed = np.zeros(n, dtype=bool)
+                is_changed[changed] = True
+                for rows, cols, sims in iter_row_blocks(matrix, changed):
+                    # pairs of two changed lines show up twice; keep the one from the smaller row
+                    keep = (sims > self.threshold) & (rows != cols) & (~is_changed[cols] | (rows < cols))
+                    similar.extend((int(min(i, j)), int(max(i, j)), float(sim))
+                                   for i, j, sim in zip(rows[keep], cols[keep], sims[keep]))
+
+        similar = sorted((i, j, sim) for i, j, sim in similar if sim > self.threshold)
+        return mean_pairwise_similarity(matrix), similar
+
+
+def intrinsic_plagiarism_score_incremental(text, document_id):
+    """
+    Same result as intrinsic_plagiarism_score, reusing the analysis of the previous
+    version of document_id so that only edited lines are re-tokenized and re-scored.
+    """
+    return intrinsic_similarity_incremental(split_lines(text), document_id)
+
+
+def intrinsic_similarity_incremental(sentences, document_id):
+    with _documents_lock:
+        state = _documents.pop(document_id, None) or IncrementalIntrinsic()
+        _documents[document_id] = state
+        while len(_documents) > MAX_TRACKED_DOCUMENTS:
+            _documents.popitem(last=False)
+
+    with state.lock, span("intrinsic.incremental"):
+        mean_similarity, similar = state.update(sentences)
+    if mean_similarity is None:
+        return {
+            "similarity_score": 0,
+            "similar_pairs": []
+        }
+    return {
+        "similarity_score": round(float(mean_similarity * 100), 2),
+        "similar_pairs": [{
+            "sentence_1": sentences[i],
+            "sentence_2": sentences[j],
+            "similarity": round(sim, 2)
+        } for i, j, sim in similar]
+    }
@@ -0,0 +1,332 @@
+# backend/jobs.py
+"""
+In-process job queue so model inference never runs in the Streamlit script thread.
+
+The UI submits a job and polls its status; background workers pick jobs up per
+job kind, coalesce queued jobs with identical settings into one micro-batch, and
+run at most MAX_CONCURRENT batches at a time so concurrent sessions share the CPU
+instead of fighting over it.
+"""
+import itertools
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+from backend.telemetry import count, observe, request_trace
+
+MAX_CONCURRENT = int(os.environ.get("TEXTINOVA_JOB_CONCURRENCY", "1"))  # batches running at once
+MAX_BATCH_SIZE = int(os.environ.get("TEXTINOVA_JOB_BATCH_SIZE", "8"))
+BATCH_WAIT = 0.05  # seconds to wait for compatible jobs before running a batch
+JOB_TTL = 15 * 60  # seconds a finished job stays queryable
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind, text, params):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.text = text
+        self.close_input = False  # set by JobQueue.release: close the spooled input once the job finishes
+        self.params = params
+        self.status = "queued"  # queued -> running -> done | failed | cancelled
+        self.progress = 0.0
+        self.message = ""
+        self.partial = []
+        self.streamed = []  # text deltas of a streaming job, in order
+        self.result = None
+        self.error = None
+        self.timings = {}  # stage -> seconds spent on this job's batch
+        self.cancelled = threading.Event()
+        self.created = time.time()
+        self.finished = None
+
+    @property
+    def batch_key(self):
+        return self.kind, tuple(sorted(self.params.items()))
+
+    def report(self, progress, message, partial=None):
+        """
+        Progress callback for handlers; raises JobCancelled once the job was cancelled.
+        """
+        if self.cancelled.is_set():
+            raise JobCancelled()
+        self.progress = progress
+        self.message = message
+        if partial is not None:
+            self.partial.append(partial)
+
+    def stream(self, delta):
+        """
+        Appends generated text of a streaming job; raises JobCancelled once the job was cancelled.
+        """
+        if self.cancelled.is_set():
+            raise JobCancelled()
+        self.streamed.append(delta)
+
+    def snapshot(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "partial": list(self.partial),
+            "streamed": "".join(self.streamed),
+            "result": self.result,
+            "error": self.error,
+            "timings": dict(self.timings),
+            "queued_for": round((self.finished or time.time()) - self.created, 2),
+        }
+
+
+# ------------------------
+# Job handlers: run a list of compatible jobs and return one result per job
+# ------------------------
+def _budgeted(job):
+    return bool(job.params.get("time_budget") or job.params.get("token_budget"))
+
+
+def _streaming(job):
+    return bool(job.params.get("stream"))
+
+
+def _batch_params(job):
+    return {k: v for k, v in job.params.items() if k not in ("time_budget", "token_budget", "stream")}
+
+
+def _spooled(job):
+    from backend.document import SpooledDocument
+
+    return isinstance(job.text, SpooledDocument)
+
+
+def _collect(job, deltas):
+    """
+    Feeds a stream of text deltas into the job and returns the whole text.
+    """
+    try:
+        for delta in deltas:
+            job.stream(delta)
+    finally:
+        deltas.close()  # stops generation if the job was cancelled
+    return "".join(job.streamed)
+
+
+def _run_summarize(jobs):
+    from backend.summarizer import (finish_summary, reduce_document, stream_summary, summarize, summarize_batch,
+                                    summarize_document)
+
+    # Budgets are per request, so budgeted (and streaming) jobs are not merged into one batch;
+    # spooled uploads are summarized piece by piece on their own
+    if len(jobs) == 1 or _budgeted(jobs[0]) or _streaming(jobs[0]) or any(map(_spooled, jobs)):
+        results = []
+        for job in jobs:
+            def on_partial(index, total, partial, job=job):
+                job.report((index + 1) / total, f"Summarized section {index + 1} of {total}", partial)
+
+            params = dict(job.params)
+            if params.pop("stream", False) and params.get("summary_type", "abstractive") == "abstractive":
+                params.pop("summary_type", None)
+                tone = params.pop("tone", "neutral")
+                text = reduce_document(job.text, on_partial=on_partial) if _spooled(job) else job.text
+                deltas = stream_summary(text, on_partial=on_partial, cancelled=job.cancelled.is_set, **params)
+                results.append(finish_summary(_collect(job, deltas), tone))
+            elif _spooled(job):
+                results.append(summarize_document(job.text, on_partial=on_partial, **params))
+            else:
+                results.append(summarize(job.text, on_partial=on_partial, **params))
+        return results
+    return summarize_batch([job.text for job in jobs], **_batch_params(jobs[0]))
+
+
+def _run_paraphrase(jobs):
+    from backend.paraphraser import (finish_paraphrase, paraphrase_document, paraphrase_text, paraphrase_texts,
+                                     stream_paraphrase, stream_paraphrase_document)
+
+    # Spooled uploads are read block by block on their own
+    if len(jobs) == 1 or _budgeted(jobs[0]) or _streaming(jobs[0]) or any(map(_spooled, jobs)):
+        results = []
+        for job in jobs:
+            params = dict(job.params)
+            if params.pop("stream", False):
+                params.pop("batch_size", None)
+                stream = stream_paraphrase_document if _spooled(job) else stream_paraphrase
+                deltas = stream(job.text, cancelled=job.cancelled.is_set, **params)
+                results.append(finish_paraphrase(_collect(job, deltas), params.get("option", "normal"),
+                                                 params.get("voice_type", "passive")))
+            elif _spooled(job):
+                results.append(paraphrase_document(job.text, **params))
+            else:
+                results.append(paraphrase_text(job.text, **params))
+        return results
+    return paraphrase_texts([job.text for job in jobs], **_batch_params(jobs[0]))
+
+
+def _run_integrity(jobs):
+    from backend.integrity import analyze_document, analyze_integrity
+
+    # One fused pass per document; jobs tied to a document_id (a draft being
+    # edited) reuse the analysis of its previous version. Spooled uploads are
+    # analyzed block by block without reading the whole text
+    results = []
+    for job in jobs:
+        analyze = analyze_document if _spooled(job) else analyze_integrity
+        results.append(analyze(job.text, document_id=job.params.get("document_id"), on_progress=job.report,
+                               similarity_mode=job.params.get("similarity_mode", "lexical")))
+    return results
+
+
+HANDLERS = {
+    "summarize": _run_summarize,
+    "paraphrase": _run_paraphrase,
+    "integrity": _run_integrity,
+}
+
+
+class JobQueue:
+    """
+    Background worker pool with one pending list and worker thread per job kind.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT, max_batch_size=MAX_BATCH_SIZE, batch_wait=BATCH_WAIT):
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait
+        self._jobs = {}
+        self._pending = {kind: deque() for kind in HANDLERS}
+        self._condition = threading.Condition()
+        self._slots = threading.Semaphore(max_concurrent)
+        self.stats = {"submitted": 0, "batches": 0, "batched_jobs": 0}
+        for kind in HANDLERS:
+            threading.Thread(target=self._worker, args=(kind,), name=f"textinova-{kind}", daemon=True).start()
+
+    def submit(self, kind, text, **params):
+        """
+        Queues a job and returns its id immediately.
+        """
+        if kind not in HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = Job(kind, text, params)
+        with self._condition:
+            self._prune()
+            self._jobs[job.id] = job
+            self._pending[kind].append(job)
+            self.stats["submitted"] += 1
+            self._condition.notify_all()
+        return job.id
+
+    def status(self, job_id):
+        """
+        :return: snapshot dict of the job, or None if it is unknown or expired
+        """
+        job = self._jobs.get(job_id)
+        return job.snapshot() if job else None
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job.cancelled.set()
+        with self._condition:
+            if job.status == "queued":
+                self._pending[job.kind].remove(job)
+                self._finish(job, "cancelled")
+
+    def queue_depth(self):
+        with self._condition:
+            return {kind: len(pending) for kind, pending in self._pending.items()}
+
+    def _prune(self):
+        now = time.time()
+        for job_id in [i for i, job in self._jobs.items() if job.finished and now - job.finished > JOB_TTL]:
+            del self._jobs[job_id]
+
+    def release(self, document):
+        """
+        Closes a spooled document (e.g. a replaced upload) once no queued or running job still reads it.
+        """
+        with self._condition:
+            readers = [job for job in self._jobs.values() if job.text is document]
+            for job in readers:
+                job.close_input = True
+        if not readers:
+            document.close()
+
+    def _finish(self, job, status, result=None, error=None):
+        with self._condition:
+            job.result, job.error, job.status = result, error, status
+            job.finished = time.time()
+            if status == "done":
+                job.progress = 1.0
+            # Finished jobs are kept for JOB_TTL; drop their input so uploads are not held that long
+            text, job.text = job.text, None
+        if job.close_input:
+            text.close()
+
+    def _next_batch(self, kind):
+        pending = self._pending[kind]
+        with self._condition:
+            while not pending:
+                self._condition.wait()
+            # Give concurrent submissions a moment to arrive so they can share the batch
+            deadline = time.monotonic() + self.batch_wait
+            while len(pending) < self.max_batch_size and time.monotonic() < deadline:
+                self._condition.wait(deadline - time.monotonic())
+            if not pending:
+                return []
+            key = pending[0].batch_key
+            batch = list(itertools.islice((job for job in pending if job.batch_key == key), self.max_batch_size))
+            for job in batch:
+                pending.remove(job)
+                job.status = "running"
+            return batch
+
+    def _worker(self, kind):
+        while True:
+            batch = self._next_batch(kind)
+            if not batch:
+                continue
+            with self._slots, request_trace() as breakdown:
+                self.stats["batches"] += 1
+                self.stats["batched_jobs"] += len(batch)
+                start = time.perf_counter()
+                try:
+                    results = HANDLERS[kind](batch)
+                except JobCancelled:
+                    for job in batch:
+                        self._finish(job, "cancelled")
+                    continue
+                except Exception as e:
+                    count(f"jobs.{kind}.failed", len(batch))
+                    for job in batch:
+                        self._finish(job, "failed", error=f"{type(e).__name__}: {e}")
+                    continue
+                elapsed = time.perf_counter() - start
+            # Feature latency as seen by the user, including time spent waiting in the queue
+            for job in batch:
+                observe(f"feature.{kind}", time.time() - job.created)
+            count(f"jobs.{kind}.done", len(batch))
+            timings = {stage: round(seconds, 4) for stage, seconds in sorted(breakdown.items())}
+            timings["total"] = round(elapsed, 4)
+            for job, result in zip(batch, results):
+                job.timings = timings
+                self._finish(job, "cancelled" if job.cancelled.is_set() else "done", result=result)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """
+    Returns the process-wide job queue, starting its workers on first use.
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
@@ -0,0 +1,452 @@
+# backend/model_host.py
+"""
+Serves the transformer models from one host process so app workers do not each
+hold their own copy of the weights.
+
+The host loads the models once, moves the PyTorch weights to shared memory and
+forks a small pool of workers that all read the same pages. App processes started
+with TEXTINOVA_MODEL_HOST=<socket path> send their model calls over that Unix
+socket instead of loading the models; the functions marked @hosted (the batched
+generate/forward passes of each model) are the only code that crosses it, while
+tokenizers, caching and post-processing stay in the app process.
+
+    python -m backend.model_host [--socket PATH] [--workers 2] [--models summarizer ...]
+    python -m backend.model_host --check    # health check, exit status 1 if the host is down
+
+Each worker runs at most TEXTINOVA_HOST_CONCURRENCY_<NAME> (default
+TEXTINOVA_HOST_CONCURRENCY, 1) calls of a model at once; further calls wait.
+SIGHUP reloads the models and replaces the workers without dropping requests: the
+new workers start accepting, then the old ones finish their calls and exit. SIGTERM
+or SIGINT drains the workers and removes the socket. Workers that die are respawned.
+
+Only ONNX models are not preloaded: ONNX Runtime sessions do not survive fork, so
+each worker loads its own. Calls are pickled, so the socket is created readable by
+its owner only; set TEXTINOVA_MODEL_HOST_KEY to also require a shared key.
+"""
+import argparse
+import functools
+import inspect
+import os
+import pickle
+import signal
+import sys
+import threading
+import time
+
+HOST_ADDRESS = os.environ.get("TEXTINOVA_MODEL_HOST")  # socket of a running host; unset = models load in-process
+HOST_KEY = os.environ.get("TEXTINOVA_MODEL_HOST_KEY", "").encode() or None
+HOST_WORKERS = int(os.environ.get("TEXTINOVA_HOST_WORKERS", "2"))
+HOST_THREADS = int(os.environ.get("TEXTINOVA_HOST_THREADS", "0"))  # torch threads per worker; 0 = torch default
+DEFAULT_CONCURRENCY = int(os.environ.get("TEXTINOVA_HOST_CONCURRENCY", "1"))  # calls per model per worker
+DRAIN_TIMEOUT = float(os.environ.get("TEXTINOVA_HOST_DRAIN_S", "120"))  # seconds a stopping worker may finish calls
+DEFAULT_SOCKET = "textinova-models.sock"
+
+# Modules whose @hosted functions the host must register before serving
+HOSTED_MODULES = ["backend.summarizer", "backend.paraphraser", "backend.AI_detector", "backend.semantic_index"]
+
+_functions = {}  # hosted name -> (function, model name)
+_serving = False  # True inside the host, where hosted functions always run locally
+_client = None
+_client_lock = threading.Lock()
+
+
+class HostUnavailable(ConnectionError):
+    pass
+
+
+def hosted(name, model):
+    """
+    Marks a model call that runs in the model host when TEXTINOVA_MODEL_HOST is set.
+    Arguments and results must pickle; a GenerationBudget argument is charged on the
+    host and its remaining tokens copied back. Generator functions stream their items;
+    a cancelled= callable stays in the caller, which stops the stream once it returns True.
+    """
+    def decorator(function):
+        _functions[name] = (function, model)
+        streaming = inspect.isgeneratorfunction(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _serving or not HOST_ADDRESS:
+                return function(*args, **kwargs)
+            if streaming:
+                return get_client().stream(name, args, kwargs)
+            return get_client().call(name, args, kwargs)
+        return wrapper
+    return decorator
+
+
+def _budgets(args, kwargs):
+    from backend.generation import GenerationBudget
+
+    return [value for value in (*args, *kwargs.values()) if isinstance(value, GenerationBudget)]
+
+
+# ------------------------
+# Client
+# ------------------------
+class HostClient:
+    """
+    Sends calls to the model host, one connection per thread (and one per open stream),
+    reconnecting with backoff when a worker restarts. Calls are retried on a new connection,
+    so they may run twice if a worker dies mid-call; model calls have no side effects.
+    """
+
+    def __init__(self, address=None, authkey=HOST_KEY, retries=4, backoff=0.1):
+        self.address = address or HOST_ADDRESS or DEFAULT_SOCKET
+        self.authkey = authkey
+        self.retries = retries
+        self.backoff = backoff
+        self._local = threading.local()
+
+    def _connect(self):
+        from multiprocessing.connection import Client
+
+        return Client(self.address, family="AF_UNIX", authkey=self.authkey)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def _drop(self):
+        connection, self._local.connection = getattr(self._local, "connection", None), None
+        if connection is not None:
+            connection.close()
+
+    def _request(self, message, dedicated=False):
+        """
+        Sends a message and returns (connection, first reply). A dedicated connection is
+        the caller's to close; otherwise the thread's shared connection is used.
+        """
+        for attempt in range(self.retries + 1):
+            connection = None
+            try:
+                connection = self._connect() if dedicated else self._connection()
+                connection.send(message)
+                return connection, connection.recv()
+            except (EOFError, OSError, pickle.UnpicklingError) as e:  # unpicklable: the host expects a key
+                if not dedicated:
+                    self._drop()
+                elif connection is not None:
+                    connection.close()
+                if attempt == self.retries:
+                    raise HostUnavailable(f"Model host at {self.address} is not reachable: {e}") from e
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def ping(self):
+        """
+        Health of the worker that answers: pid, generation, uptime, loaded models and calls in progress.
+        """
+        _, (_, health, _) = self._request(("ping",))
+        return health
+
+    def call(self, name, args, kwargs):
+        from backend.telemetry import span
+
+        with span(f"host.{name}"):
+            _, reply = self._request(("call", name, args, kwargs))
+        if reply[0] == "error":
+            raise reply[1]
+        for budget, tokens_left in zip(_budgets(args, kwargs), reply[2]):
+            budget.tokens_left = tokens_left
+        return reply[1]
+
+    def stream(self, name, args, kwargs):
+        from backend.telemetry import span
+
+        cancelled = kwargs.pop("cancelled", None)
+        # A stream gets its own connection: replies left unread by an abandoned stream must not
+        # reach the thread's next call
+        with span(f"host.{name}.first_item"):
+            connection, reply = self._request(("call", name, args, kwargs), dedicated=True)
+        try:
+            while reply[0] == "item":
+                yield reply[1]
+                if cancelled and cancelled():
+                    return
+                try:
+                    reply = connection.recv()
+                except (EOFError, OSError) as e:
+                    raise HostUnavailable(f"Model host at {self.address} closed the stream: {e}") from e
+            if reply[0] == "error":
+                raise reply[1]
+        finally:
+            connection.close()  # an unfinished stream stops generating once the connection is gone
+
+
+def check(address=None, timeout=5.0):
+    """
+    Pings the host and returns its health; raises HostUnavailable if it does not answer
+    within timeout seconds (a key mismatch shows up as a hang in the handshake).
+    """
+    client = HostClient(address, retries=0)
+    result = {}
+
+    def ping():
+        try:
+            result["health"] = client.ping()
+        except HostUnavailable as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=ping, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if "health" in result:
+        return result["health"]
+    raise result.get("error") or HostUnavailable(f"Model host at {client.address} did not answer in {timeout}s")
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HostClient()
+        return _client
+
+
+# ------------------------
+# Workers
+# ------------------------
+class _Draining(Exception):
+    pass
+
+
+_generation = 0
+_started = time.monotonic()
+_semaphores = {}
+_inflight = 0
+_inflight_lock = threading.Lock()
+_draining = threading.Event()
+
+
+def concurrency_limit(name):
+    return int(os.environ.get(f"TEXTINOVA_HOST_CONCURRENCY_{name.upper()}", DEFAULT_CONCURRENCY))
+
+
+def _health():
+    from backend.models import loaded_models
+
+    return {
+        "pid": os.getpid(),
+        "generation": _generation,
+        "uptime_s": round(time.monotonic() - _started, 1),
+        "models": loaded_models(),
+        "inflight": _inflight,
+    }
+
+
+def _picklable(error):
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+
+def _handle(connection, message):
+    global _inflight
+    if message[0] == "ping":
+        connection.send(("ok", _health(), []))
+        return
+    _, name, args, kwargs = message
+    with _inflight_lock:
+        _inflight += 1
+    try:
+        function, model = _functions[name]
+        with _semaphores[model]:
+            result = function(*args, **kwargs)
+            if inspect.isgenerator(result):
+                try:
+                    for item in result:
+                        connection.send(("item", item))  # fails once the client has gone away
+                finally:
+                    result.close()
+                result = None
+        reply = ("ok", result, [budget.tokens_left for budget in _budgets(args, kwargs)])
+    except Exception as e:
+        reply = ("error", _picklable(e))
+    finally:
+        with _inflight_lock:
+            _inflight -= 1
+    connection.send(reply)
+
+
+def _serve_connection(connection):
+    with connection:
+        while True:
+            try:
+                message = connection.recv()
+                if _draining.is_set():
+                    return  # unanswered: the client resends it to a worker that is not stopping
+                _handle(connection, message)
+            except (EOFError, OSError):  # the client disconnected
+                return
+
+
+def _raise_draining(signum, frame):
+    raise _Draining()
+
+
+def _worker(listener, generation):
+    global _generation
+    _generation = generation
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the supervisor handles Ctrl-C for the pool
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, _raise_draining)
+    if HOST_THREADS:
+        import torch
+
+        torch.set_num_threads(HOST_THREADS)
+
+    from multiprocessing import AuthenticationError
+
+    from backend.models import MODEL_SPECS
+
+    for name in MODEL_SPECS:
+        _semaphores[name] = threading.BoundedSemaphore(concurrency_limit(name))
+    try:
+        while True:
+            try:
+                connection = listener.accept()
+            except (OSError, EOFError, AuthenticationError):  # failed handshake, e.g. a wrong key
+                continue
+            threading.Thread(target=_serve_connection, args=(connection,), daemon=True).start()
+    except _Draining:
+        _draining.set()
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    # Stop accepting, let the calls in progress finish; idle connections are dropped on exit
+    deadline = time.monotonic() + DRAIN_TIMEOUT
+    while _inflight and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+# ------------------------
+# Supervisor
+# ------------------------
+def _load_models(names):
+    from backend.models import get_model, model_backend
+
+    for name in names:
+        if model_backend(name) == "onnx":
+            continue
+        _, model = get_model(name)
+        if hasattr(model, "share_memory"):
+            model.share_memory()  # forked workers map the same pages instead of copying them
+
+
+def _check_socket(address):
+    import socket
+
+    if not os.path.exists(address):
+        return
+    with socket.socket(socket.AF_UNIX) as probe:
+        try:
+            probe.connect(address)
+        except ConnectionRefusedError:
+            os.unlink(address)  # left behind by a host that did not shut down cleanly
+            return
+    raise RuntimeError(f"A model host is already serving on {address}")
+
+
+def serve(address=None, workers=HOST_WORKERS, models=None):
+    """
+    Runs the model host until SIGTERM or SIGINT. Blocks the calling (main) thread.
+    """
+    global _serving, _generation
+    import importlib
+    import multiprocessing
+    from multiprocessing.connection import Listener
+
+    from backend.models import MODEL_SPECS, unload
+
+    _serving = True
+    for module in HOSTED_MODULES:
+        importlib.import_module(module)
+    address = address or HOST_ADDRESS or DEFAULT_SOCKET
+    names = models or list(MODEL_SPECS)
+    context = multiprocessing.get_context("fork")
+
+    _check_socket(address)
+    _load_models(names)
+    listener = Listener(address, family="AF_UNIX", authkey=HOST_KEY)
+    os.chmod(address, 0o600)
+
+    events = {"restart": False, "stop": False}
+    wake = threading.Event()
+
+    def on_signal(signum, frame):
+        events["restart" if signum == signal.SIGHUP else "stop"] = True
+        wake.set()
+
+    for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, on_signal)
+
+    def spawn():
+        process = context.Process(target=_worker, args=(listener, _generation), name=f"model-host-{_generation}",
+                                  daemon=False)
+        process.start()
+        return process
+
+    pool = [spawn() for _ in range(workers)]
+    retired = []
+    print(f"model host: serving {', '.join(names)} on {address} with {workers} workers", file=sys.stderr)
+    try:
+        while not events["stop"]:
+            wake.wait(1.0)
+            wake.clear()
+            if events["restart"]:
+                events["restart"] = False
+                unload()
+                _load_models(names)
+                _generation += 1
+                retired += pool
+                pool = [spawn() for _ in range(workers)]  # accepting before the old workers stop
+                for process in retired:
+                    process.terminate()
+                print(f"model host: restarted workers (generation {_generation})", file=sys.stderr)
+            for i, process in enumerate(pool):
+                if not process.is_alive() and not events["stop"]:
+                    print(f"model host: worker {process.pid} exited with {process.exitcode}, respawning",
+                          file=sys.stderr)
+                    pool[i] = spawn()
+            retired = [process for process in retired if process.is_alive()]
+    finally:
+        for process in pool + retired:
+            process.terminate()
+        for process in pool + retired:
+            process.join(DRAIN_TIMEOUT + 5)
+            if process.is_alive():
+                process.kill()
+        listener.close()  # also removes the socket file
+
+
+def main(argv=None):
+    from backend.models import MODEL_SPECS
+
+    parser = argparse.ArgumentParser(description="Serve the backend models to app processes over a Unix socket.")
+    parser.add_argument("--socket", default=HOST_ADDRESS or DEFAULT_SOCKET, help="Unix socket path")
+    parser.add_argument("--workers", type=int, default=HOST_WORKERS)
+    parser.add_argument("--models", nargs="+", choices=list(MODEL_SPECS),
+                        help="models to preload (default: all registered models)")
+    parser.add_argument("--check", action="store_true", help="ping a running host and print its health")
+    parser.add_argument("--timeout", type=float, default=5.0, help="seconds --check waits for an answer")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        try:
+            print(check(args.socket, args.timeout))
+        except HostUnavailable as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        return
+    serve(args.socket, args.workers, args.models)
+
+
+if __name__ == "__main__":
+    # Run the imported module, whose registry the @hosted functions fill, not this __main__ copy
+    from backend.model_host import main
+
+    main()
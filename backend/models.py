@@ -0,0 +1,289 @@
+# backend/models.py
+"""
+Shared registry for the transformer models used by the backend.
+
+Every model is loaded lazily on first use and stays resident for the life of
+the process, so a request never pays for a model it does not need and never
+reloads one it already has. An optional memory budget (in MB) evicts the least
+recently used models when the resident weights would exceed it.
+
+Each model can run on one of several inference backends (TEXTINOVA_BACKEND_<NAME>):
+  torch - full-precision PyTorch (default)
+  int8  - PyTorch dynamic int8 quantization of the Linear layers (CPU)
+  onnx  - ONNX Runtime, exported once and cached under ONNX_CACHE_DIR (needs optimum[onnxruntime])
+"""
+import gc
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+# name -> (default Hugging Face id, tokenizer class, model class)
+MODEL_SPECS = {
+    "summarizer": ("facebook/bart-large-cnn", "BartTokenizer", "BartForConditionalGeneration"),
+    "paraphraser": ("tuner007/pegasus_paraphrase", "PegasusTokenizer", "PegasusForConditionalGeneration"),
+    "ai_detector": ("Hello-SimpleAI/chatgpt-detector-roberta", "AutoTokenizer",
+                    "AutoModelForSequenceClassification"),
+    "embedder": ("sentence-transformers/all-MiniLM-L6-v2", "AutoTokenizer", "AutoModel"),
+}
+
+# name -> ONNX Runtime model class in optimum.onnxruntime
+ORT_CLASSES = {
+    "summarizer": "ORTModelForSeq2SeqLM",
+    "paraphraser": "ORTModelForSeq2SeqLM",
+    "ai_detector": "ORTModelForSequenceClassification",
+    "embedder": "ORTModelForFeatureExtraction",
+}
+BACKENDS = ("torch", "int8", "onnx")
+ONNX_CACHE_DIR = os.environ.get("TEXTINOVA_ONNX_CACHE",
+                                os.path.join(os.path.expanduser("~"), ".cache", "textinova", "onnx"))
+
+# Resident weight budget in MB; 0 means keep everything loaded
+MEMORY_BUDGET_MB = int(os.environ.get("TEXTINOVA_MODEL_MEMORY_MB", "0"))
+
+_loaded = OrderedDict()  # name -> (tokenizer, model, size in bytes), LRU order
+_lock = threading.RLock()
+_load_locks = {name: threading.Lock() for name in MODEL_SPECS}
+_tokenizer_locks = {name: threading.Lock() for name in MODEL_SPECS}
+_import_lock = threading.Lock()
+_construct_lock = threading.Lock()
+_backends = {}  # name -> backend chosen at runtime through configure_backend
+_tokenizers = {}  # name -> tokenizer, shared by the loaded model and tokenizer-only callers
+
+
+def _transformers_class(cls_name):
+    # The first "import transformers" and its lazy class lookups are not thread-safe; the loads themselves are
+    with _import_lock:
+        import transformers
+
+        return getattr(transformers, cls_name)
+
+
+def _download(path, revision):
+    """
+    Fetches a hub model's config and weights (safetensors, else PyTorch .bin) into the local cache.
+    Failures are left to from_pretrained, which reports them.
+    """
+    if os.path.isdir(path):
+        return
+    from huggingface_hub import snapshot_download
+
+    try:
+        local = snapshot_download(path, revision=revision, allow_patterns=["*.json", "*.safetensors"])
+        if not any(f.endswith(".safetensors") for f in os.listdir(local)):
+            snapshot_download(path, revision=revision, allow_patterns=["*.bin"])
+    except Exception:
+        pass
+
+
+def model_id(name):
+    """
+    Returns the Hugging Face id (or local path) for a registered model.
+    TEXTINOVA_MODEL_<NAME> overrides the default, e.g. to point at a local copy.
+    """
+    if name not in MODEL_SPECS:
+        raise ValueError(f"Unknown model: {name}")
+    return os.environ.get(f"TEXTINOVA_MODEL_{name.upper()}", MODEL_SPECS[name][0])
+
+
+def model_revision(name):
+    """
+    Returns the revision pinned for a model (TEXTINOVA_REVISION_<NAME>), or "main".
+    """
+    return os.environ.get(f"TEXTINOVA_REVISION_{name.upper()}", "main")
+
+
+def model_backend(name):
+    """
+    Returns the inference backend configured for a model ("torch", "int8" or "onnx").
+    """
+    backend = _backends.get(name) or os.environ.get(f"TEXTINOVA_BACKEND_{name.upper()}", "torch")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend for {name}: {backend}")
+    return backend
+
+
+def configure_backend(name, backend):
+    """
+    Switches a model to another inference backend; it is reloaded on next use.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}")
+    _backends[name] = backend
+    unload(name)
+
+
+def get_device():
+    import torch
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+
+def _model_size(model):
+    if not hasattr(model, "parameters"):
+        # ONNX Runtime sessions: approximate by the exported graph size on disk
+        directory = getattr(model, "model_save_dir", None)
+        if not directory or not os.path.isdir(directory):
+            return 0
+        return sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)
+                   if f.endswith((".onnx", ".onnx_data")))
+    size = sum(t.numel() * t.element_size() for t in list(model.parameters()) + list(model.buffers()))
+    # Dynamically quantized Linear layers keep their int8 weights outside parameters()
+    for module in model.modules():
+        if hasattr(module, "_packed_params") and callable(getattr(module, "weight", None)):
+            size += module.weight().numel()
+    return size
+
+
+def onnx_export_dir(name):
+    safe_id = model_id(name).strip("/").replace("/", "--")
+    return os.path.join(ONNX_CACHE_DIR, f"{name}--{safe_id}--{model_revision(name)}")
+
+
+def _load_onnx(name, path, revision):
+    from optimum import onnxruntime
+
+    ort_cls = getattr(onnxruntime, ORT_CLASSES[name])
+    export_dir = onnx_export_dir(name)
+    if os.path.isdir(export_dir):
+        return ort_cls.from_pretrained(export_dir)
+    model = ort_cls.from_pretrained(path, revision=revision, export=True)
+    # Export next to the final directory and move it into place, so an interrupted or concurrent
+    # export never leaves a partial directory that later loads would take as complete
+    os.makedirs(ONNX_CACHE_DIR, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{os.path.basename(export_dir)}-", dir=ONNX_CACHE_DIR)
+    try:
+        model.save_pretrained(staging)
+        os.replace(staging, export_dir)
+    except OSError:
+        if not os.path.isdir(export_dir):
+            raise
+        # Another process finished the same export first
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return model
+
+
+def _load(name):
+    from backend.telemetry import span
+
+    with span(f"model.{name}.load"):
+        return _load_uninstrumented(name)
+
+
+def _load_uninstrumented(name):
+    model_cls = MODEL_SPECS[name][2]
+    path, revision, backend = model_id(name), model_revision(name), model_backend(name)
+    tokenizer = get_tokenizer(name)
+
+    if backend == "onnx":
+        return tokenizer, _load_onnx(name, path, revision)
+
+    # Downloads run in parallel; building the model does not, as from_pretrained initializes it through
+    # process-wide state (default dtype, patched Module.register_parameter for meta-device init)
+    _download(path, revision)
+    model_class = _transformers_class(model_cls)
+    with _construct_lock:
+        model = model_class.from_pretrained(path, revision=revision)
+    if backend == "int8":
+        import torch
+        # Dynamic quantization kernels are CPU-only
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    else:
+        model = model.to(get_device())
+    model.eval()
+    return tokenizer, model
+
+
+def _evict_over_budget(keep):
+    budget = MEMORY_BUDGET_MB * 1024 * 1024
+    if budget <= 0:
+        return
+    total = sum(size for _, _, size in _loaded.values())
+    for name in list(_loaded):
+        if total <= budget:
+            break
+        if name == keep:
+            continue
+        total -= _loaded.pop(name)[2]
+    gc.collect()
+
+
+def get_model(name):
+    """
+    Returns (tokenizer, model) for a registered model, loading it on first use.
+    """
+    with _lock:
+        if name in _loaded:
+            _loaded.move_to_end(name)
+            return _loaded[name][:2]
+        if name not in MODEL_SPECS:
+            raise ValueError(f"Unknown model: {name}")
+
+    # Load outside the registry lock so other models stay available meanwhile
+    with _load_locks[name]:
+        with _lock:
+            if name in _loaded:
+                _loaded.move_to_end(name)
+                return _loaded[name][:2]
+        tokenizer, model = _load(name)
+        with _lock:
+            _loaded[name] = (tokenizer, model, _model_size(model))
+            _evict_over_budget(keep=name)
+        return tokenizer, model
+
+
+def get_tokenizer(name):
+    """
+    Returns the tokenizer of a registered model without loading the model's weights.
+    """
+    with _lock:
+        if name in _tokenizers:
+            return _tokenizers[name]
+        if name not in MODEL_SPECS:
+            raise ValueError(f"Unknown model: {name}")
+    with _tokenizer_locks[name]:
+        with _lock:
+            if name in _tokenizers:
+                return _tokenizers[name]
+        tokenizer = _transformers_class(MODEL_SPECS[name][1]).from_pretrained(model_id(name),
+                                                                              revision=model_revision(name))
+        with _lock:
+            _tokenizers[name] = tokenizer
+        return tokenizer
+
+
+def warm_up(names=None):
+    """
+    Loads the given models (all registered models by default) ahead of the first request.
+    """
+    for name in names or MODEL_SPECS:
+        get_model(name)
+
+
+def unload(name=None):
+    """
+    Drops one model (or every model) from the registry and frees its memory.
+    """
+    with _lock:
+        if name is None:
+            _loaded.clear()
+            _tokenizers.clear()
+        else:
+            _loaded.pop(name, None)
+            _tokenizers.pop(name, None)
+    gc.collect()
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except ImportError:
+        pass
+
+
+def loaded_models():
+    """
+    Returns {name: resident size in MB} for the models currently in memory.
+    """
+    with _lock:
+        return {name: round(size / (1024 * 1024), 1) for name, (_, _, size) in _loaded.items()}
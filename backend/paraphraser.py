@@ -1,57 +1,138 @@
 import re
-from transformers import PegasusForConditionalGeneration, PegasusTokenizer
+from backend.models import get_model, get_tokenizer
+from backend.cache import cached, skip_cache
+from backend.generation import DEFAULT_PROFILE, generate_kwargs, make_budget, stream_generate
+from backend.inference_server import run_batched
+from backend.model_host import hosted
+from backend.rules import apply_rules
+from backend.telemetry import span
+
+ACTIVE_VOICE = re.compile(r"(\b\w+\b) was (\w+) by (\b\w+\b)")
+PASSIVE_VOICE = re.compile(r"(\b\w+\b) (\w+) (\b\w+\b)")
 
 def remove_first_person(text):
-    return re.sub(r"\b(I|we|me|my|mine|our|us|ours)\b", "", text, flags=re.IGNORECASE)
+    return apply_rules("first_person", text)
 
 def simulate_academic_style(text):
-    replacements = {
-        "get": "obtain",
-        "a lot": "a significant amount",
-        "really": "truly",
-        "very": "highly",
-        "help": "assist",
-        "show": "demonstrate"
-    }
-    for informal, formal in replacements.items():
-        text = re.sub(rf"\b{informal}\b", formal, text, flags=re.IGNORECASE)
-    return text
+    return apply_rules("academic", text)
 
 def convert_voice(text, to_voice="passive"):
     if to_voice == "active":
         # Very basic active voice conversion
-        return re.sub(r"(\b\w+\b) was (\w+) by (\b\w+\b)", r"\3 \2 \1", text)
+        return ACTIVE_VOICE.sub(r"\3 \2 \1", text)
     elif to_voice == "passive":
         # Very basic passive voice conversion
-        return re.sub(r"(\b\w+\b) (\w+) (\b\w+\b)", r"\3 was \2 by \1", text)
+        return PASSIVE_VOICE.sub(r"\3 was \2 by \1", text)
     return text
 
-def paraphrase_text(text, option="normal", voice_type="passive"):
-    model_name = "tuner007/pegasus_paraphrase"
-    tokenizer = PegasusTokenizer.from_pretrained(model_name)
-    model = PegasusForConditionalGeneration.from_pretrained(model_name)
+# ------------------------
+# Sentence-level batched paraphrasing
+# ------------------------
+def split_paragraphs(text):
+    """
+    Splits text into alternating [paragraph, line break, paragraph, ...] so it can be reassembled exactly.
+    """
+    return re.split(r"(\n\s*)", text)
+
+
+def split_sentences(paragraph):
+    return [s for s in re.split(r"(?<=[.!?])\s+", paragraph.strip()) if s]
+
+
+def length_window(input_length):
+    """
+    (min_length, max_length) of a paraphrase: about as long as the input, with a buffer.
+    """
+    return max(input_length - 10, min(20, input_length)), input_length + 10
+
+
+def generate_paraphrases(sentences, profile=DEFAULT_PROFILE, batch_size=16, budget=None, num_beams=None):
+    """
+    Paraphrases sentences in padded batches of similar length, one generate call per batch.
+    Sentences from concurrent callers are pooled when micro-batching is enabled.
+    Once the budget is spent, the remaining sentences are returned unchanged.
+    :param num_beams: beam width overriding the profile's
+    """
+    if budget is not None:
+        return _generate_paraphrases(sentences, profile, batch_size, budget, num_beams)
+    return run_batched("paraphraser", _generate_paraphrases, sentences,
+                       profile=profile, batch_size=batch_size, num_beams=num_beams)
 
-    # Handle options
+
+@hosted("paraphraser.generate", model="paraphraser")
+def _generate_paraphrases(sentences, profile=DEFAULT_PROFILE, batch_size=16, budget=None, num_beams=None):
+    tokenizer, model = get_model("paraphraser")
+    with span("paraphrase.tokenize"):
+        lengths = [len(ids) for ids in tokenizer(sentences, truncation=True)["input_ids"]]
+    order = sorted(range(len(sentences)), key=lambda i: lengths[i])
+    paraphrased = [None] * len(sentences)
+
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        if budget is not None and budget.exhausted:
+            for i in batch:
+                paraphrased[i] = sentences[i]
+            continue
+        with span("paraphrase.tokenize"):
+            inputs = tokenizer([sentences[i] for i in batch], truncation=True, padding="longest",
+                               return_tensors="pt").to(model.device)
+
+        # Window from the sentences' own lengths, not the padded width: no sentence is pushed past
+        # the minimum of the shortest one, and the longest still has room
+        min_length = length_window(min(lengths[i] for i in batch))[0]
+        max_length = length_window(max(lengths[i] for i in batch))[1]
+
+        with span("paraphrase.infer"):
+            outputs = model.generate(
+                **inputs,
+                num_return_sequences=1,
+                **generate_kwargs("paraphraser", tokenizer, profile, min_length, max_length,
+                                  batch_size=len(batch), budget=budget, num_beams=num_beams)
+            )
+        if budget is not None:
+            budget.charge(int((outputs != tokenizer.pad_token_id).sum()))
+        for i, output in zip(batch, tokenizer.batch_decode(outputs, skip_special_tokens=True)):
+            paraphrased[i] = output
+    return paraphrased
+
+
+def paraphrase_texts(texts, option="normal", voice_type="passive", batch_size=16, profile=DEFAULT_PROFILE,
+                     budget=None, num_beams=None):
+    """
+    Paraphrases several texts sentence by sentence. Sentences from all texts share
+    the same batches, and each text is reassembled with its original line breaks.
+    """
     if option == "first_person_removal":
-        text = remove_first_person(text)
+        texts = [remove_first_person(text) for text in texts]
+
+    layouts, sentences = [], []
+    for text in texts:
+        parts = split_paragraphs(text)
+        layout = []
+        for index, part in enumerate(parts):
+            if index % 2 or not part.strip():
+                layout.append(part)  # line breaks and blank paragraphs are kept verbatim
+            else:
+                paragraph_sentences = split_sentences(part)
+                layout.append((len(sentences), len(paragraph_sentences)))
+                sentences.extend(paragraph_sentences)
+        layouts.append(layout)
 
-    inputs = tokenizer([text], truncation=True, padding="longest", return_tensors="pt")
+    outputs = generate_paraphrases(sentences, profile, batch_size, budget, num_beams) if sentences else []
 
-    input_length = inputs['input_ids'].shape[1]
-    max_length = input_length + 10  # buffer
-    min_length = max(input_length - 10, 20)
+    results = []
+    with span("paraphrase.postprocess"):
+        for layout in layouts:
+            paraphrased = "".join(part if isinstance(part, str) else " ".join(outputs[part[0]:part[0] + part[1]])
+                                  for part in layout)
+            results.append(finish_paraphrase(paraphrased, option, voice_type))
+    return results
 
-    outputs = model.generate(
-        **inputs,
-        max_length=max_length,
-        min_length=min_length,
-        num_beams=5,
-        num_return_sequences=1,
-        temperature=1.0,
-        early_stopping=True
-    )
-    paraphrased = tokenizer.decode(outputs[0], skip_special_tokens=True)
 
+def finish_paraphrase(paraphrased, option="normal", voice_type="passive"):
+    """
+    Applies the option's post-processing to model output (also for text joined from stream_paraphrase deltas).
+    """
     # Apply academic filter
     if option == "academic_filter":
         paraphrased = simulate_academic_style(paraphrased)
@@ -59,5 +140,98 @@ def paraphrase_text(text, option="normal", voice_type="passive"):
     # Apply voice conversion
     if option == "active_passive":
         paraphrased = convert_voice(paraphrased, to_voice=voice_type)
+    return paraphrased
+
+
+@cached("paraphrase_text", model="paraphraser")
+def paraphrase_text(text, option="normal", voice_type="passive", batch_size=16, profile=DEFAULT_PROFILE,
+                    time_budget=None, token_budget=None, num_beams=None):
+    """
+    :param profile: generation profile ('fast', 'balanced' or 'quality')
+    :param num_beams: beam width overriding the profile's
+    :param time_budget: seconds the request may take; sentences not reached in time are kept as written
+    :param token_budget: total tokens the model may generate for this request
+    """
+    budget = make_budget(time_budget, token_budget)
+    paraphrased = paraphrase_texts([text], option, voice_type, batch_size, profile, budget, num_beams)[0]
+    if budget is not None and budget.exhausted:
+        skip_cache()  # sentences not reached were kept as written, depending on load
+    return paraphrased
+
+
+DOCUMENT_PIECE_CHARS = 20000  # text read at a time from spooled documents
+
+
+def paraphrase_document(document, option="normal", voice_type="passive", batch_size=16, profile=DEFAULT_PROFILE,
+                        time_budget=None, token_budget=None, num_beams=None):
+    """
+    paraphrase_text for a document.SpooledDocument, read in blocks of whole lines, so only
+    the paraphrase is held in memory and not the input text as well.
+    """
+    budget = make_budget(time_budget, token_budget)
+    return "\n".join(paraphrase_texts([block], option, voice_type, batch_size, profile, budget, num_beams)[0]
+                     for _, _, block in document.iter_blocks(DOCUMENT_PIECE_CHARS))
+
+
+# ------------------------
+# Streaming
+# ------------------------
+def stream_paraphrase(text, option="normal", voice_type="passive", profile=DEFAULT_PROFILE, time_budget=None,
+                      token_budget=None, cancelled=None):
+    """
+    Yields the paraphrase of text as decoded text deltas, sentence by sentence and with
+    the original line breaks, while it is generated (greedy decoding). finish_paraphrase
+    applies the option's post-processing to the joined deltas.
+    :param cancelled: optional callable; generation stops once it returns True
+    """
+    if option == "first_person_removal":
+        text = remove_first_person(text)
+    yield from _stream_text(text, profile, make_budget(time_budget, token_budget), cancelled)
+
+
+def stream_paraphrase_document(document, option="normal", voice_type="passive", profile=DEFAULT_PROFILE,
+                               time_budget=None, token_budget=None, cancelled=None):
+    """
+    stream_paraphrase for a document.SpooledDocument, read in blocks of whole lines.
+    """
+    budget = make_budget(time_budget, token_budget)
+    for index, (_, _, block) in enumerate(document.iter_blocks(DOCUMENT_PIECE_CHARS)):
+        if cancelled and cancelled():
+            return
+        if index:
+            yield "\n"
+        if option == "first_person_removal":
+            block = remove_first_person(block)
+        yield from _stream_text(block, profile, budget, cancelled)
+
+
+def _stream_text(text, profile, budget, cancelled):
+    for index, part in enumerate(split_paragraphs(text)):
+        if index % 2 or not part.strip():
+            yield part  # line breaks and blank paragraphs are kept verbatim
+            continue
+        for position, sentence in enumerate(split_sentences(part)):
+            if cancelled and cancelled():
+                return
+            if position:
+                yield " "
+            if budget is not None and budget.exhausted:
+                yield sentence
+                continue
+            generated = []
+            for delta in _stream_sentence(sentence, profile, budget, cancelled=cancelled):
+                generated.append(delta)
+                yield delta
+            if budget is not None:
+                budget.charge(len(get_tokenizer("paraphraser")("".join(generated))["input_ids"]))
+
 
-    return paraphrased
\ No newline at end of file
+@hosted("paraphraser.stream", model="paraphraser")
+def _stream_sentence(sentence, profile=DEFAULT_PROFILE, budget=None, cancelled=None):
+    tokenizer, model = get_model("paraphraser")
+    with span("paraphrase.tokenize"):
+        inputs = tokenizer([sentence], truncation=True, return_tensors="pt").to(model.device)
+    min_length, max_length = length_window(inputs['input_ids'].shape[1])
+    kwargs = generate_kwargs("paraphraser", tokenizer, profile, min_length, max_length, budget=budget,
+                             streaming=True)
+    yield from stream_generate("paraphrase", tokenizer, model, inputs, kwargs, cancelled)
@@ -1,11 +1,17 @@
 from backend.utils import read_pdf, read_docx, read_txt
 from backend.intrinsic_detector import intrinsic_plagiarism_score
 from backend.AI_detector import detect_ai_text
+from backend.corpus_index import check_corpus_plagiarism
+from backend.integrity import analyze_integrity
 
 # Export AI_detector for external use
 AI_detector = detect_ai_text
 # Export intrinsic_detector for external use
 intrinsic_detector = intrinsic_plagiarism_score
+# Export corpus_detector (local cross-document index) for external use
+corpus_detector = check_corpus_plagiarism
+# Export integrity_detector (all checks in one pass, with per-sentence annotations) for external use
+integrity_detector = analyze_integrity
 
 def process_file(uploaded_file):
     """
@@ -31,3 +37,11 @@ def check_ai_generated(text):
 
 def check_intrinsic_plagiarism(text):
     return intrinsic_plagiarism_score(text)
+
+
+def check_corpus_matches(text):
+    return check_corpus_plagiarism(text)
+
+
+def check_integrity(text):
+    return analyze_integrity(text)
@@ -0,0 +1,53 @@
+# backend/prefetch.py
+"""
+Downloads the model weights the backend needs ahead of time, e.g. while building
+a container image, so the app can then run with HF_HUB_OFFLINE=1 and never touch
+the network at startup or on the first request.
+
+    python -m backend.prefetch [--models summarizer paraphraser ...] [--onnx]
+
+Models honour the usual TEXTINOVA_MODEL_<NAME> / TEXTINOVA_REVISION_<NAME>
+settings; with --onnx they are also exported to ONNX_CACHE_DIR.
+"""
+import argparse
+import os
+
+from backend.models import MODEL_SPECS, configure_backend, get_model, model_id, model_revision, unload
+
+
+def prefetch_model(name):
+    """
+    Downloads a registered model into the Hugging Face cache and returns its local path.
+    """
+    from huggingface_hub import snapshot_download
+
+    path = model_id(name)
+    if os.path.isdir(path):  # already a local copy
+        return path
+    return snapshot_download(path, revision=model_revision(name))
+
+
+def export_onnx(name):
+    """
+    Loads a model once on the onnx backend, which exports and caches its graph.
+    """
+    configure_backend(name, "onnx")
+    get_model(name)
+    unload(name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download model weights ahead of time.")
+    parser.add_argument("--models", nargs="+", choices=list(MODEL_SPECS), default=list(MODEL_SPECS))
+    parser.add_argument("--onnx", action="store_true", help="also export the models to ONNX")
+    args = parser.parse_args(argv)
+
+    for name in args.models:
+        print(f"{name}: {prefetch_model(name)}")
+        if args.onnx:
+            export_onnx(name)
+            print(f"{name}: exported to ONNX")
+
+
+if __name__ == "__main__":
+    main()
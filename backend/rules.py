@@ -0,0 +1,131 @@
+# backend/rules.py
+"""
+Single-pass phrase substitution for tone, academic style and first-person rewriting.
+
+Each rule profile is a {phrase: replacement} dict. On first use a profile is
+compiled into one regular expression whose alternatives are laid out as a
+character trie, so a match at any position costs the length of the phrase, not
+the number of rules. The text is then rewritten in a single re.sub pass, with
+the case of the matched text carried over to the replacement.
+
+More rules can be loaded from JSON files of the form
+    {"academic": {"kind of": "somewhat", ...}, "my_profile": {...}}
+listed in TEXTINOVA_RULES_PATH (separated like PATH) or passed to load_rule_file.
+"""
+import json
+import os
+import re
+import threading
+
+BUILTIN_RULES = {
+    "academic": {
+        "get": "obtain",
+        "a lot": "a significant amount",
+        "really": "truly",
+        "very": "highly",
+        "help": "assist",
+        "show": "demonstrate",
+    },
+    "first_person": {word: "" for word in ("I", "we", "me", "my", "mine", "our", "us", "ours")},
+    "informal": {"do not": "don't", "cannot": "can't", "will not": "won't", "is not": "isn't"},
+    "formal": {"don't": "do not", "can't": "cannot", "won't": "will not", "isn't": "is not"},
+}
+
+_rules = {profile: dict(rules) for profile, rules in BUILTIN_RULES.items()}
+_compiled = {}
+_lock = threading.Lock()
+
+
+def _trie_pattern(phrases):
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase.lower():
+            node = node.setdefault(char, {})
+        node[""] = {}  # end of a phrase
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A phrase ending here is optional so the longest phrase wins, e.g. "do" vs "do not"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+def match_case(source, replacement):
+    """
+    Carries the case of source over to replacement: UPPER, Capitalized or as written.
+    """
+    if not replacement or not source:
+        return replacement
+    if len(source) > 1 and source.isupper():
+        return replacement.upper()
+    if source[0].isupper():
+        return replacement[0].upper() + replacement[1:]
+    return replacement
+
+
+class RuleSet:
+    """
+    A compiled profile: all phrases in one trie-shaped pattern, applied in one pass.
+    """
+
+    def __init__(self, replacements):
+        self.replacements = {phrase.lower(): replacement for phrase, replacement in replacements.items()}
+        self.pattern = None
+        if self.replacements:
+            self.pattern = re.compile(r"\b" + _trie_pattern(self.replacements) + r"\b", flags=re.IGNORECASE)
+
+    def _replace(self, match):
+        source = match.group(0)
+        replacement = self.replacements.get(source.lower())
+        if replacement is None:
+            # Matched through Unicode case folding ("ſ" for "s", "İ" for "i"), which lower() does not undo
+            replacement = next(replacement for phrase, replacement in self.replacements.items()
+                               if re.fullmatch(re.escape(phrase), source, flags=re.IGNORECASE))
+        return match_case(source, replacement)
+
+    def apply(self, text):
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(self._replace, text)
+
+    def __len__(self):
+        return len(self.replacements)
+
+
+def load_rule_file(path):
+    """
+    Adds the rules of a JSON file to their profiles (later files override earlier rules).
+    """
+    with open(path, encoding="utf-8") as f:
+        profiles = json.load(f)
+    if not isinstance(profiles, dict) or not all(isinstance(rules, dict) for rules in profiles.values()):
+        raise ValueError(f"{path}: expected {{profile: {{phrase: replacement}}}}")
+    with _lock:
+        for profile, rules in profiles.items():
+            _rules.setdefault(profile, {}).update(rules)
+            _compiled.pop(profile, None)
+
+
+def get_rules(profile):
+    """
+    Returns the compiled RuleSet of a profile, compiling it on first use.
+    """
+    with _lock:
+        if profile not in _compiled:
+            if profile not in _rules:
+                raise ValueError(f"Unknown rule profile: {profile}")
+            _compiled[profile] = RuleSet(_rules[profile])
+        return _compiled[profile]
+
+
+def apply_rules(profile, text):
+    return get_rules(profile).apply(text)
+
+
+for _path in filter(None, os.environ.get("TEXTINOVA_RULES_PATH", "").split(os.pathsep)):
+    load_rule_file(_path)
@@ -0,0 +1,97 @@
+# backend/segmentation.py
+"""
+Shared document model: the text is segmented once into paragraphs (lines) and
+sentences with character offsets, and tokenized once per tokenizer with each
+sentence's token span recorded. The integrity detectors all read from it
+instead of re-splitting and re-tokenizing the text themselves.
+"""
+import re
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+class Sentence:
+    __slots__ = ("index", "start", "end", "paragraph", "token_start", "token_end")
+
+    def __init__(self, index, start, end, paragraph):
+        self.index = index
+        self.start = start  # character offsets into Document.text
+        self.end = end
+        self.paragraph = paragraph
+        self.token_start = self.token_end = None  # token offsets, set by Document.tokenize
+
+
+class Document:
+    """
+    A text with its paragraphs (one per line, as the detectors treat them),
+    sentences and, once tokenize() was called, token ids.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.paragraphs = []  # (start, end) character spans of the lines
+        self.sentences = []
+        self.token_ids = None
+        self._tokenizer = None
+
+        offset = 0
+        for line in text.split("\n"):
+            paragraph = len(self.paragraphs)
+            self.paragraphs.append((offset, offset + len(line)))
+            position = 0
+            for piece in SENTENCE_END.split(line):
+                start = line.index(piece, position) if piece else position
+                position = start + len(piece)
+                stripped = piece.strip()
+                if stripped:
+                    lead = len(piece) - len(piece.lstrip())
+                    begin = offset + start + lead
+                    self.sentences.append(Sentence(len(self.sentences), begin, begin + len(stripped), paragraph))
+            offset += len(line) + 1
+
+    def paragraph_text(self, index):
+        start, end = self.paragraphs[index]
+        return self.text[start:end]
+
+    def sentence_text(self, sentence):
+        return self.text[sentence.start:sentence.end]
+
+    def paragraph_sentences(self, index):
+        return [s for s in self.sentences if s.paragraph == index]
+
+    def tokenize(self, tokenizer):
+        """
+        Tokenizes every sentence together with the whitespace before it, so the
+        concatenated ids match tokenizing the whole text, and records each
+        sentence's [token_start, token_end) span. Repeated calls with the same
+        tokenizer reuse the result.
+        """
+        if self._tokenizer is tokenizer:
+            return self.token_ids
+        pieces, previous_end = [], 0
+        for sentence in self.sentences:
+            # Line breaks stay with the sentence that follows, like any other whitespace
+            pieces.append(self.text[previous_end:sentence.end])
+            previous_end = sentence.end
+        encoded = tokenizer(pieces, add_special_tokens=False, verbose=False)["input_ids"] if pieces else []
+
+        self.token_ids = []
+        for sentence, ids in zip(self.sentences, encoded):
+            sentence.token_start = len(self.token_ids)
+            self.token_ids.extend(ids)
+            sentence.token_end = len(self.token_ids)
+        self._tokenizer = tokenizer
+        return self.token_ids
+
+    def paragraph_token_ids(self):
+        """
+        Token ids grouped by non-empty paragraph, in order (requires tokenize()).
+        """
+        groups = {}
+        for sentence in self.sentences:
+            groups.setdefault(sentence.paragraph, []).extend(self.token_ids[sentence.token_start:sentence.token_end])
+        return [groups[index] for index in sorted(groups)]
+
+
+def segment(text):
+    return Document(text)
@@ -0,0 +1,334 @@
+# backend/semantic_index.py
+"""
+Embedding-based similarity: catches paraphrased repetition that TF-IDF misses.
+
+Sentences are encoded in batches by the registry's "embedder" model (mean-pooled,
+L2-normalised). Within a document, pairs above SEMANTIC_THRESHOLD are reported
+like the lexical check does; across documents, sentences are matched against a
+persistent SemanticIndex.
+
+The index is a directory of flat files, so opening it is a handful of mmaps:
+  vectors.bin     one row per sentence, int8 (v * 127) or float16, appended in place
+  assignments.bin int32 IVF cluster of every row covered by the lists
+  centroids.npy   IVF centroids (spherical k-means, ~sqrt(N) of them)
+  lists.npy       row ids grouped by cluster, with offsets.npy delimiting the clusters
+  sentences.sqlite the text and document of every row
+  meta.json       dimensions, dtype and how many rows exist / are covered by the lists
+  index.lock      held (flock) by the one process adding documents at a time
+Rows past meta.json's count belong to a write in progress (or an interrupted one):
+readers ignore them and the next writer removes them. A query scores the rows of the NPROBE closest clusters plus the rows added since
+the lists were last rebuilt, so it touches a small fraction of a large index.
+"""
+import json
+import math
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from backend.model_host import hosted
+from backend.models import get_model
+from backend.telemetry import span
+
+DEFAULT_SEMANTIC_INDEX = os.environ.get("TEXTINOVA_SEMANTIC_INDEX", "semantic_index")
+VECTOR_DTYPE = os.environ.get("TEXTINOVA_SEMANTIC_DTYPE", "int8")  # "int8" or "float16"
+NPROBE = int(os.environ.get("TEXTINOVA_SEMANTIC_NPROBE", "16"))  # clusters scanned per query
+SEMANTIC_THRESHOLD = 0.85
+MIN_TRAIN_ROWS = 4096  # below this, queries scan every row and no clusters are trained
+MAX_TRAIN_SAMPLE = 100_000
+MAX_BLOCK_ENTRIES = 4_000_000
+INT8_SCALE = 127.0
+
+
+@hosted("embedder.encode", model="embedder")
+def encode(sentences, batch_size=32):
+    """
+    Embeds sentences with the embedder model in length-sorted batches.
+    :return: float32 array of shape (len(sentences), dim) with unit-length rows
+    """
+    import torch
+
+    tokenizer, model = get_model("embedder")
+    order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]))
+    vectors = None
+
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        inputs = tokenizer([sentences[i] for i in batch], padding=True, truncation=True,
+                           return_tensors="pt").to(model.device)
+        with span("semantic.encode"), torch.no_grad():
+            hidden = model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+            pooled = torch.nn.functional.normalize(pooled, dim=1).cpu().numpy()
+        if vectors is None:
+            vectors = np.zeros((len(sentences), pooled.shape[1]), dtype=np.float32)
+        vectors[batch] = pooled
+    return vectors if vectors is not None else np.zeros((0, 0), dtype=np.float32)
+
+
+def quantize(vectors, dtype=VECTOR_DTYPE):
+    if dtype == "int8":
+        return np.clip(np.rint(vectors * INT8_SCALE), -127, 127).astype(np.int8)
+    if dtype == "float16":
+        return vectors.astype(np.float16)
+    raise ValueError(f"Unknown vector dtype: {dtype}")
+
+
+def dequantize(rows):
+    rows = np.asarray(rows)
+    return rows.astype(np.float32) / INT8_SCALE if rows.dtype == np.int8 else rows.astype(np.float32)
+
+
+def iter_similar_pairs(vectors, threshold=SEMANTIC_THRESHOLD, max_block_entries=MAX_BLOCK_ENTRIES):
+    """
+    Yields (i, j, similarity) for i < j above threshold, in blocks of at most max_block_entries.
+    """
+    n = len(vectors)
+    block_size = max(1, max_block_entries // max(n, 1))
+    for start in range(0, n, block_size):
+        block = vectors[start:start + block_size] @ vectors[start:].T
+        rows, cols = np.nonzero(block > threshold)
+        rows, cols = rows + start, cols + start
+        for i, j in zip(rows, cols):
+            if j > i:
+                yield int(i), int(j), float(block[i - start, j - start])
+
+
+def spherical_kmeans(vectors, clusters, iterations=10, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        labels = nearest_centroids(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        empty = ~sums.any(axis=1)
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]  # reseed empty clusters
+        centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True)
+    return centroids.astype(np.float32)
+
+
+def nearest_centroids(vectors, centroids, chunk_size=16384):
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk_size):
+        labels[start:start + chunk_size] = np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+    return labels
+
+
+class SemanticIndex:
+    """
+    Persistent IVF index of sentence embeddings in a directory of memory-mapped files.
+    """
+
+    def __init__(self, path=DEFAULT_SEMANTIC_INDEX):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(path, "sentences.sqlite"), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS sentences (
+                id INTEGER PRIMARY KEY,
+                document TEXT NOT NULL,
+                text TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sentences_document ON sentences (document);
+        """)
+        self._open()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _open(self):
+        meta_path = self._file("meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {"dim": None, "dtype": VECTOR_DTYPE, "count": 0, "listed": 0, "trained_on": 0}
+        count, dim = self.meta["count"], self.meta["dim"]
+        self.vectors = (np.memmap(self._file("vectors.bin"), dtype=self.meta["dtype"], mode="r", shape=(count, dim))
+                        if count else None)
+        if self.meta["trained_on"]:
+            self.centroids = np.load(self._file("centroids.npy"))
+            self.lists = np.load(self._file("lists.npy"), mmap_mode="r")
+            self.offsets = np.load(self._file("offsets.npy"))
+        else:
+            self.centroids = self.lists = self.offsets = None
+
+    def _write_meta(self):
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self._file("meta.json"))  # commits the rows and lists written before it
+
+    def _save_array(self, name, array):
+        tmp = self._file(name + ".tmp.npy")
+        np.save(tmp, array)
+        os.replace(tmp, self._file(name))
+
+    def close(self):
+        self._db.close()
+        self.vectors = self.lists = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM sentences WHERE id < ?", (self.meta["count"],)).fetchone()[0]
+
+    @contextmanager
+    def _writing(self):
+        """
+        Serializes writers across threads and processes, and reloads the files another writer may have changed.
+        """
+        import fcntl
+
+        with self._lock, open(self._file("index.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._open()
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def add_document(self, name, sentences, vectors=None):
+        """
+        Indexes the sentences of a document; a document already indexed under name is replaced.
+        """
+        if not sentences:
+            return
+        if vectors is None:
+            vectors = encode(sentences)
+        with self._writing():
+            if self.meta["dim"] is None:
+                self.meta["dim"] = vectors.shape[1]
+            elif vectors.shape[1] != self.meta["dim"]:
+                raise ValueError(f"{self.path} holds {self.meta['dim']}-dimensional vectors, got {vectors.shape[1]}")
+            start = self.meta["count"]
+            with open(self._file("vectors.bin"), "ab") as f:
+                # Rows past meta["count"] (from an interrupted write) are overwritten
+                f.truncate(start * self.meta["dim"] * np.dtype(self.meta["dtype"]).itemsize)
+                f.write(quantize(vectors, self.meta["dtype"]).tobytes())
+            with self._db:
+                # Rows past meta["count"] were committed by an add interrupted before _write_meta
+                self._db.execute("DELETE FROM sentences WHERE id >= ?", (start,))
+                # Rows of a replaced document stay in the vector file but no longer resolve to text
+                self._db.execute("DELETE FROM sentences WHERE document = ?", (name,))
+                self._db.executemany("INSERT INTO sentences (id, document, text) VALUES (?, ?, ?)",
+                                     [(start + i, name, text) for i, text in enumerate(sentences)])
+            self.meta["count"] = start + len(sentences)
+            self._update_lists()
+            self._write_meta()
+            self._open()
+
+    def _update_lists(self):
+        count, listed, dim = self.meta["count"], self.meta["listed"], self.meta["dim"]
+        if count < MIN_TRAIN_ROWS:
+            return
+        vectors = np.memmap(self._file("vectors.bin"), dtype=self.meta["dtype"], mode="r", shape=(count, dim))
+        if count >= 2 * self.meta["trained_on"]:
+            # Retrain as the index doubles, so the clusters stay ~sqrt(N) and balanced
+            with span("semantic.train"):
+                clusters = min(4096, int(math.sqrt(count)))
+                sample = np.random.default_rng(0).choice(count, min(count, MAX_TRAIN_SAMPLE), replace=False)
+                centroids = spherical_kmeans(dequantize(vectors[np.sort(sample)]), clusters)
+            self._save_array("centroids.npy", centroids)
+            assignments = np.empty(0, dtype=np.int32)
+            self.meta["trained_on"] = count
+            listed = 0
+        elif count - listed > max(1024, listed // 10):
+            centroids = np.load(self._file("centroids.npy"))
+            assignments = np.fromfile(self._file("assignments.bin"), dtype=np.int32, count=listed)
+        else:
+            return  # few unlisted rows; queries scan them directly
+
+        with span("semantic.assign"):
+            new = np.concatenate([nearest_centroids(dequantize(vectors[start:start + 65536]), centroids)
+                                  for start in range(listed, count, 65536)])
+        assignments = np.concatenate([assignments, new])
+        assignments.tofile(self._file("assignments.bin"))
+        order = np.argsort(assignments, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+        self._save_array("lists.npy", order)
+        self._save_array("offsets.npy", offsets)
+        self.meta["listed"] = count
+
+    def _candidates(self, query, nprobe):
+        tail = np.arange(self.meta["listed"], self.meta["count"])
+        if self.centroids is None:
+            return np.arange(self.meta["count"])
+        nearest = np.argpartition(-(self.centroids @ query), min(nprobe, len(self.centroids)) - 1)[:nprobe]
+        rows = [self.lists[self.offsets[c]:self.offsets[c + 1]] for c in nearest]
+        return np.sort(np.concatenate(rows + [tail]))
+
+    def search(self, vectors, threshold=SEMANTIC_THRESHOLD, top_k=3, nprobe=NPROBE):
+        """
+        Finds indexed sentences close to each query vector.
+        :return: list (one per query) of [(similarity, document, text), ...], most similar first
+        """
+        if self.vectors is None:
+            return [[] for _ in vectors]
+        hits = []
+        with span("semantic.search"):
+            for query in vectors:
+                rows = self._candidates(query, nprobe)
+                scores = dequantize(self.vectors[rows]) @ query
+                best = np.argsort(-scores)[:top_k * 4]  # extra room for rows of replaced documents
+                hits.append([(float(scores[b]), int(rows[b])) for b in best if scores[b] > threshold])
+
+        ids = sorted({row for query_hits in hits for _, row in query_hits})
+        texts = {}
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                texts.update((row, (document, text)) for row, document, text in self._db.execute(
+                    f"SELECT id, document, text FROM sentences WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+        return [[(sim, *texts[row]) for sim, row in query_hits if row in texts][:top_k] for query_hits in hits]
+
+
+def semantic_similarity(sentences, index_path=DEFAULT_SEMANTIC_INDEX, exclude=None):
+    """
+    Semantic counterpart of intrinsic_similarity: same result format, plus
+    "index_matches" against the semantic index if one exists at index_path.
+    :param exclude: document name whose indexed sentences are ignored (e.g. the submission itself)
+    """
+    if not sentences:
+        return {"similarity_score": 0, "similar_pairs": [], "index_matches": []}
+    vectors = encode(sentences)
+
+    n = len(sentences)
+    similar_pairs, avg_similarity = [], 0.0
+    if n >= 2:
+        with span("semantic.pairs"):
+            similar_pairs = [{
+                "sentence_1": sentences[i],
+                "sentence_2": sentences[j],
+                "similarity": round(sim, 2)
+            } for i, j, sim in iter_similar_pairs(vectors)]
+        # Unit rows: sum_{i<j} x_i.x_j = (|sum_i x_i|^2 - n) / 2
+        column_sum = vectors.sum(axis=0)
+        avg_similarity = (column_sum @ column_sum - n) / 2 / (n * (n - 1) / 2) * 100
+
+    index_matches = []
+    if os.path.exists(os.path.join(index_path, "meta.json")):
+        with SemanticIndex(index_path) as index:
+            for sentence, hits in zip(sentences, index.search(vectors)):
+                index_matches.extend({"sentence": sentence, "document": document, "match": text,
+                                      "similarity": round(sim, 2)}
+                                     for sim, document, text in hits if document != exclude)
+
+    return {
+        "similarity_score": round(float(avg_similarity), 2),
+        "similar_pairs": similar_pairs,
+        "index_matches": index_matches,
+    }
+
+
+def index_document(name, sentences, index_path=DEFAULT_SEMANTIC_INDEX):
+    with SemanticIndex(index_path) as index:
+        index.add_document(name, sentences)
@@ -1,98 +1,397 @@
-import torch
-from transformers import BartTokenizer, BartForConditionalGeneration
-import nltk
+import itertools
 import re
-import fitz  # PyMuPDF
-import pytesseract
-from pdf2image import convert_from_path
-
-# Download NLTK tokenizer (first run only)
-nltk.download('punkt', quiet=True)
-
-# Load BART model & tokenizer
-model_name = 'facebook/bart-large-cnn'
-tokenizer = BartTokenizer.from_pretrained(model_name)
-model = BartForConditionalGeneration.from_pretrained(model_name)
-
-# Use GPU if available
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model = model.to(device)
+import numpy as np
+from backend.models import get_model, get_tokenizer
+from backend.cache import cached, skip_cache
+from backend.generation import DEFAULT_PROFILE, generate_kwargs, make_budget, stream_generate
+from backend.inference_server import run_batched
+from backend.model_host import hosted
+from backend.rules import apply_rules
+from backend.telemetry import span, timed
+from backend.ingestion import iter_pdf_pages
 
 
 # ------------------------
 # Extractive summarizer
 # ------------------------
-def extractive_summarize(text, num_sentences=2):
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    if len(sentences) <= num_sentences:
+def textrank_scores(matrix, damping=0.85, max_iter=100, tol=1e-6):
+    """
+    PageRank over the sentence cosine-similarity graph without materialising it:
+    with L2-normalised rows, S v = X (X^T v) - diag(X X^T) v, so each iteration is two sparse products.
+    """
+    n = matrix.shape[0]
+    self_similarity = np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel()
+
+    def similarity_dot(v):
+        return matrix @ (matrix.T @ v) - self_similarity * v
+
+    degree = similarity_dot(np.ones(n))
+    dangling = degree <= 1e-12
+    degree[dangling] = 1.0
+
+    scores = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        spread = similarity_dot(np.where(dangling, 0.0, scores / degree))
+        # mass of sentences with no neighbours is spread uniformly
+        updated = (1 - damping) / n + damping * (spread + scores[dangling].sum() / n)
+        if np.abs(updated - scores).sum() < tol:
+            return updated
+        scores = updated
+    return scores
+
+
+def centroid_scores(matrix):
+    centroid = np.asarray(matrix.mean(axis=0)).ravel()
+    return matrix @ centroid
+
+
+@timed("summarize.extractive")
+def extractive_summarize(text, num_sentences=2, method='textrank', max_tokens=None):
+    """
+    Picks the most central sentences and returns them in their original order.
+    :param method: 'textrank' (PageRank over TF-IDF similarity) or 'centroid' (similarity to the document centroid)
+    :param max_tokens: word budget; when given it replaces num_sentences as the length target
+    """
+    sentences = split_sentences(text)
+    if len(sentences) <= num_sentences and not max_tokens:
         return ' '.join(sentences)
-    ranked = sorted(sentences, key=lambda s: len(s), reverse=True)
-    return ' '.join(ranked[:num_sentences])
+
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    try:
+        matrix = TfidfVectorizer().fit_transform(sentences)
+    except ValueError:  # no usable terms at all
+        return ' '.join(sentences[:num_sentences])
+    scores = textrank_scores(matrix) if method == 'textrank' else centroid_scores(matrix)
+    ranked = np.argsort(-scores, kind='stable')
+
+    if max_tokens:
+        chosen, used = [], 0
+        for i in ranked:
+            words = len(sentences[i].split())
+            if chosen and used + words > max_tokens:
+                continue
+            chosen.append(i)
+            used += words
+    else:
+        chosen = ranked[:num_sentences]
+    return ' '.join(sentences[i] for i in sorted(chosen))
 
 
 # ------------------------
 # Tone changer
 # ------------------------
 def change_tone(text, tone):
-    if tone == 'informal':
-        replacements = {"do not": "don't", "cannot": "can't", "will not": "won't", "is not": "isn't"}
-    elif tone == 'formal':
-        replacements = {"don't": "do not", "can't": "cannot", "won't": "will not", "isn't": "is not"}
-    else:
-        replacements = {}
-
-    for k, v in replacements.items():
-        text = re.sub(r'\b' + re.escape(k) + r'\b', v, text, flags=re.IGNORECASE)
+    if tone in ('informal', 'formal'):
+        with span("summarize.postprocess"):
+            return apply_rules(tone, text)
     return text
 
 
 # ------------------------
 # Clean summary text
 # ------------------------
+PROMOTIONAL_TEXT = re.compile(r'http\S+|www\S+|\bvisit\b.*|call.*|click here.*', flags=re.IGNORECASE)
+WHITESPACE = re.compile(r'\s+')
+
+
 def clean_summary(text):
-    text = re.sub(r'http\S+|www\S+|\bvisit\b.*|call.*|click here.*', '', text, flags=re.IGNORECASE)
-    text = re.sub(r'\s+', ' ', text)
+    text = PROMOTIONAL_TEXT.sub('', text)
+    text = WHITESPACE.sub(' ', text)
     return text.strip()
 
 
+# ------------------------
+# Batched BART generation
+# ------------------------
+MAX_INPUT_TOKENS = 1024  # BART-large-CNN position limit
+CHUNK_SUMMARY_LENGTH = (30, 142)  # per-chunk (min, max) tokens in the map step
+
+
+def generate_summaries(texts, min_length, max_length, profile=DEFAULT_PROFILE, budget=None, num_beams=None):
+    """
+    Summarizes a batch of texts with a single padded model.generate call,
+    shared with concurrent callers when micro-batching is enabled.
+    Budgeted requests run on their own so their limits do not cut other callers short.
+    :param num_beams: beam width overriding the profile's
+    """
+    if budget is not None:
+        return _generate_summaries(texts, min_length, max_length, profile, budget, num_beams)
+    return run_batched("summarizer", _generate_summaries, texts,
+                       min_length=min_length, max_length=max_length, profile=profile, num_beams=num_beams)
+
+
+@hosted("summarizer.generate", model="summarizer")
+def _generate_summaries(texts, min_length, max_length, profile=DEFAULT_PROFILE, budget=None, num_beams=None):
+    tokenizer, model = get_model("summarizer")
+    with span("summarize.tokenize"):
+        inputs = tokenizer(texts, max_length=MAX_INPUT_TOKENS, return_tensors='pt',
+                           truncation=True, padding=True).to(model.device)
+    with span("summarize.infer"):
+        summary_ids = model.generate(inputs["input_ids"], attention_mask=inputs["attention_mask"], length_penalty=1,
+                                     **generate_kwargs("summarizer", tokenizer, profile, min_length, max_length,
+                                                       batch_size=len(texts), budget=budget, num_beams=num_beams))
+    if budget is not None:
+        budget.charge(int((summary_ids != tokenizer.pad_token_id).sum()))
+    with span("summarize.postprocess"):
+        return [clean_summary(s) for s in tokenizer.batch_decode(summary_ids, skip_special_tokens=True)]
+
+
+# ------------------------
+# Long-document summarization (map-reduce)
+# ------------------------
+def split_sentences(text):
+    return [s for s in re.split(r'(?<=[.!?])\s+', text) if s.strip()]
+
+
+def chunk_text(text, max_tokens=MAX_INPUT_TOKENS - 24):
+    """
+    Splits text into sentence-aligned chunks of at most max_tokens tokens.
+    Sentences longer than a whole chunk are cut at token boundaries.
+    """
+    tokenizer = get_tokenizer("summarizer")
+    sentences = split_sentences(text)
+    if not sentences:
+        return []
+    with span("summarize.tokenize"):
+        token_ids = tokenizer(sentences, add_special_tokens=False)["input_ids"]
+
+    chunks, current, current_len = [], [], 0
+    for sentence, ids in zip(sentences, token_ids):
+        if len(ids) > max_tokens:
+            pieces = [tokenizer.decode(ids[i:i + max_tokens]) for i in range(0, len(ids), max_tokens)]
+            pieces = [(piece, min(max_tokens, len(ids) - i * max_tokens)) for i, piece in enumerate(pieces)]
+        else:
+            pieces = [(sentence, len(ids))]
+        for piece, n in pieces:
+            if current and current_len + n > max_tokens:
+                chunks.append(' '.join(current))
+                current, current_len = [], 0
+            current.append(piece)
+            current_len += n
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+
+def count_tokens(text):
+    tokenizer = get_tokenizer("summarizer")
+    with span("summarize.tokenize"):
+        return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+
+def truncate_tokens(text, max_tokens):
+    tokenizer = get_tokenizer("summarizer")
+    with span("summarize.tokenize"):
+        ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+    return text if len(ids) <= max_tokens else tokenizer.decode(ids[:max_tokens])
+
+
+def iter_chunk_summaries(chunks, batch_size=4, profile=DEFAULT_PROFILE, budget=None, num_beams=None):
+    """
+    Summarizes chunks batch_size at a time and yields (index, summary) as each batch finishes,
+    so only one batch of activations is alive at any moment. Once the budget is spent,
+    the remaining chunks get a two-sentence extract instead.
+    """
+    min_len, max_len = CHUNK_SUMMARY_LENGTH
+    for start in range(0, len(chunks), batch_size):
+        batch = chunks[start:start + batch_size]
+        if budget is not None and budget.exhausted:
+            summaries = [extractive_summarize(chunk, 2) for chunk in batch]
+        else:
+            summaries = generate_summaries(batch, min_len, max_len, profile, budget, num_beams)
+        for offset, summary in enumerate(summaries):
+            yield start + offset, summary
+
+
+def summarize_long(text, min_length, max_length, batch_size=4, profile=DEFAULT_PROFILE, budget=None,
+                   on_partial=None, num_beams=None):
+    """
+    Hierarchical summary of a document longer than the model input:
+    summarize sentence-aligned chunks (map), then summarize the joined partial
+    summaries (reduce), repeating the map step while they still do not fit.
+    on_partial(index, total, summary) is called as each chunk summary is ready.
+    """
+    text = reduce_to_input(text, batch_size, profile, budget, on_partial, num_beams)
+    if budget is not None and budget.exhausted:
+        return extractive_summarize(text, max_tokens=max_length)
+    return generate_summaries([text], min_length, max_length, profile, budget, num_beams)[0]
+
+
+def reduce_to_input(text, batch_size=4, profile=DEFAULT_PROFILE, budget=None, on_partial=None, num_beams=None):
+    """
+    The map steps of summarize_long: replaces text by its joined chunk summaries until it fits the model input.
+    Once the budget is spent, or a round no longer shrinks the text (e.g. text without sentence ends,
+    which extracts leave whole), the text is cut to the input limit instead.
+    """
+    limit = MAX_INPUT_TOKENS - 24
+    tokens = count_tokens(text)
+    while tokens > limit:
+        if budget is not None and budget.exhausted:
+            return truncate_tokens(text, limit)
+        chunks = chunk_text(text)
+        partials = [None] * len(chunks)
+        for index, summary in iter_chunk_summaries(chunks, batch_size, profile, budget, num_beams):
+            partials[index] = summary
+            if on_partial:
+                on_partial(index, len(chunks), summary)
+        text = ' '.join(p for p in partials if p)
+        previous, tokens = tokens, count_tokens(text)
+        if tokens >= previous:
+            return truncate_tokens(text, limit)
+    return text
+
+
 # ------------------------
 # Main summarizer function
 # ------------------------
+ABSTRACTIVE_LENGTHS = {'short': (50, 100), 'medium': (100, 300), 'long': (300, 500)}
+DOCUMENT_PIECE_CHARS = 3 * (MAX_INPUT_TOKENS - 24)  # text read at a time from spooled documents (~1 model input)
+
+
+@cached("summarize", model="summarizer")
 def summarize(text, summary_type='abstractive', tone='neutral', length='medium',
-              num_sentences_custom=None, custom_length_range=None):
+              num_sentences_custom=None, custom_length_range=None, batch_size=4, on_partial=None,
+              extractive_method='textrank', profile=DEFAULT_PROFILE, time_budget=None, token_budget=None,
+              num_beams=None):
+    """
+    :param profile: generation profile for abstractive mode ('fast', 'balanced' or 'quality')
+    :param num_beams: beam width overriding the profile's
+    :param time_budget: seconds the abstractive summary may take; past it, generation stops early
+        and unsummarized sections fall back to extracts
+    :param token_budget: total tokens the model may generate for this request
+    """
 
     if summary_type == 'extractive':
         num_sentences_map = {'short': 2, 'medium': 5, 'long': 10}
         num_sentences = num_sentences_custom or num_sentences_map.get(length, 3)
-        summary = extractive_summarize(text, num_sentences)
+        # A custom range caps the extract by its upper bound in words
+        max_tokens = custom_length_range[1] if custom_length_range else None
+        summary = extractive_summarize(text, num_sentences, method=extractive_method, max_tokens=max_tokens)
 
     else:
-        length_map = {'short': (50, 100), 'medium': (100, 300), 'long': (300, 500)}
-        min_len, max_len = custom_length_range or length_map.get(length, (80, 120))
+        min_len, max_len = custom_length_range or ABSTRACTIVE_LENGTHS.get(length, (80, 120))
 
-        inputs = tokenizer([text], max_length=1024, return_tensors='pt', truncation=True).to(device)
-        summary_ids = model.generate(inputs["input_ids"], min_length=min_len, max_length=max_len,
-                                     num_beams=10, length_penalty=1, early_stopping=True)
-        summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-        summary = clean_summary(summary)
+        # Inputs past the model limit go through map-reduce instead of being truncated
+        budget = make_budget(time_budget, token_budget)
+        summary = summarize_long(text, min_len, max_len, batch_size=batch_size, profile=profile,
+                                 budget=budget, on_partial=on_partial, num_beams=num_beams)
+        if budget is not None and budget.exhausted:
+            skip_cache()  # cut short or partly extractive, depending on load
 
     return change_tone(summary, tone)
 
 
+def summarize_batch(texts, summary_type='abstractive', tone='neutral', length='medium',
+                    custom_length_range=None, batch_size=4, profile=DEFAULT_PROFILE, num_beams=None):
+    """
+    Summarizes many documents. In abstractive mode, documents that fit the model
+    input share padded generate calls; longer ones go through map-reduce.
+    """
+    if summary_type == 'extractive':
+        return [summarize(text, summary_type, tone, length, custom_length_range=custom_length_range)
+                for text in texts]
+
+    min_len, max_len = custom_length_range or ABSTRACTIVE_LENGTHS.get(length, (80, 120))
+    summaries = [None] * len(texts)
+    short = [i for i, text in enumerate(texts) if count_tokens(text) <= MAX_INPUT_TOKENS - 24]
+    for start in range(0, len(short), batch_size):
+        batch = short[start:start + batch_size]
+        for i, summary in zip(batch, generate_summaries([texts[i] for i in batch], min_len, max_len, profile,
+                                                        num_beams=num_beams)):
+            summaries[i] = change_tone(summary, tone)
+    for i, text in enumerate(texts):
+        if summaries[i] is None:
+            summaries[i] = summarize(text, summary_type, tone, length,
+                                     custom_length_range=custom_length_range, batch_size=batch_size,
+                                     profile=profile, num_beams=num_beams)
+    return summaries
+
+
+def summarize_document(document, summary_type='abstractive', tone='neutral', length='medium',
+                       custom_length_range=None, batch_size=4, on_partial=None, profile=DEFAULT_PROFILE,
+                       time_budget=None, token_budget=None, num_beams=None):
+    """
+    summarize for a document.SpooledDocument. In abstractive mode the first map step
+    reads the document piece by piece, so the whole text is never held in memory;
+    extractive summaries rank all sentences at once and need document.text().
+    """
+    if summary_type == 'extractive':
+        return summarize(document.text(), summary_type, tone, length, custom_length_range=custom_length_range)
+    min_len, max_len = custom_length_range or ABSTRACTIVE_LENGTHS.get(length, (80, 120))
+    budget = make_budget(time_budget, token_budget)
+    text = reduce_document(document, batch_size, profile, budget, on_partial, num_beams)
+    summary = summarize_long(text, min_len, max_len, batch_size=batch_size, profile=profile, budget=budget,
+                             on_partial=on_partial, num_beams=num_beams)
+    return change_tone(summary, tone)
+
+
+def reduce_document(document, batch_size=4, profile=DEFAULT_PROFILE, budget=None, on_partial=None, num_beams=None):
+    """
+    First map step over a SpooledDocument: returns its text if it is short, otherwise
+    the joined summaries of its chunks, summarized batch_size chunks at a time as they are read.
+    """
+    if document.chars <= DOCUMENT_PIECE_CHARS:
+        return document.text()
+    chunks = (chunk for piece in document.iter_chunks(DOCUMENT_PIECE_CHARS) for chunk in chunk_text(piece))
+    expected = max(1, round(document.chars / DOCUMENT_PIECE_CHARS))  # progress estimate; pieces are ~1 chunk
+    partials = []
+    while True:
+        batch = list(itertools.islice(chunks, batch_size))
+        if not batch:
+            break
+        for _, summary in iter_chunk_summaries(batch, batch_size, profile, budget, num_beams):
+            partials.append(summary)
+            if on_partial:
+                on_partial(len(partials) - 1, max(expected, len(partials)), summary)
+    return ' '.join(p for p in partials if p)
+
+
+# ------------------------
+# Streaming
+# ------------------------
+def stream_summary(text, length='medium', custom_length_range=None, batch_size=4, profile=DEFAULT_PROFILE,
+                   time_budget=None, token_budget=None, cancelled=None, on_partial=None):
+    """
+    Yields an abstractive summary as decoded text deltas while it is generated
+    (greedy decoding, so the first words arrive after one decoder step). Long
+    documents are first reduced by the map step of summarize_long. The deltas are
+    the raw model output; finish_summary turns the joined deltas into the final text.
+    :param cancelled: optional callable; generation stops once it returns True
+    """
+    min_len, max_len = custom_length_range or ABSTRACTIVE_LENGTHS.get(length, (80, 120))
+    budget = make_budget(time_budget, token_budget)
+    text = reduce_to_input(text, batch_size, profile, budget, on_partial)
+    if budget is not None and budget.exhausted:
+        yield extractive_summarize(text, max_tokens=max_len)
+        return
+
+    yield from _stream_summary(text, min_len, max_len, profile, budget, cancelled=cancelled)
+
+
+@hosted("summarizer.stream", model="summarizer")
+def _stream_summary(text, min_length, max_length, profile=DEFAULT_PROFILE, budget=None, cancelled=None):
+    tokenizer, model = get_model("summarizer")
+    with span("summarize.tokenize"):
+        inputs = tokenizer([text], max_length=MAX_INPUT_TOKENS, return_tensors='pt',
+                           truncation=True).to(model.device)
+    kwargs = generate_kwargs("summarizer", tokenizer, profile, min_length, max_length, budget=budget, streaming=True)
+    yield from stream_generate("summarize", tokenizer, model, inputs, {**kwargs, "length_penalty": 1}, cancelled)
+
+
+def finish_summary(streamed, tone='neutral'):
+    """
+    Applies the post-processing of summarize to text joined from stream_summary deltas.
+    """
+    return change_tone(clean_summary(streamed), tone)
+
+
 # ------------------------
 # PDF reading utilities
 # ------------------------
 def read_pdf(file_path):
-    text = ""
-    with fitz.open(file_path) as doc:
-        for page in doc:
-            text += page.get_text("text")
-    return text
+    return "".join(iter_pdf_pages(file_path, ocr_fallback=False))
 
 
 def read_pdf_with_ocr(file_path):
-    images = convert_from_path(file_path)
-    text = ""
-    for image in images:
-        text += pytesseract.image_to_string(image)
-    return text
\ No newline at end of file
+    return "".join(iter_pdf_pages(file_path, force_ocr=True))
@@ -0,0 +1,352 @@
+# backend/telemetry.py
+"""
+Timing spans, counters and an on-demand sampling profiler for the backend.
+
+Every pipeline stage (ingest, tokenize, infer, postprocess, model load, TF-IDF)
+runs inside span("<area>.<stage>"), which records its duration in a per-stage
+histogram and in the breakdown of the request currently being traced. The
+collected metrics can be read as Prometheus text (prometheus_text, or the HTTP
+endpoint started by TEXTINOVA_METRICS_PORT) or as JSON (snapshot, or the file
+written every TEXTINOVA_TELEMETRY_INTERVAL seconds to TEXTINOVA_TELEMETRY_DUMP).
+
+The sampling profiler records the stacks of all threads at a fixed interval and
+reports them in folded format, which flamegraph.pl and speedscope can read. It can be
+toggled with start_profiler/stop_profiler or, in the main thread, with SIGUSR2
+when TEXTINOVA_PROFILER_OUTPUT names the file to write.
+"""
+import bisect
+import contextvars
+import functools
+import json
+import math
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)  # seconds
+RESERVOIR_SIZE = 1024  # recent durations kept per stage for percentiles
+
+ENABLED = os.environ.get("TEXTINOVA_TELEMETRY", "1") == "1"
+
+_lock = threading.Lock()
+_counters = Counter()
+_stages = {}
+_trace = contextvars.ContextVar("textinova_trace", default=None)
+
+
+class StageStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)  # last bucket is +Inf
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.recent.append(seconds)
+
+    def summary(self):
+        ordered = sorted(self.recent)
+
+        def percentile(q):
+            # nearest-rank over the recent window
+            return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)] if ordered else 0.0
+
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 4),
+            "mean_s": round(self.total / self.count, 5) if self.count else 0.0,
+            "p50_s": round(percentile(50), 5),
+            "p95_s": round(percentile(95), 5),
+            "p99_s": round(percentile(99), 5),
+            "max_s": round(self.max, 5),
+        }
+
+
+def observe(stage, seconds):
+    """
+    Records a duration for stage, and adds it to the breakdown of the traced request.
+    """
+    if not ENABLED:
+        return
+    with _lock:
+        stats = _stages.get(stage)
+        if stats is None:
+            stats = _stages[stage] = StageStats()
+        stats.observe(seconds)
+    breakdown = _trace.get()
+    if breakdown is not None:
+        breakdown[stage] += seconds
+
+
+@contextmanager
+def span(stage):
+    """
+    Times the enclosed block as one occurrence of stage, e.g. span("summarize.infer").
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def timed(stage):
+    """
+    Decorator form of span.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    if ENABLED:
+        with _lock:
+            _counters[name] += value
+
+
+@contextmanager
+def request_trace():
+    """
+    Collects the spans run in this context (this thread, or tasks started from it)
+    and yields the {stage: seconds} breakdown, filled in as the request proceeds.
+    """
+    breakdown = defaultdict(float)
+    token = _trace.set(breakdown)
+    try:
+        yield breakdown
+    finally:
+        _trace.reset(token)
+
+
+def snapshot():
+    """
+    Returns {"stages": {stage: summary}, "counters": {...}} as plain JSON-friendly data.
+    """
+    with _lock:
+        return {
+            "time": time.time(),
+            "stages": {stage: stats.summary() for stage, stats in sorted(_stages.items())},
+            "counters": dict(sorted(_counters.items())),
+        }
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+def _metric_name(name):
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+def prometheus_text():
+    """
+    Renders stage histograms, recent-window quantiles and counters in the Prometheus text format.
+    """
+    lines = [
+        "# HELP textinova_stage_seconds Duration of backend pipeline stages.",
+        "# TYPE textinova_stage_seconds histogram",
+    ]
+    with _lock:
+        stages = [(stage, list(stats.buckets), stats.total, stats.count, stats.summary())
+                  for stage, stats in sorted(_stages.items())]
+        counters = sorted(_counters.items())
+
+    for stage, buckets, total, n, _ in stages:
+        cumulative = 0
+        for bound, bucket in zip(list(BUCKETS) + ["+Inf"], buckets):
+            cumulative += bucket
+            lines.append(f'textinova_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'textinova_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+        lines.append(f'textinova_stage_seconds_count{{stage="{stage}"}} {n}')
+
+    lines += ["# HELP textinova_stage_recent_seconds Stage duration quantiles over recent calls.",
+              "# TYPE textinova_stage_recent_seconds gauge"]
+    for stage, _, _, _, summary in stages:
+        for quantile, key in (("0.5", "p50_s"), ("0.95", "p95_s"), ("0.99", "p99_s")):
+            lines.append(f'textinova_stage_recent_seconds{{stage="{stage}",quantile="{quantile}"}} {summary[key]}')
+
+    for name, value in counters:
+        metric = f"textinova_{_metric_name(name)}_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def dump_json(path):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot(), f, indent=2)
+    os.replace(tmp, path)  # readers never see a half-written file
+
+
+def start_json_dump(path, interval=60.0):
+    """
+    Writes snapshot() to path every interval seconds from a daemon thread.
+    """
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                dump_json(path)
+            except OSError as e:
+                print(f"telemetry: could not write {path}: {e}", file=sys.stderr)
+
+    thread = threading.Thread(target=loop, name="telemetry-dump", daemon=True)
+    thread.start()
+    return thread
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            body, content_type = prometheus_text().encode(), "text/plain; version=0.0.4"
+        elif path == "/metrics.json":
+            body, content_type = json.dumps(snapshot()).encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """
+    Serves /metrics (Prometheus text) and /metrics.json from a daemon thread.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="telemetry-http", daemon=True).start()
+    return server
+
+
+# ------------------------
+# Sampling profiler
+# ------------------------
+class SamplingProfiler:
+    """
+    Samples the Python stacks of all other threads every interval seconds.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="telemetry-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def folded(self):
+        """
+        Collapsed stacks, one "frame;frame;frame count" line each, hottest first.
+        """
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+_toggle_requested = threading.Event()
+
+
+def profiler_running():
+    return _profiler is not None
+
+
+def start_profiler(interval=0.005):
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = SamplingProfiler(interval)
+            _profiler.start()
+
+
+def stop_profiler(path=None):
+    """
+    Stops the profiler and returns its folded stacks, also writing them to path if given.
+    """
+    global _profiler
+    with _profiler_lock:
+        profiler, _profiler = _profiler, None
+    if profiler is None:
+        return ""
+    profiler.stop()
+    folded = profiler.folded()
+    if path:
+        with open(path, "w") as f:
+            f.write(folded)
+    return folded
+
+
+def _toggle_profiler(signum, frame):
+    # The handler interrupts the main thread, possibly while it holds a lock the toggle
+    # needs, so it only wakes the toggler thread, which starts/stops and writes the file
+    _toggle_requested.set()
+
+
+def _run_toggler(path):
+    while True:
+        _toggle_requested.wait()
+        _toggle_requested.clear()
+        if profiler_running():
+            stop_profiler(path)
+        else:
+            start_profiler()
+
+
+if os.environ.get("TEXTINOVA_PROFILER_OUTPUT") and hasattr(signal, "SIGUSR2"):
+    try:
+        signal.signal(signal.SIGUSR2, _toggle_profiler)
+    except ValueError:  # not the main thread (e.g. imported from a Streamlit script)
+        pass
+    else:
+        threading.Thread(target=_run_toggler, args=(os.environ["TEXTINOVA_PROFILER_OUTPUT"],),
+                         name="telemetry-profiler-toggle", daemon=True).start()
+if os.environ.get("TEXTINOVA_TELEMETRY_DUMP"):
+    start_json_dump(os.environ["TEXTINOVA_TELEMETRY_DUMP"],
+                    float(os.environ.get("TEXTINOVA_TELEMETRY_INTERVAL", "60")))
+if os.environ.get("TEXTINOVA_METRICS_PORT"):
+    start_metrics_server(int(os.environ["TEXTINOVA_METRICS_PORT"]))
@@ -1,17 +1,15 @@
-import pdfplumber
-from docx import Document
+from backend.ingestion import iter_pdf_pages, iter_docx_paragraphs, iter_txt_chunks
+from backend.telemetry import timed
 
+@timed("ingest.pdf")
 def read_pdf(file):
-    text = ""
-    with pdfplumber.open(file) as pdf:
-        for page in pdf.pages:
-            if page.extract_text():
-                text += page.extract_text() + "\n"
-    return text
+    # Text layer only, as this reader always did; read_pdf_with_ocr handles scanned PDFs
+    return "".join(page + "\n" for page in iter_pdf_pages(file, ocr_fallback=False) if page.strip())
 
+@timed("ingest.docx")
 def read_docx(file):
-    doc = Document(file)
-    return "\n".join([para.text for para in doc.paragraphs])
+    return "\n".join(iter_docx_paragraphs(file))
 
+@timed("ingest.txt")
 def read_txt(file):
-    return file.read().decode('utf-8')
+    return "".join(iter_txt_chunks(file))
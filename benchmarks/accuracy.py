@@ -0,0 +1,116 @@
+# benchmarks/accuracy.py
+"""
+Output drift of the int8 and ONNX Runtime backends against the fp32 torch baseline.
+
+Runs the same inputs through every selected backend and reports, per model:
+  ai_detector             - mean/max absolute AI-probability difference (points) and label agreement
+  summarizer, paraphraser - exact-match rate and mean unigram F1 against the baseline output
+plus mean latency, speed-up and resident size relative to torch.
+
+    python -m benchmarks.accuracy --tiny
+    python -m benchmarks.accuracy --backends int8 onnx --samples 20 -o drift.json
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+
+from benchmarks.suite import TINY_MODELS, make_text
+
+ALL_MODELS = ["ai_detector", "summarizer", "paraphraser"]
+
+
+def unigram_f1(reference, candidate):
+    ref, cand = Counter(reference.lower().split()), Counter(candidate.lower().split())
+    overlap = sum((ref & cand).values())
+    if not overlap:
+        return float(not ref and not cand)
+    precision, recall = overlap / sum(cand.values()), overlap / sum(ref.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def run_model(name, texts):
+    if name == "ai_detector":
+        from backend.AI_detector import detect_ai_text
+        return [detect_ai_text.uncached(text)["AI Probability"] for text in texts]
+    if name == "summarizer":
+        from backend.summarizer import summarize
+        return [summarize.uncached(text, length="short") for text in texts]
+    from backend.paraphraser import paraphrase_text
+    return [paraphrase_text.uncached(text) for text in texts]
+
+
+def drift(name, baseline, outputs):
+    if name == "ai_detector":
+        diffs = [abs(a - b) for a, b in zip(baseline, outputs)]
+        return {
+            "mean_abs_diff": round(sum(diffs) / len(diffs), 3),
+            "max_abs_diff": round(max(diffs), 3),
+            "label_agreement": round(sum((a >= 50) == (b >= 50) for a, b in zip(baseline, outputs)) / len(diffs), 3),
+        }
+    scores = [unigram_f1(a, b) for a, b in zip(baseline, outputs)]
+    return {
+        "exact_match": round(sum(a == b for a, b in zip(baseline, outputs)) / len(scores), 3),
+        "mean_unigram_f1": round(sum(scores) / len(scores), 3),
+        "min_unigram_f1": round(min(scores), 3),
+    }
+
+
+def compare_backends(models_to_check, backends, texts):
+    from backend import models
+
+    report = {}
+    for name in models_to_check:
+        runs = {}
+        for backend in ["torch"] + [b for b in backends if b != "torch"]:
+            models.configure_backend(name, backend)
+            start = time.perf_counter()
+            run_model(name, texts[:1])  # warm-up, includes load (and the one-off ONNX export)
+            load_s = time.perf_counter() - start
+            start = time.perf_counter()
+            outputs = run_model(name, texts)
+            runs[backend] = {
+                "outputs": outputs,
+                "load_s": round(load_s, 3),
+                "mean_s": round((time.perf_counter() - start) / len(texts), 5),
+                "resident_mb": models.loaded_models().get(name),
+            }
+            models.unload(name)
+
+        baseline = runs["torch"]
+        report[name] = {}
+        for backend, run in runs.items():
+            entry = {key: run[key] for key in ("load_s", "mean_s", "resident_mb")}
+            entry["speedup"] = round(baseline["mean_s"] / run["mean_s"], 2) if run["mean_s"] else None
+            if backend != "torch":
+                entry.update(drift(name, baseline["outputs"], run["outputs"]))
+            report[name][backend] = entry
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare quantized/ONNX backends against fp32 torch.")
+    parser.add_argument("--models", nargs="+", choices=ALL_MODELS, default=ALL_MODELS)
+    parser.add_argument("--backends", nargs="+", choices=["int8", "onnx"], default=["int8", "onnx"])
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--words", type=int, default=200, help="words per sample")
+    parser.add_argument("--tiny", action="store_true", help="use small stand-in models")
+    parser.add_argument("-o", "--output", help="write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    if args.tiny:
+        for name, path in TINY_MODELS.items():
+            os.environ.setdefault(f"TEXTINOVA_MODEL_{name.upper()}", path)
+
+    texts = [make_text(args.words, seed=i) for i in range(args.samples)]
+    output = json.dumps(compare_backends(args.models, args.backends, texts), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
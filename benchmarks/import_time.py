@@ -0,0 +1,60 @@
+# benchmarks/import_time.py
+"""
+Import-time report for the backend.
+
+Imports the backend modules the app and CLI use in a fresh interpreter and
+reports how long that takes and which heavy libraries, that should only load on
+first use, got pulled in. tests/test_import_time.py enforces the budget.
+
+    python -m benchmarks.import_time [--budget 0.5] [--repeats 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+MODULES = ["backend", "backend.utils", "backend.jobs", "backend.summarizer", "backend.paraphraser",
+           "backend.plagiarism_detection", "backend.cli"]
+HEAVY_MODULES = ["torch", "transformers", "optimum", "sklearn", "scipy", "nltk", "fitz", "pytesseract",
+                 "pdf2image", "docx", "requests", "bs4"]
+DEFAULT_BUDGET = float(os.environ.get("TEXTINOVA_IMPORT_BUDGET", "0.5"))  # seconds, see tests/test_import_time.py
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+for module in {modules!r}:
+    __import__(module)
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(modules=MODULES, heavy=HEAVY_MODULES):
+    """
+    Imports modules in a new interpreter; returns (seconds, heavy modules that got loaded).
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, "-c", _PROBE.format(modules=modules, heavy=heavy)],
+                            cwd=root, capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return result["seconds"], result["heavy"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="seconds allowed for the imports")
+    parser.add_argument("--repeats", type=int, default=5, help="fresh interpreters; the fastest run counts")
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.repeats)]
+    seconds = min(elapsed for elapsed, _ in runs)
+    heavy = sorted({module for _, loaded in runs for module in loaded})
+
+    print(f"import {', '.join(MODULES)}: {seconds:.3f}s (budget {args.budget:.3f}s)")
+    if heavy:
+        print(f"heavy modules imported eagerly: {', '.join(heavy)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# benchmarks/intrinsic_scaling.py
+"""
+Scaling benchmark for the intrinsic similarity engine.
+
+Generates synthetic documents (one sentence per line, with some repeated lines so
+there are pairs above the threshold) and times intrinsic_plagiarism_score from
+100 up to 50,000 sentences.
+
+    python -m benchmarks.intrinsic_scaling [--sizes 100 1000 10000 50000]
+"""
+import argparse
+import random
+import time
+
+from backend.intrinsic_detector import intrinsic_plagiarism_score
+
+
+def make_document(n_sentences, vocabulary_size=5000, repeat_ratio=0.02, seed=0):
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(vocabulary_size)]
+    lines = [" ".join(rng.choices(vocabulary, k=rng.randint(8, 25))) for _ in range(n_sentences)]
+    for _ in range(int(n_sentences * repeat_ratio)):
+        lines[rng.randrange(n_sentences)] = lines[rng.randrange(n_sentences)]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 10000, 50000])
+    args = parser.parse_args()
+
+    print(f"{'sentences':>10} {'seconds':>10} {'pairs':>8} {'score':>8}")
+    for n in args.sizes:
+        text = make_document(n)
+        start = time.perf_counter()
+        result = intrinsic_plagiarism_score(text)
+        elapsed = time.perf_counter() - start
+        print(f"{n:>10} {elapsed:>10.3f} {len(result['similar_pairs']):>8} {result['similarity_score']:>8}")
+
+
+if __name__ == "__main__":
+    main()
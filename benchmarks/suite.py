@@ -0,0 +1,226 @@
+# benchmarks/suite.py
+"""
+Inference benchmark suite for the backend entry points.
+
+Measures latency percentiles, tokens/sec, peak RSS and model load time for
+summarize, paraphrase_text, detect_ai_text(_batch), intrinsic_plagiarism_score
+and the PDF reader across input sizes and batch sizes, and writes the results
+as JSON. Passing --baseline compares against a stored run and exits non-zero
+when a case got slower than the tolerance allows.
+
+    python -m benchmarks.suite --tiny -o bench.json
+    python -m benchmarks.suite --tiny --baseline bench.json
+
+--tiny swaps in small random-weight checkpoints so the suite runs in seconds;
+with HF_HUB_OFFLINE=1 they (or any TEXTINOVA_MODEL_<NAME> paths) are read from
+the local cache only.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+
+TINY_MODELS = {
+    "summarizer": "hf-internal-testing/tiny-random-bart",
+    "paraphraser": "hf-internal-testing/tiny-random-pegasus",
+    "ai_detector": "hf-internal-testing/tiny-random-RobertaForSequenceClassification",
+    "embedder": "hf-internal-testing/tiny-random-BertModel",
+}
+ALL_CASES = ["model_load", "summarize", "paraphrase", "detect_ai", "detect_ai_batch", "intrinsic", "read_pdf"]
+
+_VOCABULARY = ("the study results method analysis data model research evidence theory students "
+               "significant approach framework findings literature sample effect measure learning "
+               "however therefore suggests indicates shows previous further important").split()
+
+
+def make_text(n_words, seed=0):
+    """
+    Synthetic prose: sentences of 8-20 words, five sentences per line.
+    """
+    rng = random.Random(seed)
+    sentences, words = [], 0
+    while words < n_words:
+        length = rng.randint(8, 20)
+        sentences.append(" ".join(rng.choices(_VOCABULARY, k=length)).capitalize() + ".")
+        words += length
+    return "\n".join(" ".join(sentences[i:i + 5]) for i in range(0, len(sentences), 5))
+
+
+def make_pdf(n_words, path):
+    import fitz
+
+    lines = make_text(n_words).split("\n")
+    with fitz.open() as doc:
+        for start in range(0, len(lines), 10):
+            page = doc.new_page()
+            page.insert_textbox(page.rect + (36, 36, -36, -36), "\n".join(lines[start:start + 10]), fontsize=9)
+        doc.save(path)
+
+
+def peak_rss_mb():
+    # ru_maxrss is KB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+
+def percentile(values, q):
+    # nearest-rank percentile
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def measure(func, repeats, tokens):
+    func()  # warm-up: first call pays for lazy loads and allocator growth
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    mean = sum(latencies) / len(latencies)
+    return {
+        "repeats": repeats,
+        "mean_s": round(mean, 5),
+        "p50_s": round(percentile(latencies, 50), 5),
+        "p90_s": round(percentile(latencies, 90), 5),
+        "p95_s": round(percentile(latencies, 95), 5),
+        "p99_s": round(percentile(latencies, 99), 5),
+        "tokens": tokens,
+        "tokens_per_s": round(tokens / mean, 1) if mean else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def count_tokens(model, text):
+    from backend.models import get_model
+
+    tokenizer, _ = get_model(model)
+    return len(tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"])
+
+
+def run_cases(cases, sizes, batch_sizes, repeats, model_names=None):
+    from backend import models
+
+    results = {}
+
+    if "model_load" in cases:
+        for name in model_names or models.MODEL_SPECS:
+            models.unload(name)
+            start = time.perf_counter()
+            models.get_model(name)
+            results[f"model_load/{name}"] = {"load_s": round(time.perf_counter() - start, 3),
+                                             "resident_mb": models.loaded_models().get(name),
+                                             "peak_rss_mb": peak_rss_mb()}
+
+    for n_words in sizes:
+        text = make_text(n_words)
+
+        if "summarize" in cases:
+            from backend.summarizer import summarize
+            results[f"summarize/{n_words}w"] = measure(
+                lambda: summarize.uncached(text, length="short"), repeats, count_tokens("summarizer", text))
+
+        if "paraphrase" in cases:
+            from backend.paraphraser import paraphrase_text
+            for batch_size in batch_sizes:
+                results[f"paraphrase/{n_words}w/b{batch_size}"] = measure(
+                    lambda: paraphrase_text.uncached(text, batch_size=batch_size), repeats,
+                    count_tokens("paraphraser", text))
+
+        if "detect_ai" in cases:
+            from backend.AI_detector import detect_ai_text
+            results[f"detect_ai/{n_words}w"] = measure(
+                lambda: detect_ai_text.uncached(text), repeats, count_tokens("ai_detector", text))
+
+        if "detect_ai_batch" in cases:
+            from backend.AI_detector import detect_ai_text_batch
+            for batch_size in batch_sizes:
+                texts = [make_text(n_words, seed=i) for i in range(batch_size)]
+                results[f"detect_ai_batch/{n_words}w/b{batch_size}"] = measure(
+                    lambda: detect_ai_text_batch(texts, batch_size=batch_size), repeats,
+                    sum(count_tokens("ai_detector", t) for t in texts))
+
+        if "intrinsic" in cases:
+            from backend.intrinsic_detector import lexical_plagiarism_score
+            results[f"intrinsic/{n_words}w"] = measure(
+                lambda: lexical_plagiarism_score.uncached(text), repeats, len(text.split()))
+
+        if "read_pdf" in cases:
+            from backend.utils import read_pdf
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "bench.pdf")
+                make_pdf(n_words, path)
+                results[f"read_pdf/{n_words}w"] = measure(lambda: read_pdf(path), repeats, n_words)
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    :return: list of (case, baseline p95, current p95) for cases slower than baseline * (1 + tolerance)
+    """
+    regressions = []
+    for case, current in results.items():
+        previous = baseline.get("results", {}).get(case)
+        if not previous:
+            continue
+        metric = "p95_s" if "p95_s" in current else "load_s"
+        if previous.get(metric) and current[metric] > previous[metric] * (1 + tolerance):
+            regressions.append((case, previous[metric], current[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the TextInova backend entry points.")
+    parser.add_argument("--cases", nargs="+", choices=ALL_CASES, default=ALL_CASES)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000], help="input sizes in words")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--tiny", action="store_true", help="use small stand-in models")
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 slowdown (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    if args.tiny:
+        for name, path in TINY_MODELS.items():
+            os.environ.setdefault(f"TEXTINOVA_MODEL_{name.upper()}", path)
+
+    from backend.models import model_id, MODEL_SPECS
+
+    # --tiny only ever loads the stand-ins, even for a model added to the registry without one
+    results = run_cases(args.cases, args.sizes, args.batch_sizes, args.repeats,
+                        model_names=list(TINY_MODELS) if args.tiny else None)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "models": {name: model_id(name) for name in MODEL_SPECS},
+        "results": results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for case, before, after in regressions:
+            print(f"REGRESSION {case}: {before:.4f}s -> {after:.4f}s", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+A cached function must return the same value, of the same types, on a miss and on a hit.
+"""
+import numpy as np
+import pytest
+
+from backend import cache
+
+
+@pytest.fixture(params=["memory", "disk"])
+def result_cache(request, tmp_path, monkeypatch):
+    disk_path = str(tmp_path / "cache.sqlite") if request.param == "disk" else None
+    result_cache = cache.ResultCache(memory_entries=0 if disk_path else 8, disk_path=disk_path)
+    monkeypatch.setattr(cache, "_cache", result_cache)
+    return result_cache
+
+
+@cache.cached("test.score")
+def score(text, skip=False):
+    if skip:
+        cache.skip_cache()
+    return {"pair": (text, len(text)), "score": np.float32(0.5), "spans": [(0, 1)]}
+
+
+def test_miss_and_hit_return_the_same_value(result_cache):
+    miss, hit = score("abc"), score("abc")
+    assert miss == hit == {"pair": ["abc", 3], "score": 0.5, "spans": [[0, 1]]}
+    assert type(miss["score"]) is type(hit["score"]) is float
+    assert result_cache.metrics()["misses"] == 1
+
+
+def test_skipped_result_has_the_cached_form(result_cache):
+    assert score("abc", skip=True) == score("abc") == {"pair": ["abc", 3], "score": 0.5, "spans": [[0, 1]]}
@@ -0,0 +1,21 @@
+"""
+Beam width resolution in generate_kwargs.
+"""
+from backend.generation import PROFILES, generate_kwargs
+
+
+def beams(**kwargs):
+    # The quality profile does not stop at sentence ends, so no tokenizer is needed
+    return generate_kwargs("paraphraser", None, "quality", 10, 20, **kwargs)["num_beams"]
+
+
+def test_profile_sets_the_beam_width():
+    assert beams() == PROFILES["quality"]["paraphraser"]["num_beams"]
+
+
+def test_num_beams_overrides_the_profile():
+    assert beams(num_beams=2) == 2
+
+
+def test_streaming_is_greedy():
+    assert beams(num_beams=4, streaming=True) == 1
@@ -0,0 +1,37 @@
+"""
+Importing the backend must stay within the import-time budget and leave heavy libraries for first use.
+"""
+import os
+import subprocess
+import sys
+
+from benchmarks.import_time import DEFAULT_BUDGET, HEAVY_MODULES, MODULES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def importtime(code):
+    """
+    Runs code under "python -X importtime"; returns [(depth, module, cumulative seconds)].
+    """
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=ROOT, capture_output=True, text=True, check=True).stderr
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        module = name.strip()
+        entries.append(((len(name) - len(name.lstrip()) - 1) // 2, module, int(cumulative) / 1e6))
+    return entries
+
+
+def test_backend_imports_within_budget():
+    startup = {module for depth, module, _ in importtime("pass") if depth == 0}
+    runs = []
+    for _ in range(3):  # the fastest run counts
+        entries = importtime(f"import {', '.join(MODULES)}")
+        runs.append(sum(seconds for depth, module, seconds in entries if depth == 0 and module not in startup))
+        heavy = sorted({module.split(".")[0] for _, module, _ in entries} & set(HEAVY_MODULES))
+        assert not heavy, f"heavy modules imported eagerly: {', '.join(heavy)}"
+    assert min(runs) <= DEFAULT_BUDGET, f"backend imports took {min(runs):.3f}s (budget {DEFAULT_BUDGET:.3f}s)"
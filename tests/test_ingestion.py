@@ -0,0 +1,44 @@
+"""
+PDF extraction in process and across the shared pool, with pages whose OCR fails.
+"""
+import pytest
+
+from backend import ingestion
+
+fitz = pytest.importorskip("fitz")
+
+
+@pytest.fixture
+def pdf(tmp_path, monkeypatch):
+    # Every 5th page has no text layer and goes to OCR, which fails without a usable tesseract
+    monkeypatch.setattr(ingestion, "_ocr_page", lambda page: 1 / 0)
+    path = tmp_path / "doc.pdf"
+    with fitz.open() as doc:
+        for number in range(30):
+            page = doc.new_page()
+            if number % 5:
+                page.insert_text((72, 72), f"page {number}")
+        doc.save(path)
+    return path
+
+
+def test_pages_are_yielded_in_order_with_ocr_errors(pdf):
+    errors = []
+    pages = list(ingestion.iter_pdf_pages(pdf, workers=1, ocr_errors=errors))
+    assert [page.strip() for page in pages] == ["" if n % 5 == 0 else f"page {n}" for n in range(30)]
+    assert errors == [f"OCR of page {n + 1} failed: ZeroDivisionError: division by zero" for n in range(0, 30, 5)]
+
+
+def test_pool_extraction_matches_in_process(pdf):
+    errors = []
+    pages = list(ingestion.iter_pdf_pages(pdf, workers=3, ocr_errors=errors))
+    assert pages == list(ingestion.iter_pdf_pages(pdf, workers=1, ocr_errors=[]))
+    assert len(errors) == 6 and all(error.startswith("OCR of page") for error in errors)
+    assert ingestion._get_pool() is ingestion._get_pool()
+
+
+def test_abandoned_generator_leaves_pool_usable(pdf):
+    pages = ingestion.iter_pdf_pages(pdf, workers=2, ocr_errors=[])
+    next(pages)
+    pages.close()
+    assert len(list(ingestion.iter_pdf_pages(pdf, workers=2, ocr_errors=[]))) == 30
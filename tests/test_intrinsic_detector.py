@@ -0,0 +1,53 @@
+"""
+Randomized edits of a document: the incremental self-similarity check must report what
+a full computation over the same lines reports.
+"""
+import functools
+import random
+
+import pytest
+
+from backend import intrinsic_detector
+from backend.intrinsic_detector import intrinsic_similarity, intrinsic_similarity_incremental
+
+WORDS = ("essay method result data model study theory claim source draft argument evidence "
+         "analysis sample survey author reader figure table chapter").split()
+
+
+def random_line(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 9)))
+
+
+def edit(rng, lines):
+    kind = rng.choice(["insert", "replace", "delete"])
+    for _ in range(rng.randint(1, 3)):
+        position = rng.randrange(len(lines) + (kind == "insert"))
+        # Some edits repeat an existing line, which must show up as an exact match
+        line = rng.choice(lines) if lines and rng.random() < 0.2 else random_line(rng)
+        if kind == "insert":
+            lines.insert(position, line)
+        elif kind == "replace":
+            lines[position] = line
+        elif len(lines) > 2:
+            del lines[position]
+
+
+def assert_same(incremental, full):
+    assert incremental["similarity_score"] == pytest.approx(full["similarity_score"], abs=0.02)
+    assert [(p["sentence_1"], p["sentence_2"]) for p in incremental["similar_pairs"]] == \
+        [(p["sentence_1"], p["sentence_2"]) for p in full["similar_pairs"]]
+    for a, b in zip(incremental["similar_pairs"], full["similar_pairs"]):
+        assert a["similarity"] == pytest.approx(b["similarity"], abs=0.011)
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_incremental_matches_full_computation(seed, monkeypatch):
+    # Small blocks, so the changed rows are scored over several blocks
+    monkeypatch.setattr(intrinsic_detector, "iter_row_blocks",
+                        functools.partial(intrinsic_detector.iter_row_blocks, max_block_entries=100))
+    rng = random.Random(seed)
+    lines = [random_line(rng) for _ in range(rng.randint(20, 60))]
+    document_id = f"fuzz-{seed}"
+    for _ in range(40):
+        assert_same(intrinsic_similarity_incremental(lines, document_id), intrinsic_similarity(lines))
+        edit(rng, lines)
@@ -0,0 +1,90 @@
+"""
+Runs a model host with stub @hosted functions over a temporary socket.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import pytest
+
+from backend import model_host
+from backend.generation import GenerationBudget
+
+
+@model_host.hosted("test.echo", "summarizer")
+def echo(value, budget=None):
+    if budget is not None:
+        budget.charge(3)
+    return value
+
+
+@model_host.hosted("test.fail", "summarizer")
+def fail(message):
+    raise ValueError(message)
+
+
+@model_host.hosted("test.count", "paraphraser")  # a paused stream keeps its model's slot
+def count_up(limit):
+    yield from range(limit)
+
+
+@pytest.fixture(scope="module")
+def client():
+    directory = tempfile.mkdtemp()  # short path: Unix socket paths are limited to ~100 characters
+    address = os.path.join(directory, "host.sock")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(model_host, "_load_models", lambda names: None)  # stubs only; the forked host inherits this
+        host = multiprocessing.get_context("fork").Process(target=model_host.serve,
+                                                           args=(address, 1, ["summarizer", "paraphraser"]))
+        host.start()
+    deadline = time.monotonic() + 30
+    while not os.path.exists(address):
+        assert time.monotonic() < deadline and host.is_alive(), "model host did not start"
+        time.sleep(0.05)
+    yield model_host.HostClient(address)
+    host.terminate()
+    host.join(30)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_call_returns_result(client):
+    assert client.call("test.echo", ({"a": [1, 2]},), {}) == {"a": [1, 2]}
+
+
+def test_budget_charged_on_host_is_copied_back(client):
+    budget = GenerationBudget(tokens=10)
+    assert client.call("test.echo", ("x",), {"budget": budget}) == "x"
+    assert budget.tokens_left == 7
+
+
+def test_error_is_raised_in_caller(client):
+    with pytest.raises(ValueError, match="broken"):
+        client.call("test.fail", ("broken",), {})
+
+
+def test_stream_yields_items(client):
+    assert list(client.stream("test.count", (5,), {})) == [0, 1, 2, 3, 4]
+
+
+def test_abandoned_stream_does_not_leak_into_next_call(client):
+    stream = client.stream("test.count", (1000,), {})
+    assert next(stream) == 0
+    assert client.call("test.echo", ("after",), {}) == "after"
+    assert next(stream) == 1
+    stream.close()
+    assert client.call("test.echo", ("again",), {}) == "again"
+
+
+def test_cancelled_stream_stops(client):
+    seen = []
+    for item in client.stream("test.count", (1000,), {"cancelled": lambda: len(seen) >= 3}):
+        seen.append(item)
+    assert seen == [0, 1, 2]
+    assert client.call("test.echo", (1,), {}) == 1
+
+
+def test_ping_reports_worker(client):
+    health = client.ping()
+    assert health["pid"] != os.getpid() and health["generation"] == 0
@@ -0,0 +1,20 @@
+"""
+Single-pass rule substitution.
+"""
+import pytest
+
+from backend.rules import apply_rules
+
+
+def test_longest_phrase_wins_and_case_is_kept():
+    assert apply_rules("formal", "Don't stop") == "Do not stop"
+    assert apply_rules("academic", "A LOT of HELP") == "A SIGNIFICANT AMOUNT of ASSIST"
+
+
+@pytest.mark.parametrize("profile, text, expected", [
+    ("academic", "we ſhow results", "we demonstrate results"),
+    ("first_person", "uſ and them", " and them"),
+    ("first_person", "İ agree", " agree"),
+])
+def test_matches_through_unicode_case_folding(profile, text, expected):
+    assert apply_rules(profile, text) == expected
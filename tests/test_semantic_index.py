@@ -0,0 +1,59 @@
+"""
+Readers and writers of one SemanticIndex directory, in one process and across processes.
+"""
+import multiprocessing
+import sqlite3
+
+import numpy as np
+
+from backend.semantic_index import SemanticIndex
+
+
+def unit_vectors(n, seed, dim=8):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def add(path, name, n, seed):
+    with SemanticIndex(path) as index:
+        index.add_document(name, [f"{name} sentence {i}" for i in range(n)], unit_vectors(n, seed))
+
+
+def test_opening_keeps_rows_of_a_write_in_progress(tmp_path):
+    add(tmp_path, "first", 3, 0)
+    # A writer has committed its rows but not yet meta.json
+    with sqlite3.connect(tmp_path / "sentences.sqlite") as db:
+        db.executemany("INSERT INTO sentences (id, document, text) VALUES (?, ?, ?)",
+                       [(3, "second", "pending 0"), (4, "second", "pending 1")])
+
+    with SemanticIndex(tmp_path) as reader:
+        assert len(reader) == 3
+    with sqlite3.connect(tmp_path / "sentences.sqlite") as db:
+        assert db.execute("SELECT COUNT(*) FROM sentences").fetchone()[0] == 5
+
+
+def test_writer_drops_rows_of_an_interrupted_write(tmp_path):
+    add(tmp_path, "first", 3, 0)
+    with sqlite3.connect(tmp_path / "sentences.sqlite") as db:
+        db.execute("INSERT INTO sentences (id, document, text) VALUES (3, 'lost', 'interrupted')")
+
+    add(tmp_path, "second", 2, 1)
+    with SemanticIndex(tmp_path) as index:
+        assert len(index) == 5
+        assert index._db.execute("SELECT COUNT(*) FROM sentences WHERE document = 'lost'").fetchone()[0] == 0
+
+
+def test_concurrent_writers_do_not_overwrite_each_other(tmp_path):
+    context = multiprocessing.get_context("fork")
+    writers = [context.Process(target=add, args=(str(tmp_path), f"doc{i}", 50, i)) for i in range(4)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join(60)
+        assert writer.exitcode == 0
+
+    with SemanticIndex(tmp_path) as index:
+        assert index.meta["count"] == len(index) == 200
+        for i in range(4):
+            hits = index.search(unit_vectors(50, i)[:1], threshold=0.99, top_k=1)
+            assert hits[0][0][1:] == (f"doc{i}", f"doc{i} sentence 0")
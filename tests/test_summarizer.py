@@ -0,0 +1,48 @@
+"""
+Long inputs whose generation budget is spent must still be brought down to the model input.
+"""
+import pytest
+
+from backend import summarizer
+from backend.generation import GenerationBudget
+
+
+class WordTokenizer:
+    """One token per word, enough for the length bookkeeping of the map steps."""
+
+    def __call__(self, text, add_special_tokens=False):
+        if isinstance(text, list):
+            return {"input_ids": [self(t)["input_ids"] for t in text]}
+        return {"input_ids": [len(word) for word in text.split()]}
+
+    def decode(self, ids):
+        return " ".join("w" * i for i in ids)
+
+
+@pytest.fixture(autouse=True)
+def word_tokenizer(monkeypatch):
+    monkeypatch.setattr(summarizer, "get_tokenizer", lambda name: WordTokenizer())
+
+
+UNPUNCTUATED = " ".join(["word"] * 5000)  # e.g. OCR output: one "sentence", which extracts keep whole
+
+
+def test_spent_budget_cuts_text_to_the_model_input():
+    text = summarizer.reduce_to_input(UNPUNCTUATED, budget=GenerationBudget(tokens=0))
+    assert summarizer.count_tokens(text) <= summarizer.MAX_INPUT_TOKENS - 24
+
+
+def test_summarize_long_with_spent_budget_returns():
+    summary = summarizer.summarize_long(UNPUNCTUATED, 50, 100, budget=GenerationBudget(tokens=0))
+    assert 0 < summarizer.count_tokens(summary) <= summarizer.MAX_INPUT_TOKENS - 24
+
+
+def test_stream_summary_past_deadline_returns():
+    streamed = "".join(summarizer.stream_summary(UNPUNCTUATED, time_budget=1e-9))
+    assert 0 < summarizer.count_tokens(streamed) <= summarizer.MAX_INPUT_TOKENS - 24
+
+
+def test_round_that_does_not_shrink_stops(monkeypatch):
+    monkeypatch.setattr(summarizer, "iter_chunk_summaries", lambda chunks, *args: enumerate(chunks))
+    text = summarizer.reduce_to_input(UNPUNCTUATED, budget=None)
+    assert summarizer.count_tokens(text) <= summarizer.MAX_INPUT_TOKENS - 24